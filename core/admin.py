@@ -3,7 +3,8 @@ from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django import forms
 from django.conf import settings
-from .models import Page, Post, Category, Tag, Service
+from .admin_search import TrigramSearchMixin
+from .models import Page, Post, Category, Tag, Service, MediaAsset, MediaAssetURL
 from ckeditor.widgets import CKEditorWidget
 class PageAdminForm(forms.ModelForm):
     class Meta:
@@ -26,10 +27,12 @@ class PageAdminForm(forms.ModelForm):
 
 
 @admin.register(Page)
-class PageAdmin(admin.ModelAdmin):
+class PageAdmin(TrigramSearchMixin, admin.ModelAdmin):
     form = PageAdminForm
     list_display = ("title", "path", "status", "published_at")
     search_fields = ("title", "path", "content_html", "seo_title", "seo_description", "seo_keywords")
+    # Columns with gin_trgm_ops indexes (core migration 0009)
+    trigram_search_fields = search_fields
     list_filter = ("status",)
     ordering = ("title",)
     fieldsets = (
@@ -125,10 +128,11 @@ class PostAdminForm(forms.ModelForm):
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(TrigramSearchMixin, admin.ModelAdmin):
     form = PostAdminForm
     list_display = ("title", "published_at", "status")
     search_fields = ("title", "content_html", "seo_title", "seo_description", "seo_keywords")
+    trigram_search_fields = search_fields
     list_filter = ("status", "categories")
     fieldsets = (
         ("SEO", {
@@ -215,6 +219,7 @@ class ServiceAdmin(admin.ModelAdmin):
 
     form = ServiceAdminForm
     list_display = ("title", "slug", "order", "status", "linked_page")
+    list_select_related = ("page",)
     list_editable = ("order", "status")
     search_fields = ("title", "excerpt", "slug", "page__title", "page__path")
     list_filter = ("status",)
@@ -275,4 +280,19 @@ class TagAdmin(admin.ModelAdmin):
     list_display = ("name", "slug", "wp_id")
     search_fields = ("name",)
 
+
+class MediaAssetURLInline(admin.TabularInline):
+    model = MediaAssetURL
+    extra = 0
+    readonly_fields = ("url", "created")
+    can_delete = False
+
+
+@admin.register(MediaAsset)
+class MediaAssetAdmin(admin.ModelAdmin):
+    list_display = ("storage_key", "content_type", "size", "width", "height", "created")
+    search_fields = ("storage_key", "sha256", "urls__url")
+    readonly_fields = ("sha256", "storage_key", "content_type", "size", "width", "height", "created", "updated")
+    inlines = (MediaAssetURLInline,)
+
 # NavItem admin removed; header uses static template markup
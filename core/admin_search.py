@@ -0,0 +1,86 @@
+"""Admin changelist search backed by PostgreSQL trigram indexes.
+
+Django's admin search turns every term into ``UPPER(col::text) LIKE
+UPPER('%term%')`` across all ``search_fields``, which no B-tree index can
+serve, so each search is a sequential scan of every searched column. On
+PostgreSQL the columns listed in ``trigram_search_fields`` are searched with
+``ILIKE`` instead, which the ``gin_trgm_ops`` indexes created by the
+``*_trigram_search_indexes`` migrations answer directly. On other databases
+(SQLite in development) the admin keeps Django's default search.
+
+Every column OR-ed into a search must be indexed for PostgreSQL to combine the
+index scans, so ``trigram_search_fields`` should list all the model's own
+searched columns and match the indexes in the migration. Columns on a joined
+table cannot take part in that plan: list them in ``trigram_related_search``
+instead, which matches them in a separate query and ORs the matching primary
+keys into the search.
+"""
+from django.db import connections, models
+from django.db.models.lookups import IContains
+from django.utils.text import smart_split, unescape_string_literal
+
+@models.CharField.register_lookup
+@models.TextField.register_lookup
+class TrigramContains(IContains):
+    """``icontains`` compiled to a bare ``ILIKE`` on PostgreSQL so a trigram GIN index can serve it."""
+
+    lookup_name = "trigram_icontains"
+
+    def as_sql(self, compiler, connection):
+        return compiler.compile(IContains(self.lhs, self.rhs))
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", (*lhs_params, *rhs_params)
+
+
+class TrigramSearchMixin:
+    """ModelAdmin mixin: search ``trigram_search_fields`` through their trigram indexes on PostgreSQL.
+
+    ``trigram_related_search`` maps a relation path to columns of the model at
+    its end, e.g. ``{"user": ("username", "email")}`` or
+    ``{"specialty_items__specialty": ("name",)}``; rows with a related object
+    matching every search term are added to the results.
+    """
+
+    trigram_search_fields = ()
+    trigram_related_search = {}
+
+    def get_search_fields(self, request):
+        search_fields = super().get_search_fields(request)
+        if connections[self.model.objects.db].vendor != "postgresql":
+            return search_fields
+        return tuple(
+            f"{field}__{TrigramContains.lookup_name}" if field in self.trigram_search_fields else field
+            for field in search_fields
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        terms = []
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            terms.append(bit)
+        if not terms:
+            return results, may_have_duplicates
+        for path, fields in self.trigram_related_search.items():
+            matches = _related_model(self.model, path)._default_manager.all()
+            for term in terms:
+                term_q = models.Q()
+                for field in fields:
+                    term_q |= models.Q(**{f"{field}__{TrigramContains.lookup_name}": term})
+                matches = matches.filter(term_q)
+            # Resolved to this table's primary keys in their own query, so the OR below stays
+            # on this table's indexed columns; there is at most one id per row searched
+            ids = list(self.model._default_manager.filter(**{f"{path}__in": matches}).values_list("pk", flat=True).distinct())
+            if ids:
+                results = results | queryset.filter(pk__in=ids)
+        return results, may_have_duplicates
+
+
+def _related_model(model, path: str):
+    for name in path.split("__"):
+        model = model._meta.get_field(name).related_model
+    return model
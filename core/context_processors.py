@@ -53,6 +53,7 @@ def seo(request):
         'robots': robots_value,
         'site_base': site_base,
         'og_image_url': og_image_url,
+        'default_og_image_url': og_image_url,
         'sitemap_url': sitemap_url,
     'GOOGLE_SITE_VERIFICATION': getattr(settings, 'GOOGLE_SITE_VERIFICATION', ''),
     }
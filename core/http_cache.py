@@ -0,0 +1,332 @@
+"""File-backed HTTP cache shared by the importers and the ``scripts/`` downloaders.
+
+``CachingAdapter`` is a ``requests`` transport adapter: mount it on a session
+(or use ``cached_session``) and every GET goes through ``HttpCache``:
+
+* entries are keyed by method, URL with its query parameters sorted, and the
+  request headers that change the response (``Accept``, ``User-Agent``);
+* a cached entry is revalidated with ``If-None-Match`` / ``If-Modified-Since``
+  and a 304 is answered from the cache with the stored 200, so unchanged
+  files are not downloaded again;
+* in offline mode nothing goes to the network: hits are served as stored and
+  misses raise ``CacheMiss``.
+
+Requests that carry their own validators (``WordPressClient`` sends the ETag
+of the last sync) get the server's 304 back unchanged. Responses are served
+with ``response.from_cache`` set. Entries are a body file plus a JSON file of
+status, URL and headers, written atomically, so concurrent fetchers can share
+one cache directory. Bodies are copied to disk as the caller reads them and
+served from the file, so large downloads (``stream=True``) never sit in
+memory; an entry only appears once its body has been read to the end.
+
+The directory and offline switch come from ``HTTP_CACHE_DIR`` and
+``HTTP_CACHE_OFFLINE`` (settings for management commands, the environment
+for scripts, see ``HttpCache.from_env``). ``prune`` drops entries unused for
+``HTTP_CACHE_MAX_AGE_DAYS`` and then the least recently used ones until the
+cache fits in ``HTTP_CACHE_MAX_MB``; the import commands run it after online
+runs.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+DEFAULT_DIR = Path(__file__).resolve().parent.parent / '.http_cache'
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_MB = 2048
+# Temporary files left by a writer that died are removed after this long
+STALE_TMP_SECONDS = 24 * 3600
+# Request headers that select a different representation
+VARY_HEADERS = ('Accept', 'User-Agent')
+# Response headers that describe the wire encoding, not the stored (decoded) body
+_SKIP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+class CacheMiss(requests.ConnectionError):
+    """Offline mode and the URL is not cached."""
+
+
+def _truthy(value: Optional[str]) -> bool:
+    return (value or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def normalize_url(url: str) -> str:
+    """URL with its query parameters sorted and the fragment dropped."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+
+class HttpCache:
+    def __init__(self, directory=None, offline: bool = False, max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+                 max_mb: float = DEFAULT_MAX_MB):
+        self.directory = Path(directory or DEFAULT_DIR)
+        self.offline = offline
+        # 0 = no limit
+        self.max_age = max_age_days * 86400
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.pruned = 0
+
+    @classmethod
+    def from_env(cls, offline: Optional[bool] = None) -> 'HttpCache':
+        """Cache configured by the HTTP_CACHE_DIR / HTTP_CACHE_OFFLINE / HTTP_CACHE_MAX_* environment variables."""
+        if offline is None:
+            offline = _truthy(os.environ.get('HTTP_CACHE_OFFLINE'))
+        return cls(
+            os.environ.get('HTTP_CACHE_DIR') or None,
+            offline=offline,
+            max_age_days=float(os.environ.get('HTTP_CACHE_MAX_AGE_DAYS') or DEFAULT_MAX_AGE_DAYS),
+            max_mb=float(os.environ.get('HTTP_CACHE_MAX_MB') or DEFAULT_MAX_MB),
+        )
+
+    @classmethod
+    def from_settings(cls, offline: bool = False) -> 'HttpCache':
+        """Cache configured by Django settings; ``offline`` forces offline mode on."""
+        from django.conf import settings
+
+        return cls(
+            settings.HTTP_CACHE_DIR,
+            offline=offline or settings.HTTP_CACHE_OFFLINE,
+            max_age_days=getattr(settings, 'HTTP_CACHE_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS),
+            max_mb=getattr(settings, 'HTTP_CACHE_MAX_MB', DEFAULT_MAX_MB),
+        )
+
+    def key(self, method: str, url: str, headers=None) -> str:
+        headers = headers or {}
+        vary = [f"{name}:{headers.get(name, '')}" for name in VARY_HEADERS]
+        return hashlib.sha256('\n'.join([method.upper(), normalize_url(url), *vary]).encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        folder = self.directory / key[:2]
+        return folder / f"{key}.json", folder / f"{key}.body"
+
+    def load(self, key: str) -> Optional[Tuple[dict, Path]]:
+        """(metadata, body file) of a cached entry; marks it as recently used."""
+        meta_path, body_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if not body_path.is_file():
+                return None
+            os.utime(meta_path)
+            return meta, body_path
+        except (OSError, ValueError):
+            return None
+
+    def writer(self, key: str, url: str, response: requests.Response) -> '_EntryWriter':
+        """Writer that stores ``response`` as the entry for ``key`` once its body has been read."""
+        meta = {
+            'url': url,
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS},
+            'stored_at': time.time(),
+        }
+        return _EntryWriter(*self._paths(key), meta)
+
+    def prune(self, max_age: Optional[float] = None, max_bytes: Optional[int] = None) -> int:
+        """Delete entries unused for ``max_age`` seconds, then the least recently used ones
+        until the cache is under ``max_bytes`` (the configured limits by default; 0 = no limit).
+
+        Returns the number of entries removed.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        now = time.time()
+        entries = []  # (last used, bytes, meta path, body path)
+        for meta_path in self.directory.glob('*/*.json'):
+            body_path = meta_path.with_suffix('.body')
+            try:
+                used = meta_path.stat().st_mtime
+                size = meta_path.stat().st_size + (body_path.stat().st_size if body_path.exists() else 0)
+            except OSError:
+                continue
+            entries.append((used, size, meta_path, body_path))
+        for tmp in self.directory.glob('*/.tmp-*'):
+            try:
+                if now - tmp.stat().st_mtime > STALE_TMP_SECONDS:
+                    tmp.unlink()
+            except OSError:
+                pass
+
+        entries.sort()
+        total = sum(size for _, size, _, _ in entries)
+        removed = 0
+        for used, size, meta_path, body_path in entries:
+            if not ((max_age and now - used > max_age) or (max_bytes and total > max_bytes)):
+                # Sorted oldest first: everything after this one is newer
+                break
+            # Metadata first: a body without it is never served
+            for path in (meta_path, body_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        self.pruned += removed
+        return removed
+
+    def summary(self) -> str:
+        mode = 'offline' if self.offline else 'online'
+        return (f"HTTP cache ({mode}, {self.directory}): {self.hits} hits, "
+                f"{self.revalidated} revalidated, {self.misses} misses"
+                + (f", {self.pruned} pruned" if self.pruned else ''))
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class _EntryWriter:
+    """Copies a body to a temporary file; ``commit`` moves it into place and writes the metadata."""
+
+    def __init__(self, meta_path: Path, body_path: Path, meta: dict):
+        self.meta_path = meta_path
+        self.body_path = body_path
+        self.meta = meta
+        self._file = None
+        self._tmp = None
+        self.done = False
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            self.body_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, self._tmp = tempfile.mkstemp(dir=self.body_path.parent, prefix='.tmp-')
+            self._file = os.fdopen(fd, 'wb')
+        self._file.write(chunk)
+
+    def commit(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        if self._file is None:
+            self.write(b'')
+        self._file.close()
+        # Body first: a metadata file always has its body next to it
+        os.replace(self._tmp, self.body_path)
+        _atomic_write(self.meta_path, json.dumps(self.meta).encode('utf-8'))
+
+    def abort(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self._tmp)
+
+
+class _TeeRaw:
+    """Wraps a urllib3 response so the (decoded) body is written to the cache as it is streamed."""
+
+    def __init__(self, raw, writer: _EntryWriter):
+        self._raw = raw
+        self._writer = writer
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        complete = False
+        try:
+            for chunk in self._raw.stream(amt, decode_content=decode_content):
+                self._writer.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            # A body the caller stopped reading early is not cached
+            self._writer.commit() if complete else self._writer.abort()
+
+    def close(self):
+        self._writer.abort()
+        self._raw.close()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class CachingAdapter(HTTPAdapter):
+    """``HTTPAdapter`` that answers GETs from an ``HttpCache`` where it can."""
+
+    def __init__(self, cache: HttpCache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return super().send(request, **kwargs)
+        key = self.cache.key(request.method, request.url, request.headers)
+        cached = self.cache.load(key)
+        caller_etag = request.headers.get('If-None-Match')
+        if self.cache.offline:
+            if cached is None:
+                raise CacheMiss(f"Not in HTTP cache (offline): {request.url}", request=request)
+            self.cache.hits += 1
+            meta, body = cached
+            if caller_etag and caller_etag == meta['headers'].get('ETag'):
+                return self._build(request, meta, None, status=304)
+            return self._build(request, meta, body, stream=kwargs.get('stream', False))
+
+        conditional = cached is not None and not caller_etag and 'If-Modified-Since' not in request.headers
+        if conditional:
+            validators = cached[0]['headers']
+            if validators.get('ETag'):
+                request.headers['If-None-Match'] = validators['ETag']
+            if validators.get('Last-Modified'):
+                request.headers['If-Modified-Since'] = validators['Last-Modified']
+        response = super().send(request, **kwargs)
+        if response.status_code == 304 and conditional:
+            self.cache.revalidated += 1
+            meta, body = cached
+            # Keep validators the server may have refreshed
+            meta['headers'].update({k: v for k, v in response.headers.items() if k in ('ETag', 'Last-Modified')})
+            response.close()
+            return self._build(request, meta, body, stream=kwargs.get('stream', False))
+        if response.status_code == 200:
+            self.cache.misses += 1
+            response.raw = _TeeRaw(response.raw, self.cache.writer(key, request.url, response))
+        response.from_cache = False
+        return response
+
+    def _build(self, request, meta: dict, body: Optional[Path], status: Optional[int] = None,
+               stream: bool = False) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status or meta['status']
+        response.reason = 'Not Modified' if status == 304 else 'OK'
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        if body is not None and stream:
+            # Read from the file as the caller iterates; closing the response closes it
+            response.raw = body.open('rb')
+        else:
+            response._content = body.read_bytes() if body is not None else b''
+            response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+
+def cached_session(cache: Optional[HttpCache] = None, **adapter_kwargs) -> requests.Session:
+    """A ``requests.Session`` whose http(s) traffic goes through ``cache`` (from the environment by default)."""
+    session = requests.Session()
+    adapter = CachingAdapter(cache or HttpCache.from_env(), **adapter_kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
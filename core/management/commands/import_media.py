@@ -1,112 +1,177 @@
-import os
 import re
+import time
+from typing import Callable, Dict, List, Optional
 from urllib.parse import urlparse, urljoin
 
 import requests
 from bs4 import BeautifulSoup
-from django.core.management.base import BaseCommand, CommandParser
+from requests.adapters import HTTPAdapter
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError, CommandParser
 from django.conf import settings
 
+from core.http_cache import HttpCache, cached_session
+from core.media_assets import MediaLibrary
 from core.models import Page, Post
 
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+URL_PATTERN = re.compile(r"url\((['\"]?)([^)\"']+)\1\)")
+BATCH_SIZE = 200
+DEFAULT_PARSER = 'lxml' if lxml else 'html.parser'
+
+
+def rewrite_urls(soup: BeautifulSoup, resolve: Callable[[str], Optional[str]]) -> bool:
+    """Replace every media URL in the document (img src / srcset, inline and <style> CSS url()) with
+    ``resolve(url)``, leaving it as is where that returns None; returns whether anything changed.
+
+    Called with a resolver that records URLs and returns None, it only collects them.
+    """
+    changed = False
+
+    def swap(url: str) -> str:
+        nonlocal changed
+        local = resolve(url) if url else None
+        if local and local != url:
+            changed = True
+            return local
+        return url
+
+    def css(text: str) -> str:
+        return URL_PATTERN.sub(lambda m: f"url({m.group(1)}{swap(m.group(2))}{m.group(1)})", text)
+
+    for img in soup.find_all('img'):
+        if img.get('src'):
+            img['src'] = swap(img['src'])
+        srcset = img.get('srcset')
+        if srcset:
+            parts, moved = [], False
+            for part in (p.strip() for p in srcset.split(',')):
+                url_part, _, descriptor = part.partition(' ')
+                local = swap(url_part)
+                moved = moved or local != url_part
+                parts.append(local + (' ' + descriptor if descriptor else ''))
+            if moved:
+                img['srcset'] = ', '.join(parts)
+    for el in soup.find_all(style=True):
+        el['style'] = css(el.get('style') or '')
+    for style_tag in soup.find_all('style'):
+        if style_tag.string:
+            style_tag.string = css(style_tag.string)
+    return changed
+
+
+def serialize(soup: BeautifulSoup, parser: str) -> str:
+    """HTML of a parsed fragment; lxml wraps fragments in <html><head>/<body>, which are dropped again."""
+    if parser != 'lxml' or soup.html is None:
+        return str(soup)
+    return ''.join(str(node) for part in (soup.head, soup.body) if part is not None for node in part.contents)
+
 
 class Command(BaseCommand):
-    help = "Download images referenced in Page/Post HTML and rewrite to local MEDIA URLs."
+    help = "Download images referenced in Page/Post HTML into default_storage and rewrite to their storage URLs."
 
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument('--site', type=str, required=True, help='Base site domain to match for media, e.g. https://www.lcpsych.com')
         parser.add_argument('--limit', type=int, default=0, help='Limit number of documents to process (0 = all)')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent downloads / uploads')
+        parser.add_argument('--parser', choices=['html.parser', 'lxml'], default=DEFAULT_PARSER,
+                            help=f'BeautifulSoup parser (default {DEFAULT_PARSER}; lxml is faster and optional)')
+        parser.add_argument('--offline', action='store_true', help='Download only from the HTTP cache (HTTP_CACHE_DIR)')
+        parser.add_argument('--no-http-cache', action='store_true', help='Bypass the on-disk HTTP cache')
 
     def handle(self, *args, **options):
-        base = options['site'].rstrip('/')
+        """Collect every media URL across pages and posts, resolve them to MediaAssets
+        (fetching unknown ones into default_storage), then rewrite the HTML to the stored URLs."""
+        self.base = options['site'].rstrip('/')
+        self.hosts = (urlparse(self.base).netloc, 'lcpsych.com', 'www.lcpsych.com')
         limit = options['limit']
-        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
-
-        def download_and_localize(url: str) -> str | None:
-            """Download url if on allowed host; return local MEDIA url or None."""
-            if not url:
-                return None
-            abs_url = url if url.startswith('http') else urljoin(base + '/', url)
-            netloc = urlparse(abs_url).netloc
-            if netloc not in (urlparse(base).netloc, 'lcpsych.com', 'www.lcpsych.com'):
-                return None
-            filename = os.path.basename(urlparse(abs_url).path) or 'file'
-            # Strip querystrings from filename
-            filename = filename.split('?')[0]
-            # Ensure unique filename if collision
-            target = os.path.join(settings.MEDIA_ROOT, filename)
-            name, ext = os.path.splitext(filename)
-            i = 1
-            while os.path.exists(target):
-                # Already downloaded — reuse
-                break
-            if not os.path.exists(target):
-                try:
-                    r = requests.get(abs_url, timeout=30)
-                    r.raise_for_status()
-                    with open(target, 'wb') as f:
-                        f.write(r.content)
-                except Exception as e:
-                    self.stderr.write(f"Failed to download {abs_url}: {e}")
-                    return None
-            return settings.MEDIA_URL + os.path.basename(target)
-
-        url_pattern = re.compile(r"url\((['\"]?)([^)\"']+)\1\)")
-
-        def process(html: str) -> str:
-            soup = BeautifulSoup(html or '', 'html.parser')
-            changed = False
-            # <img src>
-            for img in soup.find_all('img'):
-                src = img.get('src')
-                local = download_and_localize(src)
-                if local:
-                    img['src'] = local
-                    changed = True
-                # srcset values
-                srcset = img.get('srcset')
-                if srcset:
-                    parts = [p.strip() for p in srcset.split(',')]
-                    new_parts = []
-                    for part in parts:
-                        if ' ' in part:
-                            url_part, descriptor = part.split(' ', 1)
-                        else:
-                            url_part, descriptor = part, ''
-                        local2 = download_and_localize(url_part)
-                        new_parts.append(((local2 or url_part) + ((' ' + descriptor) if descriptor else '')))
-                    img['srcset'] = ', '.join(new_parts)
-                    changed = True
-            # Inline styles with background-image
-            for el in soup.find_all(style=True):
-                style = el.get('style') or ''
-                def repl(m):
-                    quote, url_val = m.group(1), m.group(2)
-                    local = download_and_localize(url_val)
-                    return f"url({quote}{local or url_val}{quote})"
-                new_style = url_pattern.sub(repl, style)
-                if new_style != style:
-                    el['style'] = new_style
-                    changed = True
-            # <style> blocks inside content
-            for style_tag in soup.find_all('style'):
-                css = style_tag.string or ''
-                new_css = url_pattern.sub(lambda m: f"url({m.group(1)}{download_and_localize(m.group(2)) or m.group(2)}{m.group(1)})", css)
-                if new_css != css:
-                    style_tag.string = new_css
-                    changed = True
-            return str(soup) if changed else html
-
-        pages = Page.objects.all()
-        posts = Post.objects.all()
-        count = 0
-        for obj in list(pages) + list(posts):
-            original = obj.content_html
-            updated = process(original)
-            if updated != original:
-                obj.content_html = updated
-                obj.save(update_fields=['content_html'])
-            count += 1
-            if limit and count >= limit:
-                break
+        workers = max(1, options['workers'])
+        cache = None if options['no_http_cache'] else HttpCache.from_settings(offline=options['offline'])
+        pool = dict(pool_connections=4, pool_maxsize=max(workers, 10))
+        if cache:
+            self.session = cached_session(cache, **pool)
+        else:
+            self.session = requests.Session()
+            self.session.mount('http://', HTTPAdapter(**pool))
+            self.session.mount('https://', HTTPAdapter(**pool))
+
+        parser = options['parser']
+        if parser == 'lxml' and lxml is None:
+            raise CommandError("--parser lxml needs the lxml package installed")
+
+        # Phase 1: parse only documents that can reference importable media and collect their URLs.
+        # Only primary keys are kept; holding every parsed tree would grow with the corpus
+        candidate = self._candidate_pattern()
+        targets: Dict[str, None] = {}  # absolute URLs, in first-seen order
+        matched: Dict[type, List[int]] = {Page: [], Post: []}  # pks of documents with importable URLs
+        scanned = 0
+        started = time.monotonic()
+        for model in (Page, Post):
+            for obj in model.objects.only('id', 'content_html').order_by('pk').iterator(chunk_size=500):
+                if limit and scanned >= limit:
+                    break
+                scanned += 1
+                if not candidate.search(obj.content_html or ''):
+                    continue
+                found = []
+                rewrite_urls(BeautifulSoup(obj.content_html, parser), lambda url: found.append(url))
+                resolved = [abs_url for abs_url in map(self._target, found) if abs_url]
+                targets.update(dict.fromkeys(resolved))
+                if resolved:
+                    matched[model].append(obj.pk)
+        self.stdout.write(
+            f"Scanned {scanned} documents in {time.monotonic() - started:.2f}s, "
+            f"{sum(map(len, matched.values()))} reference importable media ({parser})"
+        )
+
+        # Phase 2: resolve URLs through the media table, fetching and storing only unknown ones
+        self.stdout.write(f"{len(targets)} media URLs ({default_storage.__class__.__name__})")
+        library = MediaLibrary(self.session, workers=workers,
+                               on_error=lambda url, e: self.stderr.write(f"Failed to import {url}: {e}"))
+        assets, stats = library.resolve(targets)
+        self.stdout.write(f"Media: {stats}")
+
+        # Phase 3: re-read and rewrite the matched documents a batch at a time
+        url_map = {abs_url: asset.url for abs_url, asset in assets.items()}
+        rewritten = 0
+        for model, pks in matched.items():
+            for start in range(0, len(pks), BATCH_SIZE):
+                changed = []
+                for obj in model.objects.only('id', 'content_html').filter(pk__in=pks[start:start + BATCH_SIZE]):
+                    soup = BeautifulSoup(obj.content_html, parser)
+                    if rewrite_urls(soup, lambda url: url_map.get(self._target(url))):
+                        obj.content_html = serialize(soup, parser)
+                        changed.append(obj)
+                model.objects.bulk_update(changed, ['content_html'])
+                rewritten += len(changed)
+        self.stdout.write(f"Rewrote {rewritten} documents")
+        if cache:
+            if not cache.offline:
+                cache.prune()
+            self.stdout.write(cache.summary())
         self.stdout.write(self.style.SUCCESS('Media import complete.'))
+
+    def _candidate_pattern(self) -> 're.Pattern':
+        """Cheap test for HTML that may hold an importable URL: a link to one of the
+        allowed hosts, or a relative src / srcset / CSS url() outside MEDIA_URL."""
+        # The quote is optional, so it is excluded too: backtracking must not skip it
+        local = r'(?!["\']|https?:|//|data:|#|' + re.escape(settings.MEDIA_URL) + ')'
+        hosts = '|'.join(re.escape(host) for host in self.hosts if host)
+        return re.compile(
+            # Case-sensitive (WordPress writes lowercase attributes): IGNORECASE makes the scan ~5x slower
+            rf"//(?:{hosts})[/\"'\s)]|(?:src|srcset)\s*=\s*[\"']?\s*{local}|url\(\s*[\"']?{local}"
+        )
+
+    def _target(self, url: str) -> Optional[str]:
+        """Absolute form of a URL on the allowed hosts, else None."""
+        if url.startswith(settings.MEDIA_URL):
+            # Already localized by an earlier run
+            return None
+        abs_url = url if url.startswith('http') else urljoin(self.base + '/', url)
+        if urlparse(abs_url).netloc not in self.hosts:
+            return None
+        return abs_url
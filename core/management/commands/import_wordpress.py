@@ -1,17 +1,31 @@
 import datetime
+import os
+import sys
+import tempfile
+import time
 from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
 
-import requests
 from defusedxml import ElementTree as ET
 from django.core.management.base import BaseCommand, CommandParser
 from django.utils import timezone
 from django.utils.text import slugify
 
-from core.models import Page, Post, Category, Tag
+from core.models import Page, Post, Category, Tag, ImportCheckpoint, WordPressSyncState
+from core.http_cache import HttpCache
+from core.wordpress import FakeWordPressServer, WordPressClient
+from core.wordpress_import import UpsertResult, link_page_parents, parse_gmt, upsert_pages, upsert_posts, upsert_terms
+from core.wxr import iter_wxr, write_synthetic_wxr
+
+_NO_DATE = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
 
 
 class Command(BaseCommand):
-    help = "Import content from a WordPress REST API or a WXR file (REST implemented)."
+    help = (
+        "Import content from a WordPress REST API or a WXR file (REST implemented). "
+        "REST runs are incremental: only posts and pages modified since the last sync are fetched, "
+        "so items deleted on WordPress are only picked up by --full (add --truncate to drop them locally)."
+    )
 
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument('--site', type=str, help='WordPress site base URL for REST import, e.g. https://example.com')
@@ -21,11 +35,28 @@ class Command(BaseCommand):
         parser.add_argument('--pages', action='store_true', help='Import pages')
         parser.add_argument('--tax', action='store_true', help='Import categories and tags')
         parser.add_argument('--truncate', action='store_true', help='Delete existing imported content first')
+        parser.add_argument('--full', action='store_true',
+                            help='Refetch every item instead of only those modified since the last sync '
+                                 '(the only way to notice items deleted on WordPress)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an interrupted import from its checkpoint instead of starting over')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent page requests per collection')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+        parser.add_argument('--embed', action='store_true', help='Request _embed=true (embedded data is not imported)')
+        parser.add_argument('--offline', action='store_true',
+                            help='Serve REST responses only from the HTTP cache (HTTP_CACHE_DIR); requests every item')
+        parser.add_argument('--no-http-cache', action='store_true', help='Bypass the on-disk HTTP cache')
+        parser.add_argument('--fake-site', action='store_true', help='Import from a local WordPress REST stand-in')
+        parser.add_argument('--benchmark', type=int, default=0, metavar='N',
+                            help='Fetch N synthetic posts from the stand-in (no database access) and report pages/s')
+        parser.add_argument('--latency', type=float, default=0.05, help='Stand-in response delay in seconds')
+        parser.add_argument('--wxr-benchmark', type=int, default=0, metavar='MB',
+                            help='Stream-parse a synthetic WXR export of about MB megabytes and report peak memory')
+        parser.add_argument('--compare-tree', action='store_true', help='With --wxr-benchmark, also load the file with ET.parse')
 
     def handle(self, *args, **options):
         site = (options.get('site') or '').rstrip('/')
         wxr = options.get('wxr')
-        per_page = options['per_page']
         do_posts = options['posts']
         do_pages = options['pages']
         do_tax = options['tax']
@@ -34,219 +65,290 @@ class Command(BaseCommand):
         if not (do_posts or do_pages or do_tax):
             do_posts = do_pages = do_tax = True
 
+        if options['benchmark']:
+            self._benchmark(options)
+            return
+        if options['wxr_benchmark']:
+            self._wxr_benchmark(options['wxr_benchmark'], options['compare_tree'])
+            return
+        if not (wxr or site or options['fake_site']):
+            raise SystemExit("Provide --site for REST or --wxr for file import")
+
         if truncate:
             Page.objects.all().delete()
             Post.objects.all().delete()
             Category.objects.all().delete()
             Tag.objects.all().delete()
 
+        self.resume = options['resume']
+        self.summary: Dict[str, UpsertResult] = {}
+        started = time.monotonic()
         if wxr:
             self._import_wxr(wxr, do_posts, do_pages, do_tax)
-        elif site:
+        elif options['fake_site']:
+            with FakeWordPressServer(latency=options['latency']) as fake:
+                self._import_rest(fake.url, options, do_posts, do_pages, do_tax)
+        else:
+            self._import_rest(site, options, do_posts, do_pages, do_tax)
+
+        self._write_summary(time.monotonic() - started)
+        self.stdout.write(self.style.SUCCESS('Import complete.'))
+
+    def _result(self, kind: str) -> UpsertResult:
+        return self.summary.setdefault(kind, UpsertResult())
+
+    def _write_summary(self, elapsed: float):
+        self.stdout.write(f"{'':<12}{'created':>9}{'updated':>9}{'skipped':>9}{'seconds':>9}")
+        for kind, result in self.summary.items():
+            self.stdout.write(f"{kind:<12}{result.created:>9}{result.updated:>9}{result.skipped:>9}{result.seconds:>9.2f}")
+        self.stdout.write(f"{'total':<12}{'':>27}{elapsed:>9.2f}")
+
+    def _import_rest(self, site: str, options, do_posts: bool, do_pages: bool, do_tax: bool):
+        per_page = options['per_page']
+        # After --truncate every item has to come back, whatever was synced before
+        self.full = options['full'] or options['truncate']
+        # Offline, only the unfiltered collection URLs of an earlier run can be in the cache
+        self.unfiltered = self.full or options['offline']
+        self.site = site.rstrip('/')
+        self.fetched = []
+        self.checkpoints = {}
+        cache = None if options['no_http_cache'] else HttpCache.from_settings(offline=options['offline'])
+        with WordPressClient(site, workers=options['workers'], timeout=options['timeout'], embed=options['embed'],
+                             cache=cache) as self.client:
             if do_tax:
                 self._import_taxonomies(site, per_page)
+                self._save_sync_state()
             if do_pages:
                 self._import_pages(site, per_page)
+                self._save_sync_state()
             if do_posts:
                 self._import_posts(site, per_page)
-        else:
-            raise SystemExit("Provide --site for REST or --wxr for file import")
+                self._save_sync_state()
+        if cache:
+            if not cache.offline:
+                cache.prune()
+            self.stdout.write(cache.summary())
 
-        self.stdout.write(self.style.SUCCESS('Import complete.'))
+    def _fetch_all(self, endpoint: str, per_page: int) -> List[Dict[str, Any]]:
+        """Items changed since the last sync of this collection (every item with --full).
 
-    def _fetch_all(self, url: str, per_page: int) -> List[Dict[str, Any]]:
-        items: List[Dict[str, Any]] = []
-        page = 1
-        while True:
-            r = requests.get(url, params={'per_page': per_page, 'page': page, '_embed': 'true'}, timeout=30)
-            if r.status_code == 400 and 'rest_post_invalid_page_number' in r.text:
-                break
-            r.raise_for_status()
-            batch = r.json()
-            if not batch:
-                break
-            items.extend(batch)
-            if len(batch) < per_page:
-                break
-            page += 1
+        Posts and pages are queried with ``modified_after`` the stored
+        high-water mark; a collection that fit on one page sends its last
+        ETag as If-None-Match (see ``WordPressClient.fetch_all``). Deletions on the WordPress side only show up in a
+        --full run.
+        """
+        state, _ = WordPressSyncState.objects.get_or_create(site=self.site, endpoint=endpoint)
+        params = {}
+        if not self.unfiltered and state.modified_gmt and endpoint in ('posts', 'pages'):
+            # modified_after is exclusive and second-granular; overlap by a
+            # second so items saved in the same second are not missed
+            params['modified_after'] = (state.modified_gmt - datetime.timedelta(seconds=1)).isoformat()
+        items, stats = self.client.fetch_all(endpoint, per_page, params, etag='' if self.unfiltered else state.etag)
+        self.stdout.write(str(stats) + (' since ' + params['modified_after'] if params else ''))
+        self._result(endpoint).seconds += stats.seconds
+        self.fetched.append((state, stats, items))
         return items
 
+    def _write_rows(self, endpoint: str, rows: List[dict], write) -> None:
+        """Write rows with ``write(rows, on_chunk=...)`` in resume-key order, checkpointing the last key written.
+
+        With --resume, rows at or before the interrupted run's last key are
+        skipped; anything modified since then sorts after it and is written.
+        """
+        checkpoint = ImportCheckpoint.start(self.site, endpoint, resume=self.resume)
+        self.checkpoints[endpoint] = checkpoint
+        result = self._result(endpoint)
+        rows = sorted(rows, key=_resume_key)
+        if checkpoint.last_key:
+            todo = [row for row in rows if _resume_key(row) > checkpoint.last_key]
+            result.skipped += len(rows) - len(todo)
+            self.stdout.write(f"  resuming {endpoint}: {len(rows) - len(todo)} already imported")
+            rows = todo
+        result.merge(write(rows, on_chunk=lambda chunk: checkpoint.record(key=_resume_key(chunk[-1]))))
+
+    def _save_sync_state(self):
+        """Advance the high-water marks of the collections imported so far."""
+        for state, stats, items in self.fetched:
+            marks = [m for m in (self._parse_dt(item.get('modified_gmt')) for item in items) if m]
+            if marks and (state.modified_gmt is None or max(marks) > state.modified_gmt):
+                state.modified_gmt = max(marks)
+            state.etag = stats.etag[:255]
+            state.synced_at = timezone.now()
+            state.save()
+            if state.endpoint in self.checkpoints:
+                self.checkpoints.pop(state.endpoint).complete()
+        self.fetched = []
+
+    def _benchmark(self, options):
+        count = options['benchmark']
+        per_page = options['per_page']
+        with FakeWordPressServer(posts=count, latency=options['latency']) as fake:
+            for workers in sorted({1, options['workers']}):
+                with WordPressClient(fake.url, workers=workers, timeout=options['timeout']) as client:
+                    items, stats = client.fetch_all('posts', per_page)
+                in_order = [item['id'] for item in items] == list(range(1, count + 1))
+                self.stdout.write(f"workers={workers}: {stats}{'' if in_order else ' [items out of order]'}")
+
     def _import_taxonomies(self, base: str, per_page: int):
-        cats = self._fetch_all(f"{base}/wp-json/wp/v2/categories", per_page)
-        for c in cats:
-            obj, _ = Category.objects.update_or_create(
-                wp_id=c['id'],
-                defaults={
-                    'name': c.get('name') or '',
-                    'slug': c.get('slug') or slugify(c.get('name') or str(c['id'])),
-                    'description': c.get('description') or '',
-                }
-            )
-        tags = self._fetch_all(f"{base}/wp-json/wp/v2/tags", per_page)
-        for t in tags:
-            obj, _ = Tag.objects.update_or_create(
-                wp_id=t['id'],
-                defaults={
-                    'name': t.get('name') or '',
-                    'slug': t.get('slug') or slugify(t.get('name') or str(t['id'])),
-                    'description': t.get('description') or '',
-                }
-            )
+        for endpoint, model in (('categories', Category), ('tags', Tag)):
+            terms = self._fetch_all(endpoint, per_page)
+            self._result(endpoint).merge(upsert_terms(model, [
+                {'wp_id': t['id'], 'name': t.get('name') or '', 'slug': t.get('slug') or '', 'description': t.get('description') or ''}
+                for t in terms
+            ]))
+
+    def _content_row(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'wp_id': p['id'],
+            'title': (p.get('title') or {}).get('rendered') or '',
+            'slug': p.get('slug') or '',
+            'excerpt_html': (p.get('excerpt') or {}).get('rendered') or '',
+            'content_html': (p.get('content') or {}).get('rendered') or '',
+            'status': p.get('status') or 'publish',
+            'original_url': p.get('link') or '',
+            'published_at': self._parse_dt(p.get('date_gmt')),
+            'modified_at': self._parse_dt(p.get('modified_gmt')),
+        }
 
     def _import_pages(self, base: str, per_page: int):
-        pages = self._fetch_all(f"{base}/wp-json/wp/v2/pages", per_page)
-        cache: Dict[int, Page] = {}
-        # First pass create pages without parents, second pass set parents
+        pages = self._fetch_all('pages', per_page)
+        rows = []
         for p in pages:
-            page_obj = self._upsert_page(base, p, parent=None)
-            cache[p['id']] = page_obj
-        for p in pages:
-            parent_id = p.get('parent')
-            if parent_id:
-                parent = cache.get(parent_id)
-                if parent:
-                    self._upsert_page(base, p, parent=parent)
-
-    def _upsert_page(self, base: str, p: Dict[str, Any], parent: Optional[Page]) -> Page:
-        from urllib.parse import urlparse
-        slug = p.get('slug') or slugify(p.get('title', {}).get('rendered') or str(p['id']))
-        link = p.get('link') or ''
-        parsed = urlparse(link)
-        # Use URL path regardless of host variations; root becomes ''
-        path = (parsed.path or '/').strip('/') or ''
-        if not path:
-            path = ''  # homepage
-        # Fallback to slug for odd cases with no path
-        if path is None:
-            path = slug
-        published = self._parse_dt(p.get('date_gmt'))
-        modified = self._parse_dt(p.get('modified_gmt'))
-        obj, _ = Page.objects.update_or_create(
-            wp_id=p['id'], wp_type='page',
-            defaults={
-                'title': (p.get('title') or {}).get('rendered') or '',
-                'slug': slug[:255],
-                'path': path,
-                'excerpt_html': (p.get('excerpt') or {}).get('rendered') or '',
-                'content_html': (p.get('content') or {}).get('rendered') or '',
-                'menu_order': p.get('menu_order') or 0,
-                'status': p.get('status') or 'publish',
-                'original_url': p.get('link') or '',
-                'published_at': published,
-                'modified_at': modified,
-                'parent': parent,
-            }
-        )
-        return obj
+            row = self._content_row(p)
+            # Use URL path regardless of host variations; the homepage gets its slug
+            row['path'] = (urlparse(p.get('link') or '').path or '/').strip('/')
+            row['menu_order'] = p.get('menu_order') or 0
+            row['parent_wp_id'] = p.get('parent') or None
+            rows.append(row)
+        parents = {row['wp_id']: row['parent_wp_id'] for row in rows}
+        self._write_rows('pages', rows, lambda todo, on_chunk: upsert_pages(todo, force=self.full, link_parents=False, on_chunk=on_chunk))
+        # Every fetched page, including any written before a resume
+        link_page_parents(parents)
 
     def _import_posts(self, base: str, per_page: int):
-        posts = self._fetch_all(f"{base}/wp-json/wp/v2/posts", per_page)
+        posts = self._fetch_all('posts', per_page)
+        rows = []
         for p in posts:
-            slug = p.get('slug') or slugify(p.get('title', {}).get('rendered') or str(p['id']))
-            published = self._parse_dt(p.get('date_gmt'))
-            modified = self._parse_dt(p.get('modified_gmt'))
-            obj, _ = Post.objects.update_or_create(
-                wp_id=p['id'], wp_type='post',
-                defaults={
-                    'title': (p.get('title') or {}).get('rendered') or '',
-                    'slug': slug[:255],
-                    'excerpt_html': (p.get('excerpt') or {}).get('rendered') or '',
-                    'content_html': (p.get('content') or {}).get('rendered') or '',
-                    'status': p.get('status') or 'publish',
-                    'original_url': p.get('link') or '',
-                    'published_at': published,
-                    'modified_at': modified,
-                }
-            )
-            # Categories/Tags relations
-            cat_ids = p.get('categories') or []
-            tag_ids = p.get('tags') or []
-            if cat_ids:
-                obj.categories.set(list(Category.objects.filter(wp_id__in=cat_ids)))
-            if tag_ids:
-                obj.tags.set(list(Tag.objects.filter(wp_id__in=tag_ids)))
+            row = self._content_row(p)
+            row['categories'] = p.get('categories') or []
+            row['tags'] = p.get('tags') or []
+            rows.append(row)
+        self._write_rows('posts', rows, lambda todo, on_chunk: upsert_posts(todo, force=self.full, on_chunk=on_chunk))
 
     def _parse_dt(self, s: Optional[str]):
-        if not s:
-            return None
-        try:
-            return datetime.datetime.fromisoformat(s.replace('Z', '+00:00')).astimezone(timezone.utc)
-        except Exception:
-            return None
-
-    def _import_wxr(self, path: str, do_posts: bool, do_pages: bool, do_tax: bool):
-        ns = {
-            'wp': 'http://wordpress.org/export/1.2/',
-            'content': 'http://purl.org/rss/1.0/modules/content/',
-            'dc': 'http://purl.org/dc/elements/1.1/',
+        return parse_gmt(s)
+
+    def _import_wxr(self, path: str, do_posts: bool, do_pages: bool, do_tax: bool, batch_size: int = 500):
+        """Stream the export one record at a time, writing pages and posts in batches.
+
+        After each batch the checkpoint records how many items have been
+        handled; --resume skips that many items before writing again.
+        """
+        checkpoint = ImportCheckpoint.start(os.path.abspath(path), 'wxr', resume=self.resume)
+        done = checkpoint.position
+        if done:
+            self.stdout.write(f"  resuming after item {done}")
+        terms = {'category': [], 'tag': []}
+        term_ids = None  # slug -> wp_id per taxonomy, built once the terms are read
+        pages, posts = [], []
+        parents = {}
+        index = 0
+
+        def flush():
+            if pages:
+                self._result('pages').merge(upsert_pages(pages, link_parents=False))
+                pages.clear()
+            if posts:
+                self._result('posts').merge(upsert_posts(posts))
+                posts.clear()
+            checkpoint.record(position=index)
+
+        for kind, row in iter_wxr(path):
+            if kind in terms:
+                terms[kind].append(row)
+                continue
+            if term_ids is None:
+                # WXR lists every term before the first item
+                term_ids = self._wxr_terms(terms, do_tax)
+            index += 1
+            if not row['wp_id']:
+                continue
+            if row['post_type'] == 'page' and do_pages:
+                # Parents of pages written before an interruption are still linked at the end
+                parents[row['wp_id']] = row['parent_wp_id']
+                if index <= done:
+                    self._result('pages').skipped += 1
+                    continue
+                row['path'] = (row['link'] or row['slug']).split('//')[-1].split('/', 1)[-1].strip('/')
+                pages.append(row)
+            elif row['post_type'] == 'post' and do_posts:
+                if index <= done:
+                    self._result('posts').skipped += 1
+                    continue
+                row['categories'] = [term_ids['category'][s] for s in row['category_slugs'] if s in term_ids['category']]
+                row['tags'] = [term_ids['tag'][s] for s in row['tag_slugs'] if s in term_ids['tag']]
+                posts.append(row)
+            else:
+                continue
+            if len(pages) + len(posts) >= batch_size:
+                flush()
+        if term_ids is None:
+            self._wxr_terms(terms, do_tax)
+        flush()
+        link_page_parents(parents)
+        checkpoint.complete()
+
+    def _wxr_terms(self, terms, do_tax: bool) -> Dict[str, Dict[str, int]]:
+        for kind, model, endpoint in (('category', Category, 'categories'), ('tag', Tag, 'tags')):
+            if do_tax:
+                self._result(endpoint).merge(upsert_terms(model, terms[kind]))
+        return {
+            kind: {row['slug'] or slugify(row['name']): row['wp_id'] for row in rows if row['wp_id'] is not None}
+            for kind, rows in terms.items()
         }
-        tree = ET.parse(path)
-        root = tree.getroot()
-        channel = root.find('channel')
-        if channel is None:
-            return
-        if do_tax:
-            for cat in channel.findall('wp:category', ns):
-                name = (cat.findtext('wp:cat_name', default='') or '').strip()
-                slug = (cat.findtext('wp:category_nicename', default='') or '').strip()
-                term_id = cat.findtext('wp:term_id')
-                wp_id = int(term_id) if term_id and term_id.isdigit() else None
-                if name:
-                    Category.objects.update_or_create(
-                        wp_id=wp_id,
-                        defaults={'name': name, 'slug': slug or slugify(name)},
-                    )
-            for tag in channel.findall('wp:tag', ns):
-                name = (tag.findtext('wp:tag_name', default='') or '').strip()
-                slug = (tag.findtext('wp:tag_slug', default='') or '').strip()
-                term_id = tag.findtext('wp:term_id')
-                wp_id = int(term_id) if term_id and term_id.isdigit() else None
-                if name:
-                    Tag.objects.update_or_create(
-                        wp_id=wp_id,
-                        defaults={'name': name, 'slug': slug or slugify(name)},
-                    )
-        for item in channel.findall('item'):
-            post_type = item.findtext('wp:post_type', default='', namespaces=ns)
-            status = item.findtext('wp:status', default='publish', namespaces=ns)
-            title = item.findtext('title', default='')
-            link = item.findtext('link', default='')
-            content_html = item.findtext('content:encoded', default='', namespaces=ns) or ''
-            excerpt_html = item.findtext('excerpt:encoded', default='', namespaces=ns) or ''
-            post_id_text = item.findtext('wp:post_id', default='', namespaces=ns)
-            post_id = int(post_id_text) if post_id_text.isdigit() else None
-            date = item.findtext('wp:post_date_gmt', default='', namespaces=ns) or None
-            modified = item.findtext('wp:post_modified_gmt', default='', namespaces=ns) or None
-            published_at = self._parse_dt(date)
-            modified_at = self._parse_dt(modified)
-            slug = item.findtext('wp:post_name', default='', namespaces=ns) or slugify(title)
-
-            if post_type == 'page' and do_pages and post_id:
-                Page.objects.update_or_create(
-                    wp_id=post_id, wp_type='page',
-                    defaults={
-                        'title': title,
-                        'slug': slug[:255],
-                        'path': (link or slug).split('//')[-1].split('/', 1)[-1].strip('/'),
-                        'excerpt_html': excerpt_html,
-                        'content_html': content_html,
-                        'status': status,
-                        'original_url': link or '',
-                        'published_at': published_at,
-                        'modified_at': modified_at,
-                    }
-                )
-            elif post_type == 'post' and do_posts and post_id:
-                post, _ = Post.objects.update_or_create(
-                    wp_id=post_id, wp_type='post',
-                    defaults={
-                        'title': title,
-                        'slug': slug[:255],
-                        'excerpt_html': excerpt_html,
-                        'content_html': content_html,
-                        'status': status,
-                        'original_url': link or '',
-                        'published_at': published_at,
-                        'modified_at': modified_at,
-                    }
-                )
+
+    def _wxr_benchmark(self, megabytes: int, compare_tree: bool):
+        """Peak RSS while streaming a synthetic export (and, with --compare-tree, while loading it whole)."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'synthetic.xml')
+            started = time.monotonic()
+            items = write_synthetic_wxr(path, megabytes * 1024 * 1024)
+            size = os.path.getsize(path) / 1024 / 1024
+            self.stdout.write(f"Wrote {size:.0f} MB, {items} items in {time.monotonic() - started:.1f}s")
+
+            before = _peak_rss_mb()
+            started = time.monotonic()
+            counts = {}
+            for kind, row in iter_wxr(path):
+                key = row.get('post_type') or kind
+                counts[key] = counts.get(key, 0) + 1
+            self.stdout.write(
+                f"iterparse: {counts} in {time.monotonic() - started:.1f}s, "
+                f"peak RSS {_format_rss(_peak_rss_mb())} (was {_format_rss(before)} before parsing)"
+            )
+            if compare_tree:
+                started = time.monotonic()
+                tree = ET.parse(path)
+                found = len(tree.getroot().findall('channel/item'))
+                del tree
+                self.stdout.write(f"ET.parse: {found} items in {time.monotonic() - started:.1f}s, peak RSS {_format_rss(_peak_rss_mb())}")
+
+
+def _resume_key(row: dict):
+    # Items without a modified date (never from WordPress itself) sort first
+    return row['modified_at'] or _NO_DATE, row['wp_id']
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, or None where ``resource`` does not exist (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KiB on Linux
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _format_rss(mb: Optional[float]) -> str:
+    return f"{mb:.0f} MB" if mb is not None else "n/a"
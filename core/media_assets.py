@@ -0,0 +1,208 @@
+"""Content-addressed media store shared by ``import_media`` and the ``scripts/`` downloaders.
+
+``MediaLibrary.resolve(urls)`` maps each URL to a ``MediaAsset``:
+
+* URLs already in ``MediaAssetURL`` are answered from the table (one indexed
+  query per 500 URLs), without touching the network or storage;
+* the rest are fetched on a bounded thread pool over one pooled session,
+  hashed while streaming, measured with Pillow when they are images, and
+  saved through ``default_storage`` as ``imported/<sha256 prefix>/<filename>``
+  unless an asset with the same hash already exists. Identical files from
+  different URLs (or the same basename in different upload months) are
+  therefore stored once and never collide;
+* new assets and URL rows are then written in bulk from the calling thread.
+
+The scripts use the same table through ``fetch`` / ``resolve`` and copy the
+stored files to their ``static/`` locations with ``copy_to``.
+
+Workers read the table to find existing hashes and close their connections
+after each file, like the image derivative workers in ``profiles.images``.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image
+
+from .models import MediaAsset, MediaAssetURL
+
+# Storage keys are MEDIA_PREFIX/<first 16 hex of sha256>/<original filename>
+MEDIA_PREFIX = 'imported'
+CHUNK_BYTES = 256 * 1024
+SPOOL_BYTES = 8 * 1024 * 1024
+BATCH_SIZE = 500
+
+
+@dataclass
+class Fetched:
+    url: str
+    sha256: str
+    storage_key: str
+    content_type: str
+    size: int
+    width: Optional[int]
+    height: Optional[int]
+    uploaded: bool
+
+
+@dataclass
+class ResolveStats:
+    known: int = 0
+    fetched: int = 0
+    downloaded_bytes: int = 0
+    uploaded: int = 0
+    uploaded_bytes: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        # The rate is what came over the network, including files already stored under another URL
+        downloaded = self.downloaded_bytes / 1024 / 1024
+        uploaded = self.uploaded_bytes / 1024 / 1024
+        rate = (f"{self.fetched / self.seconds:.1f} files/s, {downloaded / self.seconds:.2f} MB/s"
+                if self.seconds else "0.0 files/s")
+        return (f"{self.known} known, fetched {self.fetched} ({downloaded:.1f} MB; "
+                f"{self.uploaded} new files, {uploaded:.1f} MB) "
+                f"in {self.seconds:.2f}s ({rate})" + (f", {self.failed} failed" if self.failed else ''))
+
+
+def filename_for(url: str) -> str:
+    return os.path.basename(urlparse(url).path) or 'file'
+
+
+def _dimensions(body) -> tuple:
+    body.seek(0)
+    try:
+        with Image.open(body) as image:
+            return image.size
+    except Exception:
+        # SVG, fonts, CSS and anything else Pillow does not read
+        return None, None
+
+
+class MediaLibrary:
+    def __init__(self, session: Optional[requests.Session] = None, workers: int = 8, headers: Optional[dict] = None,
+                 timeout: float = 30.0, on_error=None):
+        self.session = session or requests.Session()
+        self.workers = max(1, workers)
+        self.headers = headers
+        self.timeout = timeout
+        self.on_error = on_error or (lambda url, exc: None)
+        self._lock = threading.Lock()
+        self._claimed: Dict[str, str] = {}  # sha256 -> storage key chosen in this process
+
+    def lookup(self, urls: Iterable[str]) -> Dict[str, MediaAsset]:
+        """Assets already recorded for these URLs."""
+        urls = list(dict.fromkeys(urls))
+        found = {}
+        for start in range(0, len(urls), BATCH_SIZE):
+            rows = MediaAssetURL.objects.filter(url__in=urls[start:start + BATCH_SIZE]).select_related('asset')
+            found.update((row.url, row.asset) for row in rows)
+        return found
+
+    def resolve(self, urls: Iterable[str]):
+        """``({url: MediaAsset}, ResolveStats)``; URLs that could not be fetched are left out."""
+        stats = ResolveStats()
+        started = time.monotonic()
+        urls = list(dict.fromkeys(urls))
+        assets = self.lookup(urls)
+        stats.known = len(assets)
+        todo = [url for url in urls if url not in assets]
+        if todo:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(todo)), thread_name_prefix='media-fetch') as pool:
+                fetched = [f for f in pool.map(self._fetch_in_worker, todo) if f]
+            stats.fetched = len(fetched)
+            stats.failed = len(todo) - len(fetched)
+            stats.downloaded_bytes = sum(f.size for f in fetched)
+            stats.uploaded = sum(1 for f in fetched if f.uploaded)
+            stats.uploaded_bytes = sum(f.size for f in fetched if f.uploaded)
+            assets.update(self._record(fetched))
+        stats.seconds = time.monotonic() - started
+        return assets, stats
+
+    def fetch(self, url: str) -> Optional[MediaAsset]:
+        return self.resolve([url])[0].get(url)
+
+    @staticmethod
+    def copy_to(asset: MediaAsset, dest) -> None:
+        """Write the stored file to a local path (scripts that vendor files under static/)."""
+        os.makedirs(os.path.dirname(os.fspath(dest)), exist_ok=True)
+        with default_storage.open(asset.storage_key, 'rb') as src, open(dest, 'wb') as out:
+            shutil.copyfileobj(src, out)
+
+    def _record(self, fetched: List[Fetched]) -> Dict[str, MediaAsset]:
+        by_hash = {f.sha256: f for f in fetched}
+        MediaAsset.objects.bulk_create(
+            [MediaAsset(sha256=f.sha256, storage_key=f.storage_key, content_type=f.content_type, size=f.size,
+                        width=f.width, height=f.height) for f in by_hash.values()],
+            ignore_conflicts=True,
+            batch_size=BATCH_SIZE,
+        )
+        # ignore_conflicts does not return primary keys
+        assets = {}
+        hashes = list(by_hash)
+        for start in range(0, len(hashes), BATCH_SIZE):
+            assets.update((a.sha256, a) for a in MediaAsset.objects.filter(sha256__in=hashes[start:start + BATCH_SIZE]))
+        MediaAssetURL.objects.bulk_create(
+            [MediaAssetURL(url=f.url, asset=assets[f.sha256]) for f in fetched],
+            update_conflicts=True,
+            unique_fields=['url'],
+            update_fields=['asset'],
+            batch_size=BATCH_SIZE,
+        )
+        return {f.url: assets[f.sha256] for f in fetched}
+
+    def _fetch_in_worker(self, url: str) -> Optional[Fetched]:
+        try:
+            return self._fetch(url)
+        except Exception as exc:
+            self.on_error(url, exc)
+            return None
+        finally:
+            # Worker threads hold their own connections; don't leave them open
+            connections.close_all()
+
+    def _fetch(self, url: str) -> Fetched:
+        digest = hashlib.sha256()
+        # Large files spill to disk, and storages that upload in parts read them from there
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as body:
+            with self.session.get(url, headers=self.headers, timeout=self.timeout, stream=True) as r:
+                r.raise_for_status()
+                content_type = r.headers.get('Content-Type', '').split(';')[0].strip()
+                for block in r.iter_content(CHUNK_BYTES):
+                    digest.update(block)
+                    body.write(block)
+            size = body.tell()
+            sha256 = digest.hexdigest()
+            filename = filename_for(url)
+            content_type = content_type or mimetypes.guess_type(filename)[0] or ''
+            width, height = _dimensions(body)
+            key, new = self._claim(sha256, filename)
+            uploaded = False
+            if new and not default_storage.exists(key):
+                body.seek(0)
+                key = default_storage.save(key, File(body, name=filename))
+                uploaded = True
+            return Fetched(url, sha256, key, content_type, size, width, height, uploaded)
+
+    def _claim(self, sha256: str, filename: str):
+        """(storage key for this content, whether this call should store it)."""
+        with self._lock:
+            if sha256 in self._claimed:
+                return self._claimed[sha256], False
+            existing = MediaAsset.objects.filter(sha256=sha256).values_list('storage_key', flat=True).first()
+            key = existing or f"{MEDIA_PREFIX}/{sha256[:16]}/{filename}"
+            self._claimed[sha256] = key
+            return key, existing is None
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# (index, table, column): gin_trgm_ops indexes serving the Page and Post admin search
+INDEXES = [
+    ('core_page_title_trgm', 'core_page', 'title'),
+    ('core_page_path_trgm', 'core_page', 'path'),
+    ('core_page_content_html_trgm', 'core_page', 'content_html'),
+    ('core_page_seo_title_trgm', 'core_page', 'seo_title'),
+    ('core_page_seo_description_trgm', 'core_page', 'seo_description'),
+    ('core_page_seo_keywords_trgm', 'core_page', 'seo_keywords'),
+    ('core_post_title_trgm', 'core_post', 'title'),
+    ('core_post_content_html_trgm', 'core_post', 'content_html'),
+    ('core_post_seo_title_trgm', 'core_post', 'seo_title'),
+    ('core_post_seo_description_trgm', 'core_post', 'seo_description'),
+    ('core_post_seo_keywords_trgm', 'core_post', 'seo_keywords'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    # Trigram indexes are PostgreSQL-only; SQLite keeps Django's default search
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in INDEXES:
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING gin ("{column}" gin_trgm_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_alter_service_excerpt'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
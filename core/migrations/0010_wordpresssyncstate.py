@@ -0,0 +1,27 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordPressSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.CharField(max_length=500)),
+                ('endpoint', models.CharField(max_length=50)),
+                ('modified_gmt', models.DateTimeField(blank=True, help_text='Latest modified_gmt imported from this collection', null=True)),
+                ('etag', models.CharField(blank=True, help_text='ETag of the last first-page response, sent as If-None-Match', max_length=255)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('site', 'endpoint')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_wordpresssyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the imported WordPress fields; unchanged items are skipped', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the imported WordPress fields; unchanged items are skipped', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Site URL or WXR file path', max_length=500)),
+                ('content_type', models.CharField(max_length=50)),
+                ('status', models.CharField(default='running', max_length=20)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('processed_ids', models.JSONField(blank=True, default=list)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('source', 'content_type')},
+            },
+        ),
+    ]
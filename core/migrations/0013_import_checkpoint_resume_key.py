@@ -0,0 +1,27 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_media_assets'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='importcheckpoint',
+            name='processed_ids',
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='last_modified',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='last_wp_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -53,6 +53,7 @@ class Page(Timestamped):
 	modified_at = models.DateTimeField(null=True, blank=True)
 	wp_id = models.IntegerField(db_index=True)
 	wp_type = models.CharField(max_length=50, default='page')
+	content_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="Hash of the imported WordPress fields; unchanged items are skipped")
 
 	class Meta:
 		unique_together = (('wp_id', 'wp_type'),)
@@ -89,6 +90,7 @@ class Post(Timestamped):
 	tags = models.ManyToManyField(Tag, blank=True)
 	wp_id = models.IntegerField(db_index=True)
 	wp_type = models.CharField(max_length=50, default='post')
+	content_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="Hash of the imported WordPress fields; unchanged items are skipped")
 	# Optional per-post SEO overrides
 	seo_title = models.CharField(max_length=255, blank=True, help_text="Overrides the post title tag if set")
 	seo_description = models.CharField(max_length=300, blank=True, help_text="Overrides meta description if set")
@@ -132,3 +134,112 @@ class Service(Timestamped):
 		if not self.slug:
 			self.slug = slugify(self.title)[:200]
 		super().save(*args, **kwargs)
+
+
+class WordPressSyncState(models.Model):
+	"""High-water mark for incremental ``import_wordpress`` runs, one row per site and REST collection."""
+	site = models.CharField(max_length=500)
+	endpoint = models.CharField(max_length=50)
+	modified_gmt = models.DateTimeField(null=True, blank=True, help_text="Latest modified_gmt imported from this collection")
+	etag = models.CharField(max_length=255, blank=True, help_text="ETag of the last first-page response, sent as If-None-Match")
+	synced_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		unique_together = (('site', 'endpoint'),)
+
+	def __str__(self):
+		return f"{self.site} {self.endpoint}"
+
+
+class ImportCheckpoint(models.Model):
+	"""Progress of an ``import_wordpress`` run, so ``--resume`` can continue after a failure.
+
+	``position`` is the number of WXR items already written. REST imports
+	write each collection in ``(modified_gmt, wp_id)`` order and keep the last
+	key written instead, since page offsets shift as content changes; items
+	modified after the interruption sort after it and are written again.
+	"""
+	RUNNING = 'running'
+	COMPLETE = 'complete'
+
+	source = models.CharField(max_length=500, help_text="Site URL or WXR file path")
+	content_type = models.CharField(max_length=50)
+	status = models.CharField(max_length=20, default=RUNNING)
+	position = models.PositiveIntegerField(default=0)
+	last_modified = models.DateTimeField(null=True, blank=True)
+	last_wp_id = models.IntegerField(null=True, blank=True)
+	started_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		unique_together = (('source', 'content_type'),)
+
+	def __str__(self):
+		return f"{self.source} {self.content_type} ({self.status})"
+
+	@classmethod
+	def start(cls, source, content_type, resume=False):
+		"""The checkpoint to continue from with ``resume``, else a fresh one."""
+		checkpoint, created = cls.objects.get_or_create(source=source, content_type=content_type)
+		if created or (resume and checkpoint.status == cls.RUNNING):
+			return checkpoint
+		checkpoint.status = cls.RUNNING
+		checkpoint.position = 0
+		checkpoint.last_modified = checkpoint.last_wp_id = None
+		checkpoint.save()
+		return checkpoint
+
+	@property
+	def last_key(self):
+		"""``(modified, wp_id)`` of the last REST item written, or None."""
+		return None if self.last_wp_id is None else (self.last_modified, self.last_wp_id)
+
+	def record(self, position=None, key=None):
+		fields = ['updated_at']
+		if position is not None:
+			self.position = position
+			fields.append('position')
+		if key is not None:
+			self.last_modified, self.last_wp_id = key
+			fields += ['last_modified', 'last_wp_id']
+		self.save(update_fields=fields)
+
+	def complete(self):
+		self.status = self.COMPLETE
+		self.save(update_fields=['status', 'updated_at'])
+
+
+class MediaAsset(Timestamped):
+	"""A downloaded media file, stored once per content hash through ``default_storage``.
+
+	Every URL it was fetched from is a ``MediaAssetURL`` row, so importers and
+	scripts resolve URLs with an indexed lookup instead of downloading or
+	checking storage again (see ``core.media_assets``).
+	"""
+	sha256 = models.CharField(max_length=64, unique=True)
+	storage_key = models.CharField(max_length=500, help_text="Name in default_storage")
+	content_type = models.CharField(max_length=100, blank=True)
+	size = models.PositiveBigIntegerField(default=0, help_text="Bytes")
+	width = models.PositiveIntegerField(null=True, blank=True)
+	height = models.PositiveIntegerField(null=True, blank=True)
+
+	def __str__(self):
+		return self.storage_key
+
+	@property
+	def url(self):
+		from django.core.files.storage import default_storage
+		return default_storage.url(self.storage_key)
+
+
+class MediaAssetURL(models.Model):
+	"""An original URL a ``MediaAsset`` was downloaded from."""
+	url = models.CharField(max_length=2000, unique=True)
+	asset = models.ForeignKey(MediaAsset, on_delete=models.CASCADE, related_name='urls')
+	created = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		verbose_name = "media asset URL"
+
+	def __str__(self):
+		return self.url
@@ -1,3 +1,470 @@
-from django.test import TestCase
+import functools
+import io
+import os
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import requests
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .management.commands import import_media, import_wordpress
+from .http_cache import CacheMiss, HttpCache, cached_session
+from .media_assets import MediaLibrary
+from .models import Category, ImportCheckpoint, MediaAsset, Page, Post
+from .wordpress import FakeWordPressServer, WordPressClient
+from .wordpress_import import upsert_posts, upsert_terms
+from .wxr import iter_wxr
+
+
+class FetchAllTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.wp = FakeWordPressServer(posts=45, pages=3, categories=5, tags=25)
+        cls.wp.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.wp.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.wp.fail(0)
+        self.client = WordPressClient(self.wp.url, workers=4, timeout=5, retries=2)
+        self.addCleanup(self.client.close)
+        self.served = self.wp.requests
+
+    def requests_made(self) -> int:
+        return self.wp.requests - self.served
+
+    def test_pages_are_fetched_concurrently_in_order(self):
+        items, stats = self.client.fetch_all('posts', per_page=10)
+        self.assertEqual([item['id'] for item in items], list(range(1, 46)))
+        self.assertEqual((stats.items, stats.pages, stats.total), (45, 5, 45))
+        self.assertEqual(self.requests_made(), 5)
+
+    def test_single_page(self):
+        items, stats = self.client.fetch_all('pages', per_page=10)
+        self.assertEqual(len(items), 3)
+        self.assertEqual(stats.pages, 1)
+
+    def test_modified_after(self):
+        self.client.fetch_all('posts', per_page=10)
+        self.wp.touch('posts', 7, 31)
+        items, stats = self.client.fetch_all('posts', per_page=10, params={'modified_after': '2030-01-01T00:00:00'})
+        self.assertEqual(items, [])
+        items, _ = self.client.fetch_all('posts', per_page=10, params={'modified_after': '2021-01-01T00:00:00'})
+        self.assertEqual([item['id'] for item in items], [7, 31])
+
+    def test_retries_server_errors(self):
+        self.wp.fail(2)
+        items, stats = self.client.fetch_all('posts', per_page=10)
+        self.assertEqual(len(items), 45)
+        self.assertEqual(self.requests_made(), 7)
+
+    def test_gives_up_after_retries(self):
+        self.wp.fail(10)
+        with self.assertRaises(requests.RequestException):
+            self.client.fetch_all('posts', per_page=10)
+
+    def test_not_modified(self):
+        items, stats = self.client.fetch_all('categories', per_page=10)
+        self.assertEqual(len(items), 5)
+        self.assertTrue(stats.etag)
+        items, again = self.client.fetch_all('categories', per_page=10, etag=stats.etag)
+        self.assertEqual(items, [])
+        self.assertTrue(again.not_modified)
+        self.assertEqual(again.etag, stats.etag)
+        self.assertEqual(self.requests_made(), 2)
+
+    def test_stale_etag_refetches(self):
+        items, stats = self.client.fetch_all('categories', per_page=10, etag='"stale"')
+        self.assertEqual(len(items), 5)
+        self.assertFalse(stats.not_modified)
+
+    def test_no_etag_for_multi_page_collections(self):
+        # A 304 on page 1 says nothing about tags 11-25
+        items, stats = self.client.fetch_all('tags', per_page=10)
+        self.assertEqual(len(items), 25)
+        self.assertEqual(stats.etag, '')
+        # Nor for a full first page, which may have a second page later
+        _, stats = self.client.fetch_all('categories', per_page=5)
+        self.assertEqual(stats.etag, '')
+
+
+class Interrupted(Exception):
+    pass
+
+
+class ImportWordPressTests(TestCase):
+    def setUp(self):
+        self.wp = FakeWordPressServer(posts=45, pages=3, categories=5, tags=7)
+        self.wp.__enter__()
+        self.addCleanup(self.wp.__exit__, None, None, None)
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command('import_wordpress', '--site', self.wp.url, '--no-http-cache', '--per-page', '10', *args, stdout=out)
+        return out.getvalue()
+
+    def summary(self, output, kind):
+        """(created, updated, skipped) from the summary table."""
+        line = next(line for line in output.splitlines() if line.startswith(kind + ' '))
+        return tuple(int(n) for n in line.split()[1:4])
+
+    def test_incremental_sync_writes_only_touched_items(self):
+        output = self.run_import()
+        self.assertEqual(self.summary(output, 'posts'), (45, 0, 0))
+        self.assertEqual(self.summary(output, 'pages'), (3, 0, 0))
+        untouched = dict(Post.objects.values_list('wp_id', 'updated'))
+
+        self.wp.touch('posts', 3, 17)
+        self.wp.touch('pages', 2)
+        output = self.run_import()
+        # The one-second overlap refetches the previous newest item, which is skipped unchanged
+        self.assertEqual(self.summary(output, 'posts'), (0, 2, 1))
+        self.assertEqual(self.summary(output, 'pages'), (0, 1, 1))
+        # Both collections were queried with modified_after
+        self.assertEqual(len([line for line in output.splitlines() if line.startswith(('posts:', 'pages:')) and ' since ' in line]), 2)
+        rewritten = {wp_id for wp_id, updated in Post.objects.values_list('wp_id', 'updated') if updated != untouched[wp_id]}
+        self.assertEqual(rewritten, {3, 17})
+
+        # Nothing changed since: nothing is written
+        output = self.run_import()
+        self.assertEqual(self.summary(output, 'posts')[:2], (0, 0))
+        self.assertEqual(self.summary(output, 'pages')[:2], (0, 0))
+
+    def test_help_mentions_deletions(self):
+        out = io.StringIO()
+        with self.assertRaises(SystemExit), mock.patch('sys.stdout', out):
+            call_command('import_wordpress', '--help')
+        self.assertIn('deleted on WordPress are only picked up by --full', ' '.join(out.getvalue().split()))
+
+    def test_resume_writes_every_item_once(self):
+        chunks = []
+
+        def interrupted_upsert(rows, on_chunk=None, **kwargs):
+            def stop_after_two(chunk):
+                on_chunk(chunk)
+                chunks.append([row['wp_id'] for row in chunk])
+                if len(chunks) == 2:
+                    raise Interrupted
+            return upsert_posts(rows, batch_size=10, on_chunk=stop_after_two, **kwargs)
+
+        with mock.patch.object(import_wordpress, 'upsert_posts', interrupted_upsert), self.assertRaises(Interrupted):
+            self.run_import('--posts')
+        written = chunks[0] + chunks[1]
+        self.assertEqual(sorted(Post.objects.values_list('wp_id', flat=True)), sorted(written))
+        checkpoint = ImportCheckpoint.objects.get(content_type='posts')
+        self.assertEqual((checkpoint.status, checkpoint.last_wp_id), (ImportCheckpoint.RUNNING, written[-1]))
+
+        # A post written before the interruption changes, and one that was not written yet
+        self.wp.touch('posts', written[0], 45)
+        output = self.run_import('--posts', '--resume')
+        self.assertEqual(self.summary(output, 'posts'), (25, 1, 19))
+        self.assertEqual(sorted(Post.objects.values_list('wp_id', flat=True)), list(range(1, 46)))
+        self.assertEqual(ImportCheckpoint.objects.get(content_type='posts').status, ImportCheckpoint.COMPLETE)
+
+        # Without --resume the checkpoint starts over (--full rewrites every post)
+        self.assertEqual(self.summary(self.run_import('--posts', '--full'), 'posts'), (0, 45, 0))
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(directory):
+    """Static file server for ``directory``: (server, base URL)."""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, 'http://%s:%s' % httpd.server_address[:2]
+
+
+class HttpCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        (Path(cls.root.name) / 'big.bin').write_bytes(os.urandom(3 * 1024 * 1024))
+        (Path(cls.root.name) / 'small.txt').write_text('hello')
+        cls.httpd, cls.base = _serve(cls.root.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.cache = HttpCache(self.dir.name)
+
+    def get(self, name, cache=None, **kwargs):
+        with cached_session(cache or self.cache) as session:
+            return session.get(f"{self.base}/{name}", timeout=5, **kwargs)
+
+    def entries(self):
+        return sorted(p.suffix for p in Path(self.dir.name).glob('*/*'))
+
+    def test_streamed_body_is_cached_once_read(self):
+        expected = (Path(self.root.name) / 'big.bin').read_bytes()
+        with self.get('big.bin', stream=True) as r:
+            self.assertFalse(r.from_cache)
+            self.assertEqual(self.entries(), [])
+            body = b''.join(r.iter_content(64 * 1024))
+        self.assertEqual(body, expected)
+        self.assertEqual(self.entries(), ['.body', '.json'])
+
+        offline = HttpCache(self.dir.name, offline=True)
+        with self.get('big.bin', cache=offline, stream=True) as r:
+            self.assertTrue(r.from_cache)
+            self.assertEqual(b''.join(r.iter_content(64 * 1024)), expected)
+        self.assertEqual(offline.hits, 1)
+
+    def test_partly_read_body_is_not_cached(self):
+        with self.get('big.bin', stream=True) as r:
+            next(r.iter_content(1024))
+        self.assertEqual(self.entries(), [])
+        self.assertEqual([p.name for p in Path(self.dir.name).glob('*/.tmp-*')], [])
+
+    def test_revalidation_and_offline_miss(self):
+        self.assertEqual(self.get('small.txt').text, 'hello')
+        r = self.get('small.txt')
+        self.assertEqual((r.status_code, r.text, r.from_cache), (200, 'hello', True))
+        self.assertEqual((self.cache.misses, self.cache.revalidated), (1, 1))
+        with self.assertRaises(CacheMiss):
+            self.get('big.bin', cache=HttpCache(self.dir.name, offline=True))
+
+    def test_prune(self):
+        small, big = (self.get(name).request for name in ('small.txt', 'big.bin'))
+        small, big = (self.cache.key('GET', r.url, r.headers) for r in (small, big))
+        # small.txt was last used a week ago
+        week_ago = time.time() - 7 * 86400
+        os.utime(self.cache._paths(small)[0], (week_ago, week_ago))
+        self.assertEqual(self.cache.prune(max_age=30 * 86400, max_bytes=0), 0)
+        self.assertEqual(self.cache.prune(max_age=86400, max_bytes=0), 1)
+        self.assertIsNone(self.cache.load(small))
+        self.assertIsNotNone(self.cache.load(big))
+        self.assertEqual(self.cache.prune(max_age=0, max_bytes=1024 * 1024), 1)
+        self.assertEqual(self.entries(), [])
+
+
+class UpsertTermsTests(TestCase):
+    def counts(self, rows):
+        result = upsert_terms(Category, [dict(row) for row in rows])
+        return result.created, result.updated, result.skipped
+
+    def test_rerun_is_unchanged(self):
+        rows = [
+            {'wp_id': 1, 'name': 'News', 'slug': 'news', 'description': ''},
+            {'wp_id': 2, 'name': 'Events', 'slug': '', 'description': 'Upcoming'},
+            # WXR terms may come without an id
+            {'wp_id': None, 'name': 'Anxiety', 'slug': 'anxiety', 'description': ''},
+        ]
+        self.assertEqual(self.counts(rows), (3, 0, 0))
+        self.assertEqual(self.counts(rows), (0, 0, 3))
+        rows[1]['description'] = 'Past and upcoming'
+        self.assertEqual(self.counts(rows), (0, 1, 2))
+        self.assertEqual(Category.objects.count(), 3)
+
+    def test_existing_slug_is_adopted_as_an_update(self):
+        Category.objects.create(name='News', slug='news')
+        self.assertEqual(self.counts([{'wp_id': 7, 'name': 'News', 'slug': 'news', 'description': ''}]), (0, 1, 0))
+        self.assertEqual(Category.objects.get().wp_id, 7)
+        self.assertEqual(self.counts([{'wp_id': 7, 'name': 'News', 'slug': 'news', 'description': ''}]), (0, 0, 1))
+        # A term without an id leaves the adopted wp_id alone
+        self.assertEqual(self.counts([{'wp_id': None, 'name': 'News', 'slug': 'news', 'description': ''}]), (0, 0, 1))
+        self.assertEqual(Category.objects.get().wp_id, 7)
+
+
+WXR_SAMPLE = """<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0" xmlns:excerpt="http://wordpress.org/export/1.2/excerpt/"
+    xmlns:content="http://purl.org/rss/1.0/modules/content/" xmlns:wp="http://wordpress.org/export/1.2/">
+<channel>
+    <title>Sample</title>
+    <image><item>not a record</item></image>
+    <wp:category><wp:term_id>3</wp:term_id><wp:category_nicename>news</wp:category_nicename>
+        <wp:cat_name><![CDATA[News]]></wp:cat_name></wp:category>
+    <wp:tag><wp:term_id>9</wp:term_id><wp:tag_slug>grief</wp:tag_slug><wp:tag_name>Grief</wp:tag_name></wp:tag>
+    <item>
+        <title>Hello</title>
+        <link>https://example.com/hello/</link>
+        <content:encoded><![CDATA[  <p>Body</p>
+]]></content:encoded>
+        <excerpt:encoded><![CDATA[Short]]></excerpt:encoded>
+        <wp:post_id>12</wp:post_id>
+        <wp:post_date_gmt>2024-01-02 03:04:05</wp:post_date_gmt>
+        <wp:post_modified_gmt>0000-00-00 00:00:00</wp:post_modified_gmt>
+        <wp:post_name>hello</wp:post_name>
+        <wp:status>draft</wp:status>
+        <wp:post_parent>0</wp:post_parent>
+        <wp:post_type>post</wp:post_type>
+        <category domain="category" nicename="news"><![CDATA[News]]></category>
+        <category domain="post_tag" nicename="grief"><![CDATA[Grief]]></category>
+        <wp:postmeta><wp:meta_key>nested</wp:meta_key><item>inner</item>
+            <wp:category><wp:term_id>99</wp:term_id></wp:category></wp:postmeta>
+    </item>
+    <item>
+        <title>About</title>
+        <wp:post_id>13</wp:post_id>
+        <wp:post_parent>12</wp:post_parent>
+        <wp:menu_order>2</wp:menu_order>
+        <wp:post_type>page</wp:post_type>
+    </item>
+</channel>
+</rss>
+"""
+
+
+class WxrTests(SimpleTestCase):
+    def test_iter_wxr_yields_channel_records_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.xml')
+            Path(path).write_text(WXR_SAMPLE, encoding='utf-8')
+            records = list(iter_wxr(path))
+
+        self.assertEqual([kind for kind, _ in records], ['category', 'tag', 'item', 'item'])
+        self.assertEqual(records[0][1], {'wp_id': 3, 'name': 'News', 'slug': 'news', 'description': ''})
+        self.assertEqual(records[1][1], {'wp_id': 9, 'name': 'Grief', 'slug': 'grief', 'description': ''})
+        post, page = records[2][1], records[3][1]
+        self.assertEqual((post['wp_id'], post['post_type'], post['title'], post['slug'], post['status']),
+                         (12, 'post', 'Hello', 'hello', 'draft'))
+        self.assertEqual(post['content_html'], '  <p>Body</p>\n')
+        self.assertEqual(post['excerpt_html'], 'Short')
+        self.assertEqual((post['category_slugs'], post['tag_slugs']), (['news'], ['grief']))
+        self.assertEqual(post['published_at'].isoformat(), '2024-01-02T03:04:05+00:00')
+        self.assertIsNone(post['modified_at'])
+        self.assertIsNone(post['parent_wp_id'])
+        self.assertEqual((page['wp_id'], page['post_type'], page['parent_wp_id'], page['menu_order'], page['status']),
+                         (13, 'page', 12, 2, 'publish'))
+
+    def test_peak_rss_without_resource_module(self):
+        with mock.patch.dict('sys.modules', {'resource': None}):
+            self.assertIsNone(import_wordpress._peak_rss_mb())
+        self.assertEqual(import_wordpress._format_rss(None), 'n/a')
+
+
+IN_MEMORY_STORAGE = {'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+                     'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGE)
+class MediaLibraryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        body = os.urandom(100 * 1024)
+        for name in ('a.bin', 'copy-of-a.bin'):
+            (Path(cls.root.name) / name).write_bytes(body)
+        (Path(cls.root.name) / 'b.bin').write_bytes(os.urandom(50 * 1024))
+        cls.httpd, cls.base = _serve(cls.root.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def test_resolve_dedupes_and_counts_downloads(self):
+        urls = [f"{self.base}/{name}" for name in ('a.bin', 'copy-of-a.bin', 'b.bin', 'missing.bin')]
+        assets, stats = MediaLibrary(workers=4).resolve(urls)
+        self.assertEqual(len(assets), 3)
+        self.assertEqual(assets[urls[0]], assets[urls[1]])
+        self.assertEqual(MediaAsset.objects.count(), 2)
+        self.assertEqual((stats.fetched, stats.uploaded, stats.failed), (3, 2, 1))
+        self.assertEqual(stats.downloaded_bytes, 250 * 1024)
+        self.assertEqual(stats.uploaded_bytes, 150 * 1024)
+
+        assets, stats = MediaLibrary().resolve(urls[:3])
+        self.assertEqual((stats.known, stats.fetched, stats.downloaded_bytes), (3, 0, 0))
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGE)
+class ImportMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        (Path(cls.root.name) / 'wp-content').mkdir()
+        for name in ('a.png', 'b.png'):
+            (Path(cls.root.name) / 'wp-content' / name).write_bytes(os.urandom(1024))
+        cls.httpd, cls.base = _serve(cls.root.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def page(self, n, html):
+        return Page.objects.create(title=f"Page {n}", path=f"page-{n}", content_html=html, wp_id=n)
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command('import_media', '--site', self.base, '--no-http-cache', '--workers', '2', *args,
+                     stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_candidate_pattern(self):
+        command = import_media.Command()
+        command.hosts = ('127.0.0.1:8000', 'lcpsych.com', 'www.lcpsych.com')
+        pattern = command._candidate_pattern()
+        for html in ('<img src="https://www.lcpsych.com/a.png">', '<img src="//lcpsych.com/a.png">',
+                     '<img src="/wp-content/a.png">', "<img srcset='wp-content/a.png 2x'>",
+                     '<div style="background: url(/wp-content/a.png)">', '<img src=/a.png>'):
+            self.assertTrue(pattern.search(html), html)
+        for html in ('<p>No media</p>', '<img src="https://cdn.example.com/a.png">', '<img src="/media/imported/a.png">',
+                     '<img src="data:image/png;base64,AA">', '<a href="https://www.lcpsych.com.evil.test/">',
+                     '<div style="background: url(https://cdn.example.com/a.png)">'):
+            self.assertFalse(pattern.search(html), html)
+
+    def test_rewrites_in_batches(self):
+        pages = [
+            self.page(1, '<p><img src="/wp-content/a.png"></p>'),
+            self.page(2, f'<img src="{self.base}/wp-content/b.png" srcset="/wp-content/a.png 2x">'),
+            self.page(3, '<img src="https://cdn.example.com/x.png">'),
+            self.page(4, '<img src="/wp-content/missing.png">'),
+        ]
+        post = Post.objects.create(title='Post', slug='post', content_html='<div style="background:url(/wp-content/b.png)"></div>', wp_id=1)
+        with mock.patch.object(import_media, 'BATCH_SIZE', 1), CaptureQueriesContext(connection) as queries:
+            out = self.run_import('--parser', 'html.parser')
+        self.assertIn('Rewrote 3 documents', out)
+        self.assertIn('(html.parser)', out)
+        # One UPDATE per batch of rewritten documents
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in queries.captured_queries), 3)
+        a, b = (MediaAsset.objects.get(urls__url=f"{self.base}/wp-content/{name}").url for name in ('a.png', 'b.png'))
+        for obj in pages + [post]:
+            obj.refresh_from_db()
+        self.assertEqual(pages[0].content_html, f'<p><img src="{a}"/></p>')
+        self.assertEqual(pages[1].content_html, f'<img src="{b}" srcset="{a} 2x"/>')
+        self.assertEqual(pages[2].content_html, '<img src="https://cdn.example.com/x.png">')
+        self.assertEqual(pages[3].content_html, '<img src="/wp-content/missing.png">')
+        self.assertEqual(post.content_html, f'<div style="background:url({b})"></div>')
+
+        # Rewritten documents no longer pass the prefilter
+        self.assertIn('Rewrote 0 documents', self.run_import('--parser', 'html.parser'))
+
+    def test_lxml_parser_needs_lxml(self):
+        with mock.patch.object(import_media, 'lxml', None), self.assertRaises(CommandError):
+            self.run_import('--parser', 'lxml')
+
+    @skipUnless(import_media.lxml, 'lxml is not installed')
+    def test_lxml_parser(self):
+        page = self.page(1, '<p><img src="/wp-content/a.png"></p>')
+        self.assertIn('(lxml)', self.run_import('--parser', 'lxml'))
+        page.refresh_from_db()
+        # The <html><body> wrapper lxml adds around fragments is dropped again
+        self.assertRegex(page.content_html, r'^<p><img src="/media/imported/[0-9a-f]{16}/a.png"/?></p>$')
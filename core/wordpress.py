@@ -0,0 +1,276 @@
+"""Fetching collections from the WordPress REST API.
+
+``WordPressClient.fetch_all`` requests the first page of a collection, reads
+the ``X-WP-Total`` / ``X-WP-TotalPages`` headers and then fetches the
+remaining pages concurrently over one pooled ``requests.Session`` (with
+retries), returning items in page order. Servers that do not send the headers
+are walked page by page as before. Passing an ``HttpCache`` routes requests
+through it (see ``core.http_cache``). ``_embed`` is only requested when asked
+for, since the importer does not read embedded data. Passing the ETag of a
+previous response sends it as ``If-None-Match``; a 304 means the collection is
+unchanged and nothing else is requested.
+
+``FakeWordPressServer`` is a local HTTP stand-in serving synthetic posts,
+pages, categories and tags in the REST format, used by
+``import_wordpress --fake-site`` and ``--benchmark``, and by ``core.tests``.
+"""
+import datetime
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .http_cache import CachingAdapter, HttpCache
+
+
+@dataclass
+class FetchStats:
+    endpoint: str
+    items: int = 0
+    pages: int = 0
+    total: Optional[int] = None
+    seconds: float = 0.0
+    etag: str = ''
+    not_modified: bool = False
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        if self.not_modified:
+            return f"{self.endpoint}: not modified ({self.seconds:.2f}s)"
+        return (f"{self.endpoint}: {self.items} items, {self.pages} pages in {self.seconds:.2f}s "
+                f"({self.pages_per_second:.1f} pages/s)")
+
+
+def _header_int(response, name: str) -> Optional[int]:
+    try:
+        return int(response.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class WordPressClient:
+    def __init__(self, base: str, workers: int = 4, timeout: float = 30.0, retries: int = 3, embed: bool = False,
+                 cache: Optional[HttpCache] = None):
+        self.base = base.rstrip('/')
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.embed = embed
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "lcpsych-wordpress-import/1.0"
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True,
+        )
+        pool = dict(pool_connections=4, pool_maxsize=max(self.workers, 10), max_retries=retry)
+        adapter = CachingAdapter(cache, **pool) if cache else HTTPAdapter(**pool)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, endpoint: str) -> str:
+        return f"{self.base}/wp-json/wp/v2/{endpoint}"
+
+    def _get(self, endpoint: str, page: int, per_page: int, params: Optional[dict], etag: str = ''):
+        query = {**(params or {}), 'per_page': per_page, 'page': page}
+        if self.embed:
+            query['_embed'] = 'true'
+        headers = {'If-None-Match': etag} if etag else None
+        r = self.session.get(self.url(endpoint), params=query, headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return r, []
+        if r.status_code == 400 and 'rest_post_invalid_page_number' in r.text:
+            return r, []
+        r.raise_for_status()
+        return r, r.json()
+
+    def fetch_all(self, endpoint: str, per_page: int = 100, params: Optional[dict] = None,
+                  etag: str = '') -> Tuple[List[Dict[str, Any]], FetchStats]:
+        """All items of a collection (e.g. "posts") in page order, plus fetch stats.
+
+        ``params`` are extra query arguments (e.g. ``modified_after``). With
+        ``etag``, an unchanged collection returns no items and
+        ``stats.not_modified``. ``stats.etag`` is empty when the collection
+        spans more than one page.
+        """
+        stats = FetchStats(endpoint)
+        started = time.monotonic()
+        first, items = self._get(endpoint, 1, per_page, params, etag)
+        stats.pages = 1
+        stats.etag = first.headers.get('ETag', '')
+        if first.status_code == 304:
+            stats.not_modified = True
+            stats.etag = etag
+            stats.seconds = time.monotonic() - started
+            return items, stats
+        stats.total = _header_int(first, 'X-WP-Total')
+        total_pages = _header_int(first, 'X-WP-TotalPages')
+        if total_pages is not None:
+            if total_pages > 1:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="wp-fetch") as pool:
+                    pages = pool.map(lambda n: self._get(endpoint, n, per_page, params)[1], range(2, total_pages + 1))
+                    for batch in pages:
+                        items.extend(batch)
+                stats.pages = total_pages
+        else:
+            # No pagination headers: walk until a short or empty page
+            batch, page = items, 1
+            while len(batch) >= per_page:
+                page += 1
+                _, batch = self._get(endpoint, page, per_page, params)
+                items.extend(batch)
+                stats.pages = page
+        if stats.pages > 1 or len(items) >= per_page:
+            # Page 1's ETag says nothing about the pages after it
+            stats.etag = ''
+        stats.items = len(items)
+        stats.seconds = time.monotonic() - started
+        return items, stats
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_FAKE_EPOCH = 1_600_000_000
+
+
+def _fake_date(seconds: int) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))
+
+
+def _fake_item(kind: str, i: int, base: str, modified: int) -> Dict[str, Any]:
+    if kind in ('categories', 'tags'):
+        return {'id': i, 'name': f"{kind[:-1].title()} {i}", 'slug': f"{kind[:-1]}-{i}", 'description': ''}
+    item = {
+        'id': i,
+        'date_gmt': _fake_date(_FAKE_EPOCH + i * 3600),
+        'modified_gmt': _fake_date(modified),
+        'slug': f"{kind[:-1]}-{i}",
+        'status': 'publish',
+        'link': f"{base}/{kind[:-1]}-{i}/",
+        'title': {'rendered': f"{kind[:-1].title()} {i}"},
+        'content': {'rendered': f"<p>Synthetic {kind[:-1]} {i}.</p>" * 20},
+        'excerpt': {'rendered': f"<p>Synthetic {kind[:-1]} {i}.</p>"},
+    }
+    if kind == 'pages':
+        item.update({'parent': 0, 'menu_order': i})
+    else:
+        item.update({'categories': [1 + i % 5], 'tags': [1 + i % 7]})
+    return item
+
+
+class _FakeWordPressHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        kind = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+        query = parse_qs(parsed.query)
+        per_page = int((query.get('per_page') or ['10'])[0])
+        page = int((query.get('page') or ['1'])[0])
+        size = self.server.sizes.get(kind)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        with self.server.lock:
+            failing = self.server.failures > 0
+            self.server.failures -= failing
+            self.server.requests += 1
+        if failing:
+            return self._send(503, {'code': 'rest_unavailable'})
+        if size is None:
+            return self._send(404, {'code': 'rest_no_route'})
+        modified = {i: self.server.modified.get((kind, i), _FAKE_EPOCH + i * 3600) for i in range(1, size + 1)}
+        ids = list(modified)
+        after = (query.get('modified_after') or [''])[0]
+        if after and kind in ('posts', 'pages'):
+            after_ts = datetime.datetime.fromisoformat(after.replace('Z', '+00:00')).timestamp()
+            ids = [i for i in ids if modified[i] > after_ts]
+        total, total_pages = len(ids), max(1, -(-len(ids) // per_page))
+        if page > total_pages:
+            return self._send(400, {'code': 'rest_post_invalid_page_number'})
+        base = f"http://{self.headers.get('Host', 'localhost')}"
+        items = [_fake_item(kind, i, base, modified[i]) for i in ids[(page - 1) * per_page:page * per_page]]
+        self._send(200, items, {'X-WP-Total': str(total), 'X-WP-TotalPages': str(total_pages)})
+
+    def _send(self, status: int, payload, headers: Optional[dict] = None):
+        data = json.dumps(payload).encode('utf-8')
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeWordPressServer:
+    """Local WordPress REST stand-in: ``with FakeWordPressServer(posts=500) as wp: wp.url``."""
+
+    def __init__(self, posts: int = 50, pages: int = 10, categories: int = 5, tags: int = 7, latency: float = 0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeWordPressHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.sizes = {'posts': posts, 'pages': pages, 'categories': categories, 'tags': tags}
+        # (kind, id) -> modified timestamp, see touch()
+        self.httpd.modified = {}
+        self.httpd.lock = threading.Lock()
+        self.httpd.failures = 0
+        self.httpd.requests = 0
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        """Requests served so far, failed ones included."""
+        return self.httpd.requests
+
+    def fail(self, count: int):
+        """Answer the next ``count`` requests with a 503."""
+        with self.httpd.lock:
+            self.httpd.failures = count
+
+    def touch(self, kind: str, *ids: int):
+        """Mark items of a collection ("posts", "pages") as modified now."""
+        now = int(time.time())
+        for i in ids:
+            self.httpd.modified[(kind, i)] = now
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
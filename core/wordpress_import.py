@@ -0,0 +1,254 @@
+"""Batched writes for imported WordPress content.
+
+The REST and WXR importers turn items into plain row dicts and hand them to
+``upsert_terms`` / ``upsert_pages`` / ``upsert_posts``, which write them in
+chunks with a fixed number of queries per chunk:
+
+* existing rows are preloaded by ``wp_id`` (pages and posts are unique on
+  ``(wp_id, wp_type)``) with their ``content_hash``, so rows whose imported
+  fields hash the same are skipped without a write and created / updated
+  counts are known;
+* pages and posts are written with ``bulk_create(update_conflicts=True)``,
+  which also returns their primary keys;
+* page parents are resolved in memory (falling back to the database for
+  parents outside the import) and written with one ``bulk_update``;
+* post categories / tags are rewritten in the M2M through tables from one
+  ``wp_id -> pk`` map per taxonomy.
+
+``bulk_create`` skips ``Model.save()``, so the path / slug defaults of
+``Page.save()`` are applied here. ``on_chunk`` callbacks run after each chunk
+is written so the importer can checkpoint its progress.
+"""
+import datetime
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Category, Page, Post, Tag
+
+PAGE_FIELDS = (
+    'title', 'slug', 'path', 'excerpt_html', 'content_html', 'menu_order', 'status',
+    'original_url', 'published_at', 'modified_at',
+)
+POST_FIELDS = (
+    'title', 'slug', 'excerpt_html', 'content_html', 'status', 'original_url', 'published_at', 'modified_at',
+)
+TERM_FIELDS = ('name', 'slug', 'description')
+
+
+@dataclass
+class UpsertResult:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    def merge(self, other: 'UpsertResult') -> 'UpsertResult':
+        self.created += other.created
+        self.updated += other.updated
+        self.skipped += other.skipped
+        self.seconds += other.seconds
+        return self
+
+    def __str__(self) -> str:
+        return f"{self.created} created, {self.updated} updated, {self.skipped} skipped in {self.seconds:.2f}s"
+
+
+def content_hash(row: dict, fields: Iterable[str]) -> str:
+    """Stable hash of the imported values of ``fields``."""
+    payload = json.dumps([row.get(f) for f in fields], default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def parse_gmt(value: Optional[str]) -> Optional[datetime.datetime]:
+    """``*_gmt`` text (UTC, offset optional) -> aware datetime; WordPress's zero date -> None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc)
+
+
+def _chunks(rows: List[dict], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _taxonomy_map(model) -> Dict[int, int]:
+    return dict(model.objects.exclude(wp_id=None).values_list('wp_id', 'pk'))
+
+
+def upsert_terms(model, rows: Iterable[dict], batch_size: int = 500) -> UpsertResult:
+    """Categories or tags keyed by ``wp_id``; a new term whose slug already exists adopts that row."""
+    result = UpsertResult()
+    started = time.monotonic()
+    rows = [row for row in rows if row.get('name')]
+    for chunk in _chunks(rows, batch_size):
+        for row in chunk:
+            row['slug'] = (row.get('slug') or slugify(row['name']) or str(row['wp_id']))[:200]
+        existing = {obj.wp_id: obj for obj in model.objects.filter(wp_id__in=[row['wp_id'] for row in chunk if row['wp_id'] is not None])}
+        # Rows not known by wp_id (or without one, from WXR files) match an existing term by slug
+        by_slug = {obj.slug: obj for obj in model.objects.filter(slug__in=[row['slug'] for row in chunk if row['wp_id'] not in existing])}
+        changed, new = [], []
+        now = timezone.now()
+        for row in chunk:
+            obj = existing.get(row['wp_id'])
+            adopt = obj is None and row['slug'] in by_slug
+            if adopt:
+                obj = by_slug[row['slug']]
+            if obj is None:
+                new.append(model(wp_id=row['wp_id'], **{f: row.get(f) or '' for f in TERM_FIELDS}))
+            elif any(getattr(obj, f) != (row.get(f) or '') for f in TERM_FIELDS) or (
+                    adopt and row['wp_id'] is not None and obj.wp_id != row['wp_id']):
+                for f in TERM_FIELDS:
+                    setattr(obj, f, row.get(f) or '')
+                if row['wp_id'] is not None:
+                    obj.wp_id = row['wp_id']
+                # bulk_update does not apply auto_now
+                obj.updated = now
+                changed.append(obj)
+            else:
+                result.skipped += 1
+        with transaction.atomic():
+            if changed:
+                model.objects.bulk_update(changed, [*TERM_FIELDS, 'wp_id', 'updated'])
+            if new:
+                # A slug inserted since the lookup above is still adopted rather than failing the chunk
+                model.objects.bulk_create(
+                    new, update_conflicts=True, unique_fields=['slug'], update_fields=['name', 'description', 'wp_id', 'updated'],
+                )
+        result.created += len(new)
+        result.updated += len(changed)
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def _split(model, wp_type: str, chunk: List[dict], fields, force: bool, result: UpsertResult) -> List[dict]:
+    """Rows of ``chunk`` that need writing (``content_hash`` set on each); counts created / updated / skipped."""
+    existing = dict(
+        model.objects.filter(wp_type=wp_type, wp_id__in=[row['wp_id'] for row in chunk]).values_list('wp_id', 'content_hash')
+    )
+    todo = []
+    for row in chunk:
+        row['content_hash'] = content_hash(row, fields)
+        if row['wp_id'] not in existing:
+            result.created += 1
+        elif not force and existing[row['wp_id']] == row['content_hash']:
+            result.skipped += 1
+            continue
+        else:
+            result.updated += 1
+        todo.append(row)
+    return todo
+
+
+def upsert_pages(rows: Iterable[dict], batch_size: int = 500, force: bool = False, link_parents: bool = True,
+                 on_chunk: Optional[Callable[[List[dict]], None]] = None) -> UpsertResult:
+    """Pages keyed by ``wp_id``; ``parent_wp_id`` (0 / None for top level) is resolved after all rows are written.
+
+    A caller writing pages in several calls passes ``link_parents=False`` and
+    calls ``link_page_parents`` once at the end, so a child written before
+    its parent still gets linked.
+    """
+    result = UpsertResult()
+    started = time.monotonic()
+    rows = list(rows)
+    parents = {row['wp_id']: row.get('parent_wp_id') or None for row in rows}
+    # Paths of the pages being imported plus their parents already in the database
+    paths = {row['wp_id']: row.get('path') for row in rows}
+    outside = set(parents.values()) - set(paths) - {None}
+    paths.update(Page.objects.filter(wp_type='page', wp_id__in=outside).values_list('wp_id', 'path'))
+    for row in rows:
+        row['slug'] = (row.get('slug') or slugify(row.get('title') or '') or str(row['wp_id']))[:255]
+        row['path'] = (row.get('path') or '').strip('/')
+        if not row['path']:
+            # Same derivation as Page.save(): parent path + slug
+            parent_path = paths.get(parents[row['wp_id']]) or ''
+            row['path'] = '/'.join(p for p in (parent_path, row['slug']) if p)
+
+    written = set()
+    for chunk in _chunks(rows, batch_size):
+        todo = _split(Page, 'page', chunk, [*PAGE_FIELDS, 'parent_wp_id'], force, result)
+        if todo:
+            Page.objects.bulk_create(
+                [Page(wp_id=row['wp_id'], wp_type='page', content_hash=row['content_hash'], **{f: row.get(f) for f in PAGE_FIELDS})
+                 for row in todo],
+                update_conflicts=True,
+                unique_fields=['wp_id', 'wp_type'],
+                update_fields=[*PAGE_FIELDS, 'content_hash', 'updated'],
+            )
+            written.update(row['wp_id'] for row in todo)
+        if on_chunk:
+            on_chunk(chunk)
+
+    if link_parents:
+        link_page_parents({wp_id: parents[wp_id] for wp_id in written}, batch_size)
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def link_page_parents(parents: Dict[int, Optional[int]], batch_size: int = 500) -> int:
+    """Point each page (by wp_id) at its parent's wp_id (None for top level); returns pages changed."""
+    if not parents:
+        return 0
+    pks = dict(Page.objects.filter(wp_type='page', wp_id__in=set(parents) | set(parents.values()) - {None}).values_list('wp_id', 'pk'))
+    changed = []
+    for page in Page.objects.filter(wp_type='page', wp_id__in=parents).only('pk', 'wp_id', 'parent_id'):
+        parent_pk = pks.get(parents[page.wp_id])
+        if page.parent_id != parent_pk:
+            page.parent_id = parent_pk
+            changed.append(page)
+    Page.objects.bulk_update(changed, ['parent'], batch_size=batch_size)
+    return len(changed)
+
+
+def upsert_posts(rows: Iterable[dict], batch_size: int = 500, force: bool = False,
+                 on_chunk: Optional[Callable[[List[dict]], None]] = None) -> UpsertResult:
+    """Posts keyed by ``wp_id``; ``categories`` / ``tags`` (term wp_ids) replace the post's terms when given."""
+    result = UpsertResult()
+    started = time.monotonic()
+    rows = list(rows)
+    terms = {'categories': _taxonomy_map(Category), 'tags': _taxonomy_map(Tag)}
+    for chunk in _chunks(rows, batch_size):
+        for row in chunk:
+            row['slug'] = (row.get('slug') or slugify(row.get('title') or '') or str(row['wp_id']))[:255]
+        todo = _split(Post, 'post', chunk, [*POST_FIELDS, 'categories', 'tags'], force, result)
+        if not todo:
+            if on_chunk:
+                on_chunk(chunk)
+            continue
+        with transaction.atomic():
+            posts = Post.objects.bulk_create(
+                [Post(wp_id=row['wp_id'], wp_type='post', content_hash=row['content_hash'], **{f: row.get(f) for f in POST_FIELDS})
+                 for row in todo],
+                update_conflicts=True,
+                unique_fields=['wp_id', 'wp_type'],
+                update_fields=[*POST_FIELDS, 'content_hash', 'updated'],
+            )
+            for field, ids in terms.items():
+                through = getattr(Post, field).through
+                column = f"{getattr(Post, field).field.m2m_reverse_field_name()}_id"
+                given = [(post, row[field]) for post, row in zip(posts, todo) if row.get(field) is not None]
+                if not given:
+                    continue
+                through.objects.filter(post_id__in=[post.pk for post, _ in given]).delete()
+                through.objects.bulk_create([
+                    through(post_id=post.pk, **{column: ids[wp_id]})
+                    for post, wp_ids in given
+                    for wp_id in dict.fromkeys(wp_ids)
+                    if wp_id in ids
+                ], batch_size=batch_size)
+        if on_chunk:
+            on_chunk(chunk)
+    result.seconds = time.monotonic() - started
+    return result
@@ -0,0 +1,174 @@
+"""Streaming reader for WordPress WXR (XML) exports.
+
+``iter_wxr`` walks the export with defusedxml's ``iterparse`` and yields one
+record per ``<wp:category>``, ``<wp:tag>`` and ``<item>`` as soon as the
+element is complete, then clears it (and the already-processed children of
+``<channel>``), so memory stays flat however large the export is. Records are
+``(kind, row)`` pairs whose rows use the field names of
+``core.wordpress_import``:
+
+* ``("category", row)`` / ``("tag", row)`` with wp_id, name, slug, description
+* ``("item", row)`` with the post/page fields plus post_type, parent_wp_id,
+  menu_order and the item's category / tag slugs
+
+``write_synthetic_wxr`` produces a large export for the memory benchmark in
+``import_wordpress --wxr-benchmark``.
+"""
+import datetime
+import random
+from typing import Dict, Iterator, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from defusedxml import ElementTree as ET
+
+from .wordpress_import import parse_gmt
+
+_PREFIXES = {
+    'http://purl.org/rss/1.0/modules/content/': 'content',
+    'http://purl.org/dc/elements/1.1/': 'dc',
+}
+
+
+def _name(tag: str) -> str:
+    """``{uri}local`` -> ``prefix:local`` for the namespaces WXR uses (any export version)."""
+    if not tag.startswith('{'):
+        return tag
+    uri, local = tag[1:].split('}', 1)
+    if uri.startswith('http://wordpress.org/export/'):
+        prefix = 'excerpt' if uri.rstrip('/').endswith('/excerpt') else 'wp'
+    else:
+        prefix = _PREFIXES.get(uri, uri)
+    return f"{prefix}:{local}"
+
+
+def _fields(elem) -> Dict[str, str]:
+    return {_name(child.tag): (child.text or '').strip() for child in elem}
+
+
+def _int(value: str) -> Optional[int]:
+    return int(value) if value and value.isdigit() else None
+
+
+def _item_row(elem) -> dict:
+    fields = _fields(elem)
+    categories, tags = [], []
+    for child in elem.iter('category'):
+        slug = child.get('nicename')
+        if slug and child.get('domain') == 'category':
+            categories.append(slug)
+        elif slug and child.get('domain') == 'post_tag':
+            tags.append(slug)
+    # content:encoded keeps its whitespace
+    content = next((child.text or '' for child in elem if _name(child.tag) == 'content:encoded'), '')
+    return {
+        'wp_id': _int(fields.get('wp:post_id', '')),
+        'post_type': fields.get('wp:post_type', ''),
+        'title': fields.get('title', ''),
+        'slug': fields.get('wp:post_name', ''),
+        'link': fields.get('link', ''),
+        'excerpt_html': fields.get('excerpt:encoded', ''),
+        'content_html': content,
+        'status': fields.get('wp:status') or 'publish',
+        'original_url': fields.get('link', ''),
+        'published_at': parse_gmt(fields.get('wp:post_date_gmt')),
+        'modified_at': parse_gmt(fields.get('wp:post_modified_gmt')),
+        'parent_wp_id': _int(fields.get('wp:post_parent', '')) or None,
+        'menu_order': _int(fields.get('wp:menu_order', '')) or 0,
+        'category_slugs': categories,
+        'tag_slugs': tags,
+    }
+
+
+def _term_row(elem, kind: str) -> dict:
+    fields = _fields(elem)
+    if kind == 'category':
+        name, slug, description = 'wp:cat_name', 'wp:category_nicename', 'wp:category_description'
+    else:
+        name, slug, description = 'wp:tag_name', 'wp:tag_slug', 'wp:tag_description'
+    return {
+        'wp_id': _int(fields.get('wp:term_id', '')),
+        'name': fields.get(name, ''),
+        'slug': fields.get(slug, ''),
+        'description': fields.get(description, ''),
+    }
+
+
+def iter_wxr(path) -> Iterator[Tuple[str, dict]]:
+    channel = None
+    depth = 0
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if channel is None and elem.tag == 'channel':
+                channel = elem
+            continue
+        depth -= 1
+        # Only direct children of <channel> (depth 2 under <rss>) are records
+        if depth != 2 or channel is None:
+            continue
+        name = _name(elem.tag)
+        if name == 'item':
+            yield 'item', _item_row(elem)
+        elif name == 'wp:category':
+            yield 'category', _term_row(elem, 'category')
+        elif name == 'wp:tag':
+            yield 'tag', _term_row(elem, 'tag')
+        else:
+            continue
+        elem.clear()
+        # Drop processed children so <channel> does not grow with the file
+        channel.clear()
+
+
+_WXR_HEAD = """<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0"
+	xmlns:excerpt="http://wordpress.org/export/1.2/excerpt/"
+	xmlns:content="http://purl.org/rss/1.0/modules/content/"
+	xmlns:dc="http://purl.org/dc/elements/1.1/"
+	xmlns:wp="http://wordpress.org/export/1.2/">
+<channel>
+	<title>Synthetic export</title>
+	<wp:wxr_version>1.2</wp:wxr_version>
+"""
+
+
+def write_synthetic_wxr(path, target_bytes: int, seed: int = 1) -> int:
+    """Write a WXR file of roughly ``target_bytes`` (posts, pages and large attachments); returns item count."""
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10))) for _ in range(500)]
+    written = 0
+    count = 0
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write(_WXR_HEAD)
+        for i in range(1, 11):
+            fh.write(f"\t<wp:category><wp:term_id>{i}</wp:term_id><wp:category_nicename>cat-{i}</wp:category_nicename>"
+                     f"<wp:category_parent></wp:category_parent><wp:cat_name><![CDATA[Category {i}]]></wp:cat_name></wp:category>\n")
+            fh.write(f"\t<wp:tag><wp:term_id>{100 + i}</wp:term_id><wp:tag_slug>tag-{i}</wp:tag_slug>"
+                     f"<wp:tag_name><![CDATA[Tag {i}]]></wp:tag_name></wp:tag>\n")
+        while written < target_bytes:
+            count += 1
+            post_type = 'attachment' if count % 5 == 0 else ('page' if count % 50 == 1 else 'post')
+            paragraphs = rng.randint(10, 60) * (4 if post_type == 'attachment' else 1)
+            body = ''.join(f"<p>{' '.join(rng.choices(words, k=40))}</p>\n" for _ in range(paragraphs))
+            day = datetime.datetime(2015, 1, 1) + datetime.timedelta(hours=count)
+            parent = count - 50 if post_type == 'page' and count > 50 else 0
+            item = (
+                f"\t<item>\n\t\t<title>{escape(f'Item {count}')}</title>\n"
+                f"\t\t<link>https://example.com/{post_type}-{count}/</link>\n"
+                f"\t\t<dc:creator><![CDATA[admin]]></dc:creator>\n"
+                f"\t\t<content:encoded><![CDATA[{body}]]></content:encoded>\n"
+                f"\t\t<excerpt:encoded><![CDATA[]]></excerpt:encoded>\n"
+                f"\t\t<wp:post_id>{count}</wp:post_id>\n"
+                f"\t\t<wp:post_date_gmt>{day:%Y-%m-%d %H:%M:%S}</wp:post_date_gmt>\n"
+                f"\t\t<wp:post_modified_gmt>{day:%Y-%m-%d %H:%M:%S}</wp:post_modified_gmt>\n"
+                f"\t\t<wp:post_name>{post_type}-{count}</wp:post_name>\n"
+                f"\t\t<wp:status>publish</wp:status>\n\t\t<wp:post_parent>{parent}</wp:post_parent>\n"
+                f"\t\t<wp:menu_order>0</wp:menu_order>\n\t\t<wp:post_type>{post_type}</wp:post_type>\n"
+                f"\t\t<category domain=\"category\" nicename=\"cat-{1 + count % 10}\"><![CDATA[Category {1 + count % 10}]]></category>\n"
+                f"\t\t<category domain=\"post_tag\" nicename=\"tag-{1 + count % 10}\"><![CDATA[Tag {1 + count % 10}]]></category>\n"
+                f"\t</item>\n"
+            )
+            fh.write(item)
+            written += len(item)
+        fh.write("</channel>\n</rss>\n")
+    return count
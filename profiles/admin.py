@@ -1,4 +1,6 @@
 from django.contrib import admin
+
+from core.admin_search import TrigramSearchMixin
 from .models import (
     TherapistProfile,
     Title,
@@ -40,75 +42,131 @@ from .models import (
     OtherTherapyType,
     OtherTreatmentOption,
 )
+from .export import streaming_response
+from .lookups import lookup_registry
+
+
+class LookupAdmin(admin.ModelAdmin):
+    """Admin for a registry lookup table.
+
+    Searches, including the autocomplete endpoint behind other admins'
+    ``autocomplete_fields``, match against the cached rows in memory and only
+    hit the table to fetch the matching page.
+    """
+
+    search_fields = ("name",)
+
+    def get_ordering(self, request):
+        # Same display order as the registry (autocomplete pages need a stable order)
+        if self.ordering:
+            return self.ordering
+        return ["sort_order", "name"] if any(f.name == "sort_order" for f in self.model._meta.fields) else ["name"]
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = search_term.casefold().split()
+        if not terms:
+            return queryset, False
+        ids = [row.pk for row in lookup_registry.rows(self.model) if all(term in row.name.casefold() for term in terms)]
+        return queryset.filter(pk__in=ids), False
+
+
+class LookupListFilter(admin.RelatedFieldListFilter):
+    """Related-field filter whose options come from the lookup registry."""
+
+    def field_choices(self, field, request, model_admin):
+        return lookup_registry.choices(field.related_model)
 
 
 @admin.register(TherapistProfile)
-class TherapistProfileAdmin(admin.ModelAdmin):
+class TherapistProfileAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = ("display_name", "user", "is_published", "accepts_new_clients")
-    list_filter = ("is_published", "accepts_new_clients", "telehealth_only", "gender", "title_fk")
-    search_fields = (
-        "display_name",
-        "first_name",
-        "last_name",
-        "user__username",
-        "user__email",
-        "licenses",
-        "specialties",
-        "modalities",
+    list_select_related = ("user",)
+    autocomplete_fields = ("user", "title_fk", "gender", "participant_types", "age_groups")
+    list_filter = (
+        "is_published",
+        "accepts_new_clients",
+        "telehealth_only",
+        ("gender", LookupListFilter),
+        ("title_fk", LookupListFilter),
+        ("specialty_items__specialty", LookupListFilter),
+        ("types_of_therapy__therapy_type", LookupListFilter),
     )
+    # Own columns only, each with a gin_trgm_ops index (profiles migration 0008)
+    search_fields = ("display_name", "first_name", "last_name", "licenses")
+    trigram_search_fields = search_fields
+    # Matched in their own queries: auth_user is indexed by migration 0008, and the
+    # specialty and therapy type lookup tables are a few hundred rows each
+    trigram_related_search = {
+        "user": ("username", "email"),
+        "specialty_items__specialty": ("name",),
+        "types_of_therapy__therapy_type": ("name",),
+    }
     readonly_fields = ("created_at", "updated_at")
     prepopulated_fields = {"slug": ("display_name",)}
+    actions = ("export_csv", "export_jsonl")
+
+    def get_queryset(self, request):
+        # __str__ falls back to the username; autocomplete results render it per row
+        return super().get_queryset(request).select_related("user")
+
+    @admin.action(description="Export selected profiles as CSV", permissions=["view"])
+    def export_csv(self, request, queryset):
+        return streaming_response(queryset, "csv")
+
+    @admin.action(description="Export selected profiles as JSONL", permissions=["view"])
+    def export_jsonl(self, request, queryset):
+        return streaming_response(queryset, "jsonl")
 
 
 @admin.register(Title)
-class TitleAdmin(admin.ModelAdmin):
+class TitleAdmin(LookupAdmin):
     list_display = ("name", "category", "sort_order")
     list_editable = ("category", "sort_order")
     search_fields = ("name",)
 
 
 @admin.register(Gender)
-class GenderAdmin(admin.ModelAdmin):
+class GenderAdmin(LookupAdmin):
     list_display = ("name",)
     search_fields = ("name",)
 
 
 @admin.register(SpecialtyLookup)
-class SpecialtyLookupAdmin(admin.ModelAdmin):
+class SpecialtyLookupAdmin(LookupAdmin):
     list_display = ("name", "category", "sort_order")
     list_editable = ("category", "sort_order")
     search_fields = ("name",)
 
 
 @admin.register(TherapyType)
-class TherapyTypeAdmin(admin.ModelAdmin):
+class TherapyTypeAdmin(LookupAdmin):
     list_display = ("name", "category", "sort_order")
     list_editable = ("category", "sort_order")
     search_fields = ("name",)
 
 
 @admin.register(InsuranceProvider)
-class InsuranceProviderAdmin(admin.ModelAdmin):
+class InsuranceProviderAdmin(LookupAdmin):
     list_display = ("name", "category", "sort_order")
     list_editable = ("category", "sort_order")
     search_fields = ("name",)
 
 
 @admin.register(PaymentMethod)
-class PaymentMethodAdmin(admin.ModelAdmin):
+class PaymentMethodAdmin(LookupAdmin):
     list_display = ("name", "category", "sort_order")
     list_editable = ("category", "sort_order")
     search_fields = ("name",)
 
 
 @admin.register(ParticipantType)
-class ParticipantTypeAdmin(admin.ModelAdmin):
+class ParticipantTypeAdmin(LookupAdmin):
     list_display = ("name",)
     search_fields = ("name",)
 
 
 @admin.register(AgeGroup)
-class AgeGroupAdmin(admin.ModelAdmin):
+class AgeGroupAdmin(LookupAdmin):
     list_display = ("name",)
     search_fields = ("name",)
 
@@ -116,6 +174,8 @@ class AgeGroupAdmin(admin.ModelAdmin):
 @admin.register(Specialty)
 class SpecialtyAdmin(admin.ModelAdmin):
     list_display = ("therapist", "specialty", "is_top_specialty")
+    list_select_related = ("therapist__user", "specialty")
+    autocomplete_fields = ("therapist", "specialty")
     list_filter = ("is_top_specialty",)
     search_fields = ("therapist__display_name", "specialty__name")
 
@@ -123,12 +183,16 @@ class SpecialtyAdmin(admin.ModelAdmin):
 @admin.register(TherapyTypeSelection)
 class TherapyTypeSelectionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "therapy_type")
+    list_select_related = ("therapist__user", "therapy_type")
+    autocomplete_fields = ("therapist", "therapy_type")
     search_fields = ("therapist__display_name", "therapy_type__name")
 
 
 @admin.register(Education)
 class EducationAdmin(admin.ModelAdmin):
     list_display = ("therapist", "school", "degree_diploma", "year_graduated")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     search_fields = ("therapist__display_name", "school", "degree_diploma")
 
 
@@ -141,7 +205,9 @@ class OfficeHourInline(admin.TabularInline):
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
     list_display = ("therapist", "practice_name", "city", "state", "zip", "is_primary_address", "by_appointment_only")
-    list_filter = ("state", "is_primary_address", "by_appointment_only")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
+    list_filter = ("state", "is_primary_address", "by_appointment_only", "has_evening_hours", "has_weekend_hours")
     search_fields = ("therapist__display_name", "practice_name", "city", "state", "zip")
     inlines = [OfficeHourInline]
 
@@ -149,6 +215,8 @@ class LocationAdmin(admin.ModelAdmin):
 @admin.register(AdditionalCredential)
 class AdditionalCredentialAdmin(admin.ModelAdmin):
     list_display = ("therapist", "additional_credential_type", "organization_name", "year_issued")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     list_filter = ("additional_credential_type",)
     search_fields = ("therapist__display_name", "organization_name")
 
@@ -156,6 +224,8 @@ class AdditionalCredentialAdmin(admin.ModelAdmin):
 @admin.register(GalleryImage)
 class GalleryImageAdmin(admin.ModelAdmin):
     list_display = ("therapist", "caption", "is_primary")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     list_filter = ("is_primary",)
     search_fields = ("therapist__display_name", "caption")
 
@@ -163,12 +233,16 @@ class GalleryImageAdmin(admin.ModelAdmin):
 @admin.register(PaymentMethodSelection)
 class PaymentMethodSelectionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "payment_method")
+    list_select_related = ("therapist__user", "payment_method")
+    autocomplete_fields = ("therapist", "payment_method")
     search_fields = ("therapist__display_name", "payment_method__name")
 
 
 @admin.register(InsuranceDetail)
 class InsuranceDetailAdmin(admin.ModelAdmin):
     list_display = ("therapist", "provider", "out_of_network")
+    list_select_related = ("therapist__user", "provider")
+    autocomplete_fields = ("therapist", "provider")
     list_filter = ("out_of_network",)
     search_fields = ("therapist__display_name", "provider__name")
 
@@ -180,7 +254,7 @@ class LicenseInline(admin.TabularInline):
 
 
 @admin.register(LicenseType)
-class LicenseTypeAdmin(admin.ModelAdmin):
+class LicenseTypeAdmin(LookupAdmin):
     list_display = ("name", "category", "sort_order")
     list_editable = ("category", "sort_order")
     search_fields = ("name",)
@@ -189,30 +263,32 @@ class LicenseTypeAdmin(admin.ModelAdmin):
 @admin.register(License)
 class LicenseAdmin(admin.ModelAdmin):
     list_display = ("therapist", "license_type", "state", "license_number", "date_expires", "is_active")
-    list_filter = ("license_type", "state", "is_active")
+    list_select_related = ("therapist__user", "license_type")
+    autocomplete_fields = ("therapist", "license_type")
+    list_filter = (("license_type", LookupListFilter), "state", "is_active")
     search_fields = ("therapist__display_name", "license_number", "license_type__name")
 
 
 @admin.register(RaceEthnicity)
-class RaceEthnicityAdmin(admin.ModelAdmin):
+class RaceEthnicityAdmin(LookupAdmin):
     list_display = ("name",)
     search_fields = ("name",)
 
 
 @admin.register(Faith)
-class FaithAdmin(admin.ModelAdmin):
+class FaithAdmin(LookupAdmin):
     list_display = ("name",)
     search_fields = ("name",)
 
 
 @admin.register(LGBTQIA)
-class LGBTQIAAdmin(admin.ModelAdmin):
+class LGBTQIAAdmin(LookupAdmin):
     list_display = ("name",)
     search_fields = ("name",)
 
 
 @admin.register(OtherIdentity)
-class OtherIdentityAdmin(admin.ModelAdmin):
+class OtherIdentityAdmin(LookupAdmin):
     list_display = ("name",)
     search_fields = ("name",)
 
@@ -220,29 +296,37 @@ class OtherIdentityAdmin(admin.ModelAdmin):
 @admin.register(RaceEthnicitySelection)
 class RaceEthnicitySelectionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "race_ethnicity")
+    list_select_related = ("therapist__user", "race_ethnicity")
+    autocomplete_fields = ("therapist", "race_ethnicity")
     search_fields = ("therapist__display_name", "race_ethnicity__name")
 
 
 @admin.register(FaithSelection)
 class FaithSelectionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "faith")
+    list_select_related = ("therapist__user", "faith")
+    autocomplete_fields = ("therapist", "faith")
     search_fields = ("therapist__display_name", "faith__name")
 
 
 @admin.register(LGBTQIASelection)
 class LGBTQIASelectionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "lgbtqia")
+    list_select_related = ("therapist__user", "lgbtqia")
+    autocomplete_fields = ("therapist", "lgbtqia")
     search_fields = ("therapist__display_name", "lgbtqia__name")
 
 
 @admin.register(OtherIdentitySelection)
 class OtherIdentitySelectionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "other_identity")
+    list_select_related = ("therapist__user", "other_identity")
+    autocomplete_fields = ("therapist", "other_identity")
     search_fields = ("therapist__display_name", "other_identity__name")
 
 
 @admin.register(TestingType)
-class TestingTypeAdmin(admin.ModelAdmin):
+class TestingTypeAdmin(LookupAdmin):
     list_display = ("name", "category", "sort_order")
     list_editable = ("category", "sort_order")
     search_fields = ("name",)
@@ -251,37 +335,49 @@ class TestingTypeAdmin(admin.ModelAdmin):
 @admin.register(TestingTypeSelection)
 class TestingTypeSelectionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "testing_type")
+    list_select_related = ("therapist__user", "testing_type")
+    autocomplete_fields = ("therapist", "testing_type")
     search_fields = ("therapist__display_name", "testing_type__name")
 
 
 @admin.register(AreasOfExpertise)
 class AreasOfExpertiseAdmin(admin.ModelAdmin):
     list_display = ("therapist", "expertise")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     search_fields = ("therapist__display_name", "expertise")
 
 
 @admin.register(VideoGallery)
 class VideoGalleryAdmin(admin.ModelAdmin):
     list_display = ("therapist", "caption")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     search_fields = ("therapist__display_name", "caption")
 
 
 @admin.register(Credential)
 class CredentialAdmin(admin.ModelAdmin):
     list_display = ("therapist", "license_type")
-    list_filter = ("license_type",)
+    list_select_related = ("therapist__user", "license_type")
+    autocomplete_fields = ("therapist", "license_type")
+    list_filter = (("license_type", LookupListFilter),)
     search_fields = ("therapist__display_name", "license_type__name")
 
 
 @admin.register(ProfessionalInsurance)
 class ProfessionalInsuranceAdmin(admin.ModelAdmin):
-    list_display = ("therapist", "npi_number", "malpractice_carrier", "malpractice_expiration_date")
+    list_display = ("therapist", "npi_number", "malpractice_carrier", "malpractice_expiration_date", "malpractice_expires_on")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     search_fields = ("therapist__display_name", "npi_number", "malpractice_carrier")
 
 
 @admin.register(LicenseVerificationLog)
 class LicenseVerificationLogAdmin(admin.ModelAdmin):
     list_display = ("therapist", "status", "created_at")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     list_filter = ("status",)
     search_fields = ("therapist__display_name", "status", "message")
 
@@ -303,10 +399,14 @@ class ZipCodeAdmin(admin.ModelAdmin):
 @admin.register(OtherTherapyType)
 class OtherTherapyTypeAdmin(admin.ModelAdmin):
     list_display = ("therapist", "therapy_type")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     search_fields = ("therapist__display_name", "therapy_type")
 
 
 @admin.register(OtherTreatmentOption)
 class OtherTreatmentOptionAdmin(admin.ModelAdmin):
     list_display = ("therapist", "option_text")
+    list_select_related = ("therapist__user",)
+    autocomplete_fields = ("therapist",)
     search_fields = ("therapist__display_name", "option_text")
@@ -0,0 +1,227 @@
+"""Read-only JSON directory API for partner sites (``/api/therapists/``).
+
+Takes the same facet / availability parameters as the HTML directory, plus:
+
+* ``fields`` -- comma-separated subset of ``DOCUMENT_FIELDS`` (sparse fieldsets)
+* ``limit`` -- page size (default ``API_PAGE_SIZE``, at most ``API_MAX_PAGE_SIZE``)
+* ``after`` -- opaque keyset cursor taken from the previous page's ``next``
+
+Each therapist is serialized once into a document cached under a key that
+includes its ``updated_at`` and the lookup version (writes that bypass
+``save()`` bump it with ``TherapistProfile.touch``), so a page is one keyset
+query plus a ``get_many``; cache misses are built in one batch with
+prefetches, which keeps the query count independent of the page size.
+Responses carry a strong ETag (honouring ``If-None-Match``) and
+``Cache-Control``, and are compressed with Brotli or gzip, whichever the
+client accepts.
+"""
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+from urllib.parse import urljoin
+
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, Q
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+
+from .lookups import lookup_registry
+from .models import (
+    AgeGroup,
+    Gender,
+    InsuranceDetail,
+    InsuranceProvider,
+    Location,
+    ParticipantType,
+    Specialty,
+    SpecialtyLookup,
+    TherapistProfile,
+    Title,
+)
+from .views import filter_directory
+
+DOCUMENT_VERSION = 1
+DOCUMENT_FIELDS = (
+    "id",
+    "slug",
+    "url",
+    "display_name",
+    "first_name",
+    "last_name",
+    "title",
+    "credentials",
+    "gender",
+    "city",
+    "state",
+    "accepts_new_clients",
+    "telehealth_only",
+    "photo_url",
+    "specialties",
+    "top_specialties",
+    "insurance",
+    "age_groups",
+    "participant_types",
+    "locations",
+)
+MIN_COMPRESS_BYTES = 512
+
+
+def _document_key(pk, updated_at, lookup_version) -> str:
+    return f"profiles:api:doc:{DOCUMENT_VERSION}:{lookup_version}:{pk}:{updated_at.timestamp():.6f}"
+
+
+def _absolute(url: str) -> str:
+    # Storage URLs (e.g. S3) are already absolute and come back unchanged
+    return urljoin(settings.BASE_URL, url) if settings.BASE_URL else url
+
+
+def _serialize(profile) -> dict:
+    specialties = [s for s in profile.specialty_items.all() if s.specialty_id]
+    return {
+        "id": profile.pk,
+        "slug": profile.slug,
+        "url": _absolute(reverse("profiles:profile_detail", kwargs={"slug": profile.slug})),
+        "display_name": profile.display_name,
+        "first_name": profile.first_name,
+        "last_name": profile.last_name,
+        "title": lookup_registry.label(Title, profile.title_fk_id) or profile.title,
+        "credentials": profile.licenses,
+        "gender": lookup_registry.label(Gender, profile.gender_id) or None,
+        "city": profile.city,
+        "state": profile.state,
+        "accepts_new_clients": profile.accepts_new_clients,
+        "telehealth_only": profile.telehealth_only,
+        "photo_url": _absolute(profile.photo_card_url) if profile.photo else None,
+        "specialties": [lookup_registry.label(SpecialtyLookup, s.specialty_id) for s in specialties],
+        "top_specialties": [lookup_registry.label(SpecialtyLookup, s.specialty_id) for s in specialties if s.is_top_specialty],
+        "insurance": [lookup_registry.label(InsuranceProvider, d.provider_id) for d in profile.insurance_details.all() if d.provider_id],
+        "age_groups": [lookup_registry.label(AgeGroup, a.pk) for a in profile.age_groups.all()],
+        "participant_types": [lookup_registry.label(ParticipantType, p.pk) for p in profile.participant_types.all()],
+        "locations": [
+            {
+                "practice_name": loc.practice_name,
+                "street_address": "" if loc.hide_address_from_public else loc.street_address,
+                "city": loc.city,
+                "state": loc.state,
+                "zip": loc.zip,
+                "is_primary": loc.is_primary_address,
+                "has_evening_hours": loc.has_evening_hours,
+                "has_weekend_hours": loc.has_weekend_hours,
+            }
+            for loc in profile.locations.all()
+        ],
+    }
+
+
+def _build_documents(pks) -> dict:
+    """Serialize many profiles with a fixed number of queries."""
+    profiles = TherapistProfile.objects.filter(pk__in=pks).prefetch_related(
+        Prefetch("specialty_items", queryset=Specialty.objects.order_by("pk")),
+        Prefetch("insurance_details", queryset=InsuranceDetail.objects.filter(out_of_network=False).order_by("pk")),
+        Prefetch("age_groups", queryset=AgeGroup.objects.only("pk").order_by("pk")),
+        Prefetch("participant_types", queryset=ParticipantType.objects.only("pk").order_by("pk")),
+        Prefetch("locations", queryset=Location.objects.order_by("-is_primary_address", "pk")),
+    )
+    return {profile.pk: _serialize(profile) for profile in profiles}
+
+
+def get_documents(rows) -> list:
+    """Documents for (pk, updated_at) rows, from the cache where possible, in row order."""
+    version = lookup_registry.version
+    keys = {pk: _document_key(pk, updated_at, version) for pk, updated_at in rows}
+    cached = cache.get_many(list(keys.values()))
+    docs = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in keys if pk not in docs]
+    if missing:
+        built = _build_documents(missing)
+        cache.set_many({keys[pk]: doc for pk, doc in built.items()}, timeout=getattr(settings, "API_DOCUMENT_CACHE_SECONDS", 3600))
+        docs.update(built)
+    return [docs[pk] for pk, _ in rows if pk in docs]
+
+
+def _encode_cursor(name: str, pk: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name, pk]).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(value: str):
+    try:
+        name, pk = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+        return str(name), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid 'after' cursor")
+
+
+def _bad_request(message: str) -> JsonResponse:
+    return JsonResponse({"error": message}, status=400)
+
+
+def _negotiate_encoding(request: HttpRequest, size: int):
+    if size < MIN_COMPRESS_BYTES:
+        return None
+    accepted = {part.split(";")[0].strip().lower() for part in request.headers.get("Accept-Encoding", "").split(",")}
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+@require_GET
+def therapist_list(request: HttpRequest) -> HttpResponse:
+    fields = [f.strip() for f in request.GET.get("fields", "").split(",") if f.strip()]
+    unknown = sorted(set(fields) - set(DOCUMENT_FIELDS))
+    if unknown:
+        return _bad_request(f"Unknown field(s): {', '.join(unknown)}")
+    page_size = getattr(settings, "API_PAGE_SIZE", 20)
+    try:
+        limit = int(request.GET.get("limit") or page_size)
+    except ValueError:
+        return _bad_request("'limit' must be an integer")
+    limit = max(1, min(limit, getattr(settings, "API_MAX_PAGE_SIZE", 100)))
+
+    qs, _, _ = filter_directory(request.GET)
+    if request.GET.get("after"):
+        try:
+            name, pk = _decode_cursor(request.GET["after"])
+        except ValueError as e:
+            return _bad_request(str(e))
+        qs = qs.filter(Q(display_name__gt=name) | Q(display_name=name, pk__gt=pk))
+    rows = list(qs.order_by("display_name", "pk").values_list("pk", "display_name", "updated_at")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    docs = get_documents([(pk, updated_at) for pk, _, updated_at in rows])
+    if fields:
+        docs = [{f: doc[f] for f in fields} for doc in docs]
+    next_url = None
+    if has_more:
+        params = request.GET.copy()
+        params["after"] = _encode_cursor(rows[-1][1], rows[-1][0])
+        next_url = f"{request.path}?{params.urlencode()}"
+    body = json.dumps({"results": docs, "next": next_url}, separators=(",", ":")).encode("utf-8")
+
+    encoding = _negotiate_encoding(request, len(body))
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+    if etag in parse_etags(request.headers.get("If-None-Match", "")) or request.headers.get("If-None-Match") == "*":
+        response = HttpResponse(status=304)
+    else:
+        if encoding == "br":
+            body = brotli.compress(body)
+        elif encoding == "gzip":
+            body = gzip.compress(body, mtime=0)
+        response = HttpResponse(body, content_type="application/json")
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Cache-Control"] = f"public, max-age={getattr(settings, 'API_CACHE_SECONDS', 60)}"
+    response["Access-Control-Allow-Origin"] = "*"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
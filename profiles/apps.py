@@ -4,4 +4,9 @@ from django.apps import AppConfig
 class ProfilesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "profiles"
-    verbose_name = "Therapist Profiles"
\ No newline at end of file
+    verbose_name = "Therapist Profiles"
+
+    def ready(self):
+        from .signals import connect_signals
+
+        connect_signals()
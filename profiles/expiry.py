@@ -0,0 +1,204 @@
+"""License and malpractice-coverage expiry sweep.
+
+``sweep`` walks the ``(is_active, date_expires)`` index for licenses that have
+lapsed or are within the reminder window, and the parsed
+``malpractice_expires_on`` column for coverage within it. Rows are streamed in
+chunks and everything found for a therapist goes out as a single digest email
+over one mail connection.
+
+Nothing is written until the digest it belongs to has been sent: lapsed
+licenses are deactivated, and reminders recorded, per batch of sent digests
+(one UPDATE per model and batch). A failed send leaves the licenses active, so
+the next run finds them again and the "has been marked inactive" notice is not
+lost. Therapists without an email address cannot be told, so theirs are
+written at once, as are all lapsed licenses when digests are turned off.
+
+Reminders are not tied to the exact reminder days: each row remembers when
+its last reminder was sent, and the nearest reminder not yet sent goes out
+(see ``due_notice``), so a sweep that did not run on a reminder day catches up
+on the next run.
+"""
+import calendar
+import datetime
+import re
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+
+_MONTH_YEAR = re.compile(r"^\s*(\d{1,2})\s*[/\-.]?\s*(\d{4}|\d{2})\s*$")
+_YEAR_MONTH = re.compile(r"^\s*(\d{4})\s*[/\-.]\s*(\d{1,2})\s*$")
+
+
+def parse_month_end(value) -> datetime.date | None:
+    """Last day of the month in a short expiry string ("MM/YYYY", "YYYY-MM", "MM/YY", "MMYYYY")."""
+    if not value:
+        return None
+    m = _YEAR_MONTH.match(value)
+    if m:
+        year, month = int(m.group(1)), int(m.group(2))
+    else:
+        m = _MONTH_YEAR.match(value)
+        if not m:
+            return None
+        month, year = int(m.group(1)), int(m.group(2))
+        if year < 100:
+            year += 2000
+    if not 1 <= month <= 12:
+        return None
+    return datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def due_notice(expires: datetime.date, today: datetime.date, notice_days, sent_on=None) -> int | None:
+    """The reminder (days before ``expires``) that should go out today, or None.
+
+    That is the smallest of ``notice_days`` (sorted ascending) at or above the
+    days left, unless the reminder sent on ``sent_on`` already covered it. A
+    reminder sent for an earlier expiry date (before a renewal) lies outside the
+    window and does not count.
+    """
+    days_left = (expires - today).days
+    due = next((d for d in notice_days if d >= days_left), None)
+    if due is None or days_left < 0:
+        return None
+    if sent_on is not None:
+        sent = next((d for d in notice_days if d >= (expires - sent_on).days), None)
+        if sent is not None and sent <= due:
+            return None
+    return due
+
+
+@dataclass
+class SweepResult:
+    deactivated: int = 0
+    license_notices: int = 0
+    malpractice_notices: int = 0
+    emails_sent: int = 0
+    skipped_no_email: int = 0
+    digests: dict = field(default_factory=dict)  # therapist_id -> list of lines
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sweep(today=None, notice_days=None, chunk_size: int = 500, dry_run: bool = False, send: bool = True) -> SweepResult:
+    from .lookups import lookup_registry
+    from .models import License, LicenseType, ProfessionalInsurance
+
+    today = today or datetime.date.today()
+    notice_days = sorted(set(notice_days if notice_days is not None else settings.EXPIRY_NOTICE_DAYS))
+    result = SweepResult()
+    # therapist_id -> pks to write once that therapist's digest is out
+    lapsed_licenses, notified_licenses, notified_coverage = {}, {}, {}
+
+    def _add(therapist_id, line):
+        result.digests.setdefault(therapist_id, []).append(line)
+
+    def _label(state, type_id, number):
+        st = f" ({state})" if state else ""
+        return f"{lookup_registry.label(LicenseType, type_id)}{st} #{number}".strip()
+
+    columns = ("pk", "therapist_id", "state", "license_type_id", "license_number", "date_expires")
+    lapsed = (
+        License.objects.filter(is_active=True, date_expires__lt=today)
+        .order_by().values_list(*columns).iterator(chunk_size=chunk_size)
+    )
+    for pk, therapist_id, state, type_id, number, expires in lapsed:
+        _add(therapist_id, f"License {_label(state, type_id, number)} expired on {expires:%b %d, %Y} and has been marked inactive.")
+        lapsed_licenses.setdefault(therapist_id, []).append(pk)
+
+    if notice_days:
+        window = (today, today + datetime.timedelta(days=notice_days[-1]))
+        upcoming = (
+            License.objects.filter(is_active=True, date_expires__range=window)
+            .order_by().values_list(*columns, "expiry_notice_sent_on").iterator(chunk_size=chunk_size)
+        )
+        for pk, therapist_id, state, type_id, number, expires, sent_on in upcoming:
+            if due_notice(expires, today, notice_days, sent_on) is None:
+                continue
+            days = (expires - today).days
+            _add(therapist_id, f"License {_label(state, type_id, number)} expires on {expires:%b %d, %Y} ({days} day{'s' if days != 1 else ''}).")
+            notified_licenses.setdefault(therapist_id, []).append(pk)
+            result.license_notices += 1
+
+        coverage = (
+            ProfessionalInsurance.objects.filter(malpractice_expires_on__range=window)
+            .order_by().values_list("pk", "therapist_id", "malpractice_carrier", "malpractice_expires_on", "malpractice_notice_sent_on")
+            .iterator(chunk_size=chunk_size)
+        )
+        for pk, therapist_id, carrier, expires, sent_on in coverage:
+            if due_notice(expires, today, notice_days, sent_on) is None:
+                continue
+            carrier = f" with {carrier}" if carrier else ""
+            _add(therapist_id, f"Malpractice coverage{carrier} expires at the end of {expires:%B %Y}.")
+            notified_coverage.setdefault(therapist_id, []).append(pk)
+            result.malpractice_notices += 1
+
+    if dry_run:
+        result.deactivated = sum(map(len, lapsed_licenses.values()))
+        return result
+
+    def _written(therapist_ids, notices=True):
+        """Deactivate / mark the rows of ``therapist_ids`` once they have been told."""
+        updates = [(License, lapsed_licenses, {"is_active": False})]
+        if notices:
+            updates += [(License, notified_licenses, {"expiry_notice_sent_on": today}),
+                        (ProfessionalInsurance, notified_coverage, {"malpractice_notice_sent_on": today})]
+        with transaction.atomic():
+            for model, by_therapist, values in updates:
+                pks = [pk for tid in therapist_ids for pk in by_therapist.get(tid, ())]
+                if not pks:
+                    continue
+                rows = model.objects.filter(pk__in=pks)
+                if "is_active" in values:
+                    result.deactivated += rows.filter(is_active=True).update(**values)
+                else:
+                    rows.update(**values)
+
+    if send and result.digests:
+        _send_digests(result, chunk_size, _written)
+    elif lapsed_licenses:
+        for ids in _chunks(sorted(lapsed_licenses), chunk_size):
+            _written(ids, notices=False)
+    return result
+
+
+def _send_digests(result: SweepResult, chunk_size: int, written) -> None:
+    """Send the digests a batch at a time, calling ``written(therapist_ids)`` after each batch is out."""
+    from .models import TherapistProfile
+
+    connection = get_connection()
+    connection.open()
+    try:
+        for ids in _chunks(sorted(result.digests), chunk_size):
+            profiles = (
+                TherapistProfile.objects.filter(pk__in=ids)
+                .select_related("user").only("pk", "display_name", "office_email", "user__email", "user__username")
+            )
+            messages, done = [], []
+            for profile in profiles:
+                done.append(profile.pk)
+                to = profile.office_email or profile.user.email
+                if not to:
+                    result.skipped_no_email += 1
+                    continue
+                lines = "\n".join(f"- {line}" for line in result.digests[profile.pk])
+                messages.append(EmailMessage(
+                    subject="License and coverage expiration notice",
+                    body=f"Hello {profile},\n\nPlease review the following:\n\n{lines}\n\nUpdate your profile once renewed.\n",
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[to],
+                ))
+            result.emails_sent += connection.send_messages(messages) or 0
+            written(done)
+    finally:
+        connection.close()
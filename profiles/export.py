@@ -0,0 +1,172 @@
+"""Streaming export of therapist profiles with their selections and licenses.
+
+``iter_records`` walks a TherapistProfile queryset with
+``iterator(chunk_size=...)``; Django runs the prefetches once per chunk, so
+memory stays bounded by the chunk size however large the directory is. The
+``stream_csv`` / ``stream_jsonl`` generators turn records into text lines for
+the ``export_therapists`` command or a ``StreamingHttpResponse``.
+
+Column names match ``import_therapists`` so an export can be re-imported;
+multi-valued columns are lists in JSONL and ";"-separated in CSV.
+"""
+import csv
+import json
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .lookups import lookup_registry
+from .models import (
+    AgeGroup,
+    Faith,
+    Gender,
+    InsuranceDetail,
+    InsuranceProvider,
+    LGBTQIA,
+    License,
+    LicenseType,
+    OtherIdentity,
+    ParticipantType,
+    PaymentMethod,
+    RaceEthnicity,
+    Specialty,
+    SpecialtyLookup,
+    TestingType,
+    TherapyType,
+    Title,
+)
+
+PROFILE_FIELDS = (
+    "id",
+    "slug",
+    "username",
+    "email",
+    "display_name",
+    "first_name",
+    "last_name",
+    "title",
+    "title_fk",
+    "gender",
+    "licenses",
+    "npi_number",
+    "practice_name",
+    "practice_website_url",
+    "phone_number",
+    "office_email",
+    "city",
+    "state",
+    "accepts_new_clients",
+    "telehealth_only",
+    "is_published",
+    "created_at",
+    "updated_at",
+)
+# Selection columns: column -> (prefetch related name, lookup FK attname, lookup model, row filter)
+SELECTION_COLUMNS = {
+    "specialties": ("specialty_items", "specialty_id", SpecialtyLookup, None),
+    "top_specialties": ("specialty_items", "specialty_id", SpecialtyLookup, lambda row: row.is_top_specialty),
+    "therapy_types": ("types_of_therapy", "therapy_type_id", TherapyType, None),
+    "testing_types": ("testing_types", "testing_type_id", TestingType, None),
+    "payment_methods": ("accepted_payment_methods", "payment_method_id", PaymentMethod, None),
+    "insurance": ("insurance_details", "provider_id", InsuranceProvider, lambda row: not row.out_of_network),
+    "insurance_out_of_network": ("insurance_details", "provider_id", InsuranceProvider, lambda row: row.out_of_network),
+    "race_ethnicities": ("race_ethnicities", "race_ethnicity_id", RaceEthnicity, None),
+    "faiths": ("faiths", "faith_id", Faith, None),
+    "lgbtqia": ("lgbtqia_identities", "lgbtqia_id", LGBTQIA, None),
+    "other_identities": ("other_identities", "other_identity_id", OtherIdentity, None),
+}
+M2M_COLUMNS = {
+    "age_groups": AgeGroup,
+    "participant_types": ParticipantType,
+}
+COLUMNS = PROFILE_FIELDS + tuple(M2M_COLUMNS) + tuple(SELECTION_COLUMNS) + ("license_details",)
+LIST_COLUMNS = set(M2M_COLUMNS) | set(SELECTION_COLUMNS) | {"license_details"}
+
+
+def export_queryset(queryset):
+    """The queryset with every related table the export needs prefetched."""
+    related = {name for name, _, _, _ in SELECTION_COLUMNS.values()}
+    prefetches = [
+        Prefetch("specialty_items", queryset=Specialty.objects.order_by("pk")),
+        Prefetch("insurance_details", queryset=InsuranceDetail.objects.order_by("pk")),
+        Prefetch("licenses_details", queryset=License.objects.order_by("pk")),
+    ]
+    prefetches += sorted(related - {"specialty_items", "insurance_details"})
+    for field in M2M_COLUMNS:
+        prefetches.append(Prefetch(field, queryset=M2M_COLUMNS[field].objects.only("pk").order_by("pk")))
+    return queryset.select_related("user").order_by("pk").prefetch_related(*prefetches)
+
+
+def _license_label(lic) -> str:
+    label = lookup_registry.label(LicenseType, lic.license_type_id)
+    if lic.state:
+        label += f"-{lic.state}"
+    if lic.license_number:
+        label += f" #{lic.license_number}"
+    if lic.date_expires:
+        label += f" (exp {lic.date_expires.isoformat()})"
+    if not lic.is_active:
+        label += " [inactive]"
+    return label
+
+
+def iter_records(queryset, chunk_size: int = 500):
+    """Yield one flat dict per profile; multi-valued columns are lists."""
+    for profile in export_queryset(queryset).iterator(chunk_size=chunk_size):
+        record = {
+            "id": profile.pk,
+            "slug": profile.slug,
+            "username": profile.user.get_username(),
+            "email": profile.user.email,
+            "title_fk": lookup_registry.label(Title, profile.title_fk_id),
+            "gender": lookup_registry.label(Gender, profile.gender_id),
+            "created_at": timezone.localtime(profile.created_at).isoformat() if profile.created_at else "",
+            "updated_at": timezone.localtime(profile.updated_at).isoformat() if profile.updated_at else "",
+        }
+        for field in PROFILE_FIELDS:
+            if field not in record:
+                record[field] = getattr(profile, field)
+        for column, model in M2M_COLUMNS.items():
+            record[column] = [lookup_registry.label(model, obj.pk) for obj in getattr(profile, column).all()]
+        for column, (related, attname, model, keep) in SELECTION_COLUMNS.items():
+            record[column] = [
+                lookup_registry.label(model, getattr(row, attname))
+                for row in getattr(profile, related).all()
+                if getattr(row, attname) and (keep is None or keep(row))
+            ]
+        record["license_details"] = [_license_label(lic) for lic in profile.licenses_details.all()]
+        yield {column: record[column] for column in COLUMNS}
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for record in records:
+        yield writer.writerow(["; ".join(record[c]) if c in LIST_COLUMNS else record[c] for c in COLUMNS])
+
+
+def stream_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "jsonl": (stream_jsonl, "application/x-ndjson"),
+}
+
+
+def streaming_response(queryset, fmt: str = "csv", chunk_size: int = 500) -> StreamingHttpResponse:
+    stream, content_type = FORMATS[fmt]
+    response = StreamingHttpResponse(stream(iter_records(queryset, chunk_size)), content_type=f"{content_type}; charset=utf-8")
+    stamp = timezone.localtime().strftime("%Y%m%d-%H%M%S")
+    response["Content-Disposition"] = f'attachment; filename="therapists-{stamp}.{fmt}"'
+    return response
@@ -1,8 +1,71 @@
 from django import forms
-from .models import TherapistProfile
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils.choices import BaseChoiceIterator
+
+from .lookups import lookup_registry
+from .models import (
+    FaithSelection,
+    Gender,
+    InsuranceDetail,
+    LGBTQIASelection,
+    Location,
+    OfficeHour,
+    OtherIdentitySelection,
+    RaceEthnicitySelection,
+    Specialty,
+    TherapistProfile,
+    TherapyTypeSelection,
+    Title,
+)
+
+
+class LookupChoiceIterator(BaseChoiceIterator):
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        yield from lookup_registry.choices(self.field.queryset.model)
+
+    def __len__(self):
+        return len(lookup_registry.rows(self.field.queryset.model)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(lookup_registry.rows(self.field.queryset.model))
+
+
+class LookupChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField whose choices and cleaned values come from the lookup registry."""
+
+    def _get_choices(self):
+        if hasattr(self, "_choices"):
+            return self._choices
+        return LookupChoiceIterator(self)
+
+    choices = property(_get_choices, forms.ChoiceField.choices.fset)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        model = self.queryset.model
+        if isinstance(value, model):
+            value = value.pk
+        obj = lookup_registry.get(model, value)
+        if obj is None:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+        return obj
 
 
 class TherapistProfileForm(forms.ModelForm):
+    title_fk = LookupChoiceField(queryset=Title.objects.all(), required=False)
+    gender = LookupChoiceField(queryset=Gender.objects.all(), required=False)
+
     class Meta:
         model = TherapistProfile
         fields = [
@@ -15,8 +78,6 @@ class TherapistProfileForm(forms.ModelForm):
             "photo",
             "licenses",
             "npi_number",
-            "specialties",
-            "modalities",
             "bio_html",
             "intro_statement",
             "practice_name",
@@ -35,3 +96,187 @@ class TherapistProfileForm(forms.ModelForm):
             "bio_html": forms.Textarea(attrs={"rows": 8}),
             "intro_statement": forms.Textarea(attrs={"rows": 4}),
         }
+
+
+def lookup_formfield(db_field, **kwargs):
+    """formfield_callback: serve lookup foreign keys from the lookup registry."""
+    if isinstance(db_field, models.ForeignKey) and lookup_registry.is_lookup(db_field.related_model):
+        kwargs["form_class"] = LookupChoiceField
+    return db_field.formfield(**kwargs)
+
+
+class BulkInlineForm(forms.ModelForm):
+    def validate_unique(self):
+        # The formset holds every row of the parent, so uniqueness is checked
+        # across the submitted forms in memory instead of one query per form.
+        pass
+
+    def _get_validation_exclusions(self):
+        # Lookup foreign keys were already validated against the registry;
+        # skip the model-level existence query for each of them.
+        exclude = super()._get_validation_exclusions()
+        exclude.update(name for name, field in self.fields.items() if isinstance(field, LookupChoiceField))
+        return exclude
+
+
+class ExistingRowField(forms.Field):
+    """Primary-key field resolved against the formset's already-loaded rows (no query per form)."""
+
+    def __init__(self, formset, **kwargs):
+        self.formset = formset
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            obj = self.formset._existing_object(self.formset.model._meta.pk.to_python(value))
+        except ValidationError:
+            obj = None
+        if obj is None:
+            raise ValidationError("Select a valid choice.", code="invalid_choice")
+        return obj
+
+    def has_changed(self, initial, data):
+        return str(initial if initial is not None else "") != str(data if data is not None else "")
+
+
+class DiffInlineFormSet(forms.BaseInlineFormSet):
+    """Inline formset that saves by diffing the submitted rows against the existing ones.
+
+    Deleted rows go in one DELETE, new rows in one bulk_create and edited rows
+    in one bulk_update of just the changed columns, so a save costs the same
+    handful of queries however many rows the formset holds. bulk_create and
+    bulk_update send no model signals; callers check ``has_saved_changes`` and
+    refresh derived data themselves.
+
+    Edited rows whose ``distinct_fields`` changed are deleted and inserted
+    again with the same primary key instead of updated: swapping two values
+    (Monday's hours to Tuesday and back) would otherwise collide with a unique
+    constraint halfway through the UPDATE.
+    """
+
+    # Fields whose value may appear only once per parent
+    distinct_fields = ()
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        name = self.model._meta.pk.name
+        field = form.fields[name]
+        form.fields[name] = ExistingRowField(self, initial=field.initial, required=False, widget=field.widget)
+
+    def clean(self):
+        super().clean()
+        for name in self.distinct_fields:
+            seen = set()
+            for form in self.forms:
+                if not form.has_changed() and form not in self.initial_forms:
+                    continue
+                if self.can_delete and self._should_delete_form(form):
+                    continue
+                value = form.cleaned_data.get(name)
+                if value is None:
+                    continue
+                if value in seen:
+                    raise ValidationError(f"{value} is listed more than once.")
+                seen.add(value)
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit=False)
+        skip = {self.model._meta.pk.name, self.fk.name}
+        concrete = {f.name for f in self.model._meta.concrete_fields} - skip
+        created, changed, deleted, moved = [], [], [], []
+        changed_fields = set()
+        for form in self.initial_forms:
+            obj = form.instance
+            if obj.pk is None:
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                deleted.append(obj)
+            elif form.has_changed():
+                names = [name for name in form.changed_data if name in concrete]
+                if set(names) & set(self.distinct_fields):
+                    moved.append(obj)
+                elif names:
+                    changed.append(obj)
+                    changed_fields.update(names)
+        for form in self.extra_forms:
+            if form.has_changed() and not (self.can_delete and self._should_delete_form(form)):
+                setattr(form.instance, self.fk.name, self.instance)
+                created.append(form.instance)
+
+        self.new_objects = created
+        self.changed_objects = [(obj, sorted(changed_fields)) for obj in changed]
+        self.changed_objects += [(obj, sorted(concrete)) for obj in moved]
+        self.deleted_objects = deleted
+        self.has_saved_changes = bool(created or changed or deleted or moved)
+        if not self.has_saved_changes:
+            return []
+        with transaction.atomic():
+            # Every old value is gone before any new one is written
+            if deleted or moved:
+                self.model.objects.filter(pk__in=[obj.pk for obj in deleted + moved], **{self.fk.name: self.instance}).delete()
+            if changed:
+                self.model.objects.bulk_update(changed, sorted(changed_fields), batch_size=500)
+            if created or moved:
+                self.model.objects.bulk_create(moved + created, batch_size=500)
+        return created + changed + moved
+
+
+def diff_inline_formset(parent, model, fields, distinct_fields=(), **kwargs):
+    formset = type(f"{model.__name__}FormSet", (DiffInlineFormSet,), {"distinct_fields": distinct_fields})
+    kwargs.setdefault("extra", 1)
+    return forms.inlineformset_factory(
+        parent,
+        model,
+        form=BulkInlineForm,
+        formset=formset,
+        fields=fields,
+        can_delete=True,
+        formfield_callback=lookup_formfield,
+        **kwargs,
+    )
+
+
+SpecialtyFormSet = diff_inline_formset(TherapistProfile, Specialty, ["specialty", "is_top_specialty"], distinct_fields=("specialty",))
+TherapyTypeFormSet = diff_inline_formset(TherapistProfile, TherapyTypeSelection, ["therapy_type"], distinct_fields=("therapy_type",))
+InsuranceFormSet = diff_inline_formset(TherapistProfile, InsuranceDetail, ["provider", "out_of_network"], distinct_fields=("provider",))
+LocationFormSet = diff_inline_formset(TherapistProfile, Location, [
+    "practice_name",
+    "street_address",
+    "address_line_2",
+    "city",
+    "state",
+    "zip",
+    "phone_number",
+    "timezone",
+    "is_primary_address",
+    "by_appointment_only",
+    "hide_address_from_public",
+])
+RaceEthnicityFormSet = diff_inline_formset(TherapistProfile, RaceEthnicitySelection, ["race_ethnicity"], distinct_fields=("race_ethnicity",))
+FaithFormSet = diff_inline_formset(TherapistProfile, FaithSelection, ["faith"], distinct_fields=("faith",))
+LGBTQIAFormSet = diff_inline_formset(TherapistProfile, LGBTQIASelection, ["lgbtqia"], distinct_fields=("lgbtqia",))
+OtherIdentityFormSet = diff_inline_formset(TherapistProfile, OtherIdentitySelection, ["other_identity"], distinct_fields=("other_identity",))
+_time = forms.TimeInput(attrs={"type": "time"}, format="%H:%M")
+OfficeHourFormSet = diff_inline_formset(
+    Location,
+    OfficeHour,
+    ["weekday", "is_closed", "by_appointment_only", "start_time_1", "end_time_1", "start_time_2", "end_time_2"],
+    distinct_fields=("weekday",),
+    max_num=7,
+    widgets={name: _time for name in ("start_time_1", "end_time_1", "start_time_2", "end_time_2")},
+)
+
+# Profile editor sections: (prefix, heading, formset class)
+PROFILE_FORMSETS = (
+    ("specialties", "Specialties", SpecialtyFormSet),
+    ("modalities", "Types of therapy", TherapyTypeFormSet),
+    ("insurance", "Insurance", InsuranceFormSet),
+    ("locations", "Locations", LocationFormSet),
+    ("race", "Race / ethnicity", RaceEthnicityFormSet),
+    ("faith", "Faith", FaithFormSet),
+    ("lgbtqia", "LGBTQIA+", LGBTQIAFormSet),
+    ("identity", "Other identities", OtherIdentityFormSet),
+)
@@ -0,0 +1,135 @@
+"""Weekly interval index over Location office hours.
+
+Each Location's OfficeHour rows are flattened into merged ``OpenInterval``
+rows measured in minutes of the week (Monday 00:00 = 0, local time of the
+location), plus two precomputed flags (``has_evening_hours`` and
+``has_weekend_hours``). The directory answers "open now", "evenings" and
+"weekends" against these indexed columns instead of scanning OfficeHour rows.
+The index is rebuilt whenever a location's OfficeHour rows change.
+"""
+import threading
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+EVENING_START = 17 * 60  # "evening hours" means open after 5pm
+WEEKEND_DAYS = (5, 6)
+
+_pending = threading.local()
+
+
+def _minute(t) -> int:
+    return t.hour * 60 + t.minute
+
+
+def week_intervals(office_hours) -> list:
+    """Merged (start, end) week-minute intervals for one location's OfficeHour rows."""
+    raw = []
+    for oh in office_hours:
+        if oh.is_closed or oh.by_appointment_only:
+            continue
+        for start, end in ((oh.start_time_1, oh.end_time_1), (oh.start_time_2, oh.end_time_2)):
+            if start is None or end is None:
+                continue
+            s = oh.weekday * MINUTES_PER_DAY + _minute(start)
+            e = oh.weekday * MINUTES_PER_DAY + _minute(end)
+            if e <= s:
+                e += MINUTES_PER_DAY  # closes after midnight
+            if e > MINUTES_PER_WEEK:
+                # Sunday night into Monday morning wraps around the week
+                raw.append((s, MINUTES_PER_WEEK))
+                raw.append((0, e - MINUTES_PER_WEEK))
+            else:
+                raw.append((s, e))
+    merged = []
+    for s, e in sorted(raw):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def has_evening(intervals) -> bool:
+    return any(e > (s // MINUTES_PER_DAY) * MINUTES_PER_DAY + EVENING_START for s, e in intervals)
+
+
+def has_weekend(intervals, office_hours) -> bool:
+    weekend = (WEEKEND_DAYS[0] * MINUTES_PER_DAY, MINUTES_PER_WEEK)
+    if any(s < weekend[1] and e > weekend[0] for s, e in intervals):
+        return True
+    return any(oh.weekday in WEEKEND_DAYS and oh.by_appointment_only and not oh.is_closed for oh in office_hours)
+
+
+def rebuild_locations(location_ids=None) -> int:
+    """Rebuild the interval index and flags for the given locations (all if None)."""
+    from .models import Location, OfficeHour, OpenInterval, TherapistProfile
+
+    locations = Location.objects.all()
+    if location_ids is not None:
+        locations = locations.filter(pk__in=list(location_ids))
+    locations = list(locations.only("pk", "therapist_id", "has_evening_hours", "has_weekend_hours"))
+    if not locations:
+        return 0
+    by_location = {loc.pk: [] for loc in locations}
+    for oh in OfficeHour.objects.filter(location_id__in=list(by_location)):
+        by_location[oh.location_id].append(oh)
+
+    intervals = []
+    touched = set()
+    for loc in locations:
+        hours = by_location[loc.pk]
+        merged = week_intervals(hours)
+        flags = (loc.has_evening_hours, loc.has_weekend_hours)
+        loc.has_evening_hours = has_evening(merged)
+        loc.has_weekend_hours = has_weekend(merged, hours)
+        if flags != (loc.has_evening_hours, loc.has_weekend_hours):
+            touched.add(loc.therapist_id)
+        intervals.extend(OpenInterval(location_id=loc.pk, start_minute=s, end_minute=e) for s, e in merged)
+    with transaction.atomic():
+        OpenInterval.objects.filter(location_id__in=list(by_location)).delete()
+        OpenInterval.objects.bulk_create(intervals, batch_size=1000)
+        Location.objects.bulk_update(locations, ["has_evening_hours", "has_weekend_hours"], batch_size=500)
+        # The flags are part of the API documents
+        TherapistProfile.touch(touched)
+    return len(locations)
+
+
+def _flush() -> None:
+    ids = _pending.__dict__.pop("ids", None)
+    if ids:
+        rebuild_locations(ids)
+
+
+def schedule_rebuild(location_id) -> None:
+    """Rebuild a location's index after commit; batched when many rows change at once."""
+    _pending.__dict__.setdefault("ids", set()).add(location_id)
+    transaction.on_commit(_flush)
+
+
+def week_minute(now, tz_name: str) -> int:
+    local = now.astimezone(ZoneInfo(tz_name))
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def open_now_q(prefix: str = "", now=None) -> Q:
+    """Q matching locations (through ``prefix``) open at ``now`` in their own timezone."""
+    from .models import Location
+
+    now = now or timezone.now()
+    q = Q(pk__in=[])
+    for tz_name in Location.objects.values_list("timezone", flat=True).distinct().order_by():
+        try:
+            minute = week_minute(now, tz_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            continue
+        q |= Q(**{
+            f"{prefix}timezone": tz_name,
+            f"{prefix}open_intervals__start_minute__lte": minute,
+            f"{prefix}open_intervals__end_minute__gt": minute,
+        })
+    return q
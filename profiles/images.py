@@ -0,0 +1,139 @@
+"""Responsive WebP derivatives for therapist photos and gallery images.
+
+Uploads are often multi-megabyte phone photos; templates should never serve
+them directly. When a photo or gallery image is saved, fixed-size WebP
+derivatives are rendered with Pillow on a small background thread pool and
+stored through ``default_storage``. The derivative names and dimensions are
+recorded in the row's meta JSON (``photo_meta`` / ``image_meta``), which the
+``*_url`` helpers on the models read to pick a derivative, falling back to the
+original file until the derivatives exist.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# label -> (width, height, crop). Cropped sizes fill the box exactly; the
+# others are scaled down to fit inside it, preserving the aspect ratio.
+DERIVATIVE_SIZES = {
+    "card": (640, 400, True),
+    "detail": (960, 1280, False),
+    "og": (1200, 630, True),
+}
+WEBP_QUALITY = 82
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_name(source_name: str, label: str) -> str:
+    # The full source name (extension included) keeps a.jpg and a.png apart
+    path = PurePosixPath(source_name)
+    return str(path.parent / "derivatives" / f"{path.name}-{label}.webp")
+
+
+def derivative(field_file, meta, label: str):
+    """Meta of a derivative (name, width, height, bytes) if it has been built for the current file, else None."""
+    meta = meta or {}
+    item = (meta.get("derivatives") or {}).get(label)
+    if field_file and item and meta.get("source") == field_file.name:
+        return item
+    return None
+
+
+def derivative_url(field_file, meta, label: str) -> str:
+    """URL of a derivative if it has been built for the current file, else the original."""
+    if not field_file:
+        return ""
+    item = derivative(field_file, meta, label)
+    return default_storage.url(item["name"]) if item else field_file.url
+
+
+def build_derivatives(source_name: str) -> dict:
+    """Render every derivative size for a stored image and return its meta dict."""
+    with default_storage.open(source_name, "rb") as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    width, height = image.size
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("P", "LA", "PA") else "RGB")
+
+    derivatives = {}
+    for label, (w, h, crop) in DERIVATIVE_SIZES.items():
+        if crop:
+            out = ImageOps.fit(image, (w, h), method=Image.Resampling.LANCZOS)
+        else:
+            out = image.copy()
+            out.thumbnail((w, h), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        out.save(buf, format="WEBP", quality=WEBP_QUALITY, method=4)
+        name = derivative_name(source_name, label)
+        # Keep derivative names deterministic (storages may otherwise rename)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        name = default_storage.save(name, ContentFile(buf.getvalue()))
+        derivatives[label] = {"name": name, "width": out.width, "height": out.height, "bytes": buf.tell()}
+    return {"source": source_name, "width": width, "height": height, "derivatives": derivatives}
+
+
+def process(model, pk, file_field: str, meta_field: str) -> None:
+    """Build derivatives for one row and store the meta without re-triggering signals."""
+    try:
+        obj = model.objects.filter(pk=pk).only(file_field).first()
+        field_file = getattr(obj, file_field, None) if obj else None
+        if not field_file:
+            return
+        meta = build_derivatives(field_file.name)
+        # Only record the result if the file was not replaced in the meantime
+        values = {meta_field: meta}
+        if any(f.name == "updated_at" for f in model._meta.concrete_fields):
+            # Cached API documents are keyed on updated_at and carry the derivative URLs
+            values["updated_at"] = timezone.now()
+        model.objects.filter(pk=pk, **{file_field: field_file.name}).update(**values)
+    except Exception:
+        logger.exception("Image derivatives failed for %s pk=%s", model.__name__, pk)
+
+
+def _process_in_worker(*args) -> None:
+    try:
+        process(*args)
+    finally:
+        # Worker threads hold their own connections; don't leave them open
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2),
+                thread_name_prefix="image-derivatives",
+            )
+        return _executor
+
+
+def schedule(model, pk, file_field: str, meta_field: str) -> None:
+    """Queue derivative generation once the current transaction commits."""
+    def _submit():
+        if getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2) <= 0:
+            process(model, pk, file_field, meta_field)
+        else:
+            _get_executor().submit(_process_in_worker, model, pk, file_field, meta_field)
+
+    transaction.on_commit(_submit)
+
+
+def needs_derivatives(field_file, meta) -> bool:
+    return bool(field_file) and (meta or {}).get("source") != field_file.name
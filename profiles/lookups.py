@@ -0,0 +1,126 @@
+"""Process-wide cache for the small, rarely-changing profile lookup tables.
+
+Each worker loads a lookup table the first time it is needed and then serves
+rows, labels and choices from memory. Saving or deleting a lookup row bumps a
+shared version key in the Django cache; every worker compares its local version
+with the shared one (at most every ``LOOKUP_CACHE_CHECK_SECONDS``) and reloads
+when they differ. Point ``CACHE_URL`` at a shared backend in production so the
+version key is visible to all workers.
+"""
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = "profiles:lookups:version"
+
+# Lookup models served from the registry (all live in the profiles app)
+LOOKUP_MODEL_NAMES = (
+    "Title",
+    "Gender",
+    "SpecialtyLookup",
+    "TherapyType",
+    "InsuranceProvider",
+    "PaymentMethod",
+    "ParticipantType",
+    "AgeGroup",
+    "LicenseType",
+    "TestingType",
+    "RaceEthnicity",
+    "Faith",
+    "LGBTQIA",
+    "OtherIdentity",
+)
+
+
+def _new_version() -> int:
+    # Time-based so a version re-created after cache eviction never collides
+    # with a value some worker still holds.
+    return time.time_ns()
+
+
+class LookupRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._by_pk = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def models(self) -> list:
+        return [apps.get_model("profiles", name) for name in LOOKUP_MODEL_NAMES]
+
+    def is_lookup(self, model) -> bool:
+        return model._meta.app_label == "profiles" and model.__name__ in LOOKUP_MODEL_NAMES
+
+    @property
+    def version(self) -> int:
+        """Current shared lookup version (changes whenever any lookup row changes)."""
+        with self._lock:
+            self._check_version()
+            return self._version
+
+    def _check_version(self) -> None:
+        interval = getattr(settings, "LOOKUP_CACHE_CHECK_SECONDS", 5)
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < interval:
+            return
+        version = cache.get_or_set(VERSION_KEY, _new_version, timeout=None)
+        if version != self._version:
+            self._rows.clear()
+            self._by_pk.clear()
+            self._version = version
+        self._checked_at = now
+
+    def rows(self, model) -> tuple:
+        """All rows of a lookup model in display order (sort_order, then name)."""
+        with self._lock:
+            self._check_version()
+            rows = self._rows.get(model)
+            if rows is None:
+                field_names = {f.name for f in model._meta.get_fields()}
+                ordering = ["sort_order", "name"] if "sort_order" in field_names else ["name"]
+                rows = tuple(model.objects.order_by(*ordering))
+                self._rows[model] = rows
+                self._by_pk[model] = {row.pk: row for row in rows}
+            return rows
+
+    def get(self, model, pk):
+        """Cached row for ``pk`` or None; accepts raw GET/POST values."""
+        if pk in (None, ""):
+            return None
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            self.rows(model)
+            return self._by_pk[model].get(pk)
+
+    def label(self, model, pk) -> str:
+        row = self.get(model, pk)
+        return str(row) if row is not None else ""
+
+    def choices(self, model) -> list:
+        return [(row.pk, str(row)) for row in self.rows(model)]
+
+    def by_name(self, model) -> dict:
+        """Map of case-folded name -> row, for resolving imported names."""
+        return {row.name.casefold(): row for row in self.rows(model)}
+
+    def invalidate(self) -> None:
+        """Drop this worker's tables and bump the shared version for the others."""
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, _new_version(), timeout=None)
+        with self._lock:
+            self._rows.clear()
+            self._by_pk.clear()
+            self._version = None
+
+
+lookup_registry = LookupRegistry()
@@ -0,0 +1,65 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from profiles import tokens
+from profiles.models import TherapistProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Map the comma-separated specialties / modalities text onto Specialty and TherapyTypeSelection rows, "
+        "then rewrite the text from the rows so both representations agree."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Profiles processed per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--show-unknown', type=int, default=20, help='List this many unmatched tokens (most common first)')
+
+    def handle(self, *args, **opts):
+        fields = tokens.TEXT_FIELDS
+        unknown = Counter()
+        created = Counter()
+        rewritten = 0
+        profiles = TherapistProfile.objects.order_by("pk").values_list("pk", *fields)
+        chunk = []
+        for row in profiles.iterator(chunk_size=opts['chunk_size']):
+            chunk.append(row)
+            if len(chunk) >= opts['chunk_size']:
+                rewritten += self._process(chunk, opts['dry_run'], unknown, created)
+                chunk = []
+        if chunk:
+            rewritten += self._process(chunk, opts['dry_run'], unknown, created)
+
+        prefix = "Dry run: " if opts['dry_run'] else ""
+        added = ", ".join(f"{field}={created[field]}" for field in fields)
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}selection rows added: {added}; text mirrors rewritten: {rewritten}; unmatched tokens: {sum(unknown.values())}"
+        ))
+        for token, count in unknown.most_common(opts['show_unknown']):
+            self.stdout.write(f"  {count:>5}  {token}")
+
+    def _process(self, chunk, dry_run, unknown, created) -> int:
+        ids = [row[0] for row in chunk]
+        touched = set()
+        with transaction.atomic():
+            for i, field in enumerate(tokens.TEXT_FIELDS, start=1):
+                selection, fk, model, _ = tokens.text_fields()[field]
+                existing = set(selection.objects.filter(therapist_id__in=ids).values_list("therapist_id", f"{fk}_id"))
+                new_rows = []
+                for row in chunk:
+                    wanted, missing = tokens.resolve(model, row[i])
+                    unknown.update(t.casefold() for t in missing)
+                    new_rows += [selection(therapist_id=row[0], **{f"{fk}_id": pk}) for pk in wanted if (row[0], pk) not in existing]
+                created[field] += len(new_rows)
+                if not dry_run:
+                    # bulk_create sends no signals; the text is rewritten below in one pass
+                    selection.objects.bulk_create(new_rows, batch_size=500)
+                    touched.update(row.therapist_id for row in new_rows)
+            if dry_run:
+                return 0
+            # New selection rows change the API documents of these profiles
+            TherapistProfile.touch(touched)
+            return tokens.sync_text_from_rows(ids)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from profiles import images
+from profiles.models import GalleryImage, TherapistProfile
+
+
+class Command(BaseCommand):
+    help = "Build WebP derivatives for therapist photos and gallery images that are missing them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild derivatives even if they are up to date')
+
+    def handle(self, *args, **opts):
+        targets = (
+            (TherapistProfile, "photo", "photo_meta"),
+            (GalleryImage, "image", "image_meta"),
+        )
+        for model, file_field, meta_field in targets:
+            built = 0
+            rows = model.objects.exclude(**{file_field: ""}).exclude(**{f"{file_field}__isnull": True})
+            for pk, name, meta in rows.values_list("pk", file_field, meta_field).iterator():
+                if not opts['force'] and (meta or {}).get("source") == name:
+                    continue
+                images.process(model, pk, file_field, meta_field)
+                built += 1
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: built derivatives for {built} image(s)."))
@@ -0,0 +1,286 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from profiles.lookups import lookup_registry
+from profiles.models import (
+    AgeGroup,
+    Faith,
+    FaithSelection,
+    Gender,
+    InsuranceDetail,
+    InsuranceProvider,
+    LGBTQIA,
+    LGBTQIASelection,
+    OtherIdentity,
+    OtherIdentitySelection,
+    ParticipantType,
+    PaymentMethod,
+    PaymentMethodSelection,
+    RaceEthnicity,
+    RaceEthnicitySelection,
+    Specialty,
+    SpecialtyLookup,
+    TestingType,
+    TestingTypeSelection,
+    TherapistProfile,
+    TherapyType,
+    TherapyTypeSelection,
+    Title,
+)
+
+# Plain TherapistProfile columns copied as-is
+TEXT_FIELDS = (
+    "display_name",
+    "first_name",
+    "last_name",
+    "title",
+    "licenses",
+    "npi_number",
+    "bio_html",
+    "intro_statement",
+    "practice_name",
+    "practice_website_url",
+    "facebook_url",
+    "instagram_url",
+    "linkedin_url",
+    "phone_number",
+    "office_email",
+    "city",
+    "state",
+)
+BOOL_FIELDS = ("accepts_new_clients", "telehealth_only", "is_published")
+# Single-valued lookup FKs on TherapistProfile: column -> lookup model
+FK_FIELDS = {
+    "title_fk": Title,
+    "gender": Gender,
+}
+# Many-to-many lookups on TherapistProfile: column -> lookup model
+M2M_FIELDS = {
+    "participant_types": ParticipantType,
+    "age_groups": AgeGroup,
+}
+# Selection rows: column -> (selection model, lookup FK field, lookup model, extra field values)
+SELECTION_FIELDS = {
+    "specialties": (Specialty, "specialty", SpecialtyLookup, {}),
+    "top_specialties": (Specialty, "specialty", SpecialtyLookup, {"is_top_specialty": True}),
+    "therapy_types": (TherapyTypeSelection, "therapy_type", TherapyType, {}),
+    "testing_types": (TestingTypeSelection, "testing_type", TestingType, {}),
+    "payment_methods": (PaymentMethodSelection, "payment_method", PaymentMethod, {}),
+    "insurance": (InsuranceDetail, "provider", InsuranceProvider, {}),
+    "insurance_out_of_network": (InsuranceDetail, "provider", InsuranceProvider, {"out_of_network": True}),
+    "race_ethnicities": (RaceEthnicitySelection, "race_ethnicity", RaceEthnicity, {}),
+    "faiths": (FaithSelection, "faith", Faith, {}),
+    "lgbtqia": (LGBTQIASelection, "lgbtqia", LGBTQIA, {}),
+    "other_identities": (OtherIdentitySelection, "other_identity", OtherIdentity, {}),
+}
+# Mirror the selected names into the legacy comma-separated text fields
+TEXT_MIRRORS = {
+    "specialties": ("top_specialties", "specialties"),
+    "modalities": ("therapy_types",),
+}
+TRUE_VALUES = {"1", "true", "t", "yes", "y", "x"}
+
+
+def _split(value) -> list:
+    """Multi-valued cells: JSON lists, or ';'-separated strings in CSV."""
+    if value in (None, ""):
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(";")
+    return [str(v).strip() for v in items if str(v).strip()]
+
+
+def _bool(value, default: bool) -> bool:
+    if value in (None, ""):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+class Command(BaseCommand):
+    help = "Bulk-import therapists (users, profiles and selection rows) from a CSV or JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file (one therapist per row, multi-values separated by ";") or JSON list of objects')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Input format (default: from file extension)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk INSERT')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and resolve everything without writing')
+
+    def handle(self, *args, **opts):
+        started = time.monotonic()
+        records = self._load(opts['path'], opts.get('format'))
+        if not records:
+            self.stdout.write(self.style.WARNING("No rows found."))
+            return
+
+        rows, errors = self._resolve(records)
+        if errors:
+            for err in errors:
+                self.stderr.write(self.style.ERROR(err))
+            raise CommandError(f"{len(errors)} validation error(s); nothing imported.")
+
+        resolved = time.monotonic()
+        if opts['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run OK: {len(rows)} therapist(s) valid ({len(rows) / max(resolved - started, 1e-6):.0f} rows/s)."
+            ))
+            return
+
+        with transaction.atomic():
+            counts = self._write(rows, opts['batch_size'])
+        elapsed = time.monotonic() - started
+        summary = ", ".join(f"{label}={n}" for label, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(rows)} therapist(s) in {elapsed:.2f}s ({len(rows) / max(elapsed, 1e-6):.0f} rows/s): {summary}"
+        ))
+
+    def _load(self, path: str, fmt: str | None) -> list:
+        p = Path(path)
+        if not p.exists():
+            raise CommandError(f"File not found: {path}")
+        fmt = fmt or ('json' if p.suffix.lower() == '.json' else 'csv')
+        with p.open(encoding='utf-8-sig', newline='') as f:
+            if fmt == 'json':
+                data = json.load(f)
+                if isinstance(data, dict):
+                    data = data.get('therapists') or []
+                return list(data)
+            return list(csv.DictReader(f))
+
+    def _resolve(self, records: list):
+        """Validate rows and resolve lookup names against the preloaded maps."""
+        User = get_user_model()
+        names = {model: lookup_registry.by_name(model) for model in lookup_registry.models}
+        errors = []
+        rows = []
+        seen = set()
+        for n, rec in enumerate(records, start=1):
+            rec = {k.strip(): v for k, v in rec.items() if k}
+            email = (rec.get('email') or '').strip()
+            username = (rec.get('username') or email).strip()
+            if not username:
+                errors.append(f"row {n}: username or email is required")
+                continue
+            if username.lower() in seen:
+                errors.append(f"row {n}: duplicate username {username!r} in file")
+            seen.add(username.lower())
+
+            def _lookup(model, value):
+                obj = names[model].get(value.casefold())
+                if obj is None:
+                    errors.append(f"row {n}: unknown {model._meta.verbose_name} {value!r}")
+                return obj
+
+            fks = {}
+            for column, model in FK_FIELDS.items():
+                value = (rec.get(column) or '').strip()
+                fks[column] = _lookup(model, value) if value else None
+            m2m = {column: [_lookup(model, v) for v in _split(rec.get(column))] for column, model in M2M_FIELDS.items()}
+            selections = {
+                column: [_lookup(lookup_model, v) for v in _split(rec.get(column))]
+                for column, (_, _, lookup_model, _) in SELECTION_FIELDS.items()
+            }
+            first = (rec.get('first_name') or '').strip()
+            last = (rec.get('last_name') or '').strip()
+            row = {
+                'username': username,
+                'email': email,
+                'text': {field: str(rec.get(field) or '').strip() for field in TEXT_FIELDS},
+                'display_name': (rec.get('display_name') or f"{first} {last}".strip() or username).strip(),
+                'bools': {field: _bool(rec.get(field), TherapistProfile._meta.get_field(field).default) for field in BOOL_FIELDS},
+                'fks': fks,
+                'm2m': m2m,
+                'selections': selections,
+            }
+            errors.extend(f"row {n}: {message}" for message in self._field_errors(row))
+            rows.append(row)
+
+        taken = set(User.objects.filter(username__in=[r['username'] for r in rows]).values_list('username', flat=True))
+        for username in sorted(taken):
+            errors.append(f"user {username!r} already exists")
+        return rows, errors
+
+    def _field_errors(self, row: dict) -> list:
+        """Messages from the model field validators (max_length, email format...) for one row.
+
+        Checked up front so a bad value is reported with its row number
+        instead of failing a whole bulk INSERT.
+        """
+        User = get_user_model()
+        user = User(username=row['username'], email=row['email'])
+        profile = TherapistProfile(**{**row['text'], **row['bools'], 'display_name': row['display_name']})
+        messages = []
+        for instance, exclude in ((user, ['password']), (profile, ['user', 'slug'])):
+            try:
+                instance.clean_fields(exclude=exclude)
+            except ValidationError as e:
+                messages += [f"{field}: {message}" for field, errors in e.message_dict.items() for message in errors]
+        return messages
+
+    def _write(self, rows: list, batch_size: int) -> dict:
+        User = get_user_model()
+        users = []
+        for row in rows:
+            text = row['text']
+            user = User(username=row['username'], email=row['email'], first_name=text['first_name'][:150], last_name=text['last_name'][:150])
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users, batch_size=batch_size)
+        if any(u.pk is None for u in users):
+            # Backends without RETURNING support: fetch the new ids
+            ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'pk'))
+            for u in users:
+                u.pk = ids[u.username]
+
+        profiles = []
+        for row, user in zip(rows, users):
+            fields = {**row['text'], **row['bools'], 'display_name': row['display_name']}
+            for mirror, columns in TEXT_MIRRORS.items():
+                picked = [obj.name for column in columns for obj in row['selections'][column]]
+                if picked and not fields.get(mirror):
+                    fields[mirror] = ", ".join(dict.fromkeys(picked))
+            profiles.append(TherapistProfile(user=user, **fields, **row['fks']))
+        # Slugs for the whole batch come from one allocator query
+        TherapistProfile.bulk_create_with_slugs(profiles, batch_size=batch_size)
+        if any(p.pk is None for p in profiles):
+            ids = dict(TherapistProfile.objects.filter(slug__in=[p.slug for p in profiles]).values_list('slug', 'pk'))
+            for p in profiles:
+                p.pk = ids[p.slug]
+
+        counts = {'users': len(users), 'profiles': len(profiles)}
+        for column, model in M2M_FIELDS.items():
+            through = getattr(TherapistProfile, column).through
+            target = f"{model._meta.model_name}_id"
+            links = [
+                through(therapistprofile_id=profile.pk, **{target: obj.pk})
+                for row, profile in zip(rows, profiles)
+                for obj in dict.fromkeys(row['m2m'][column])
+            ]
+            through.objects.bulk_create(links, batch_size=batch_size)
+            counts[column] = len(links)
+
+        selected = {}
+        for column, (model, fk, _, extra) in SELECTION_FIELDS.items():
+            for row, profile in zip(rows, profiles):
+                for obj in row['selections'][column]:
+                    # Later columns (e.g. top_specialties) override earlier duplicates
+                    selected[(model, profile.pk, obj.pk)] = model(therapist_id=profile.pk, **{f"{fk}_id": obj.pk}, **extra)
+        by_model = {}
+        for (model, _, _), instance in selected.items():
+            by_model.setdefault(model, []).append(instance)
+        for model, instances in by_model.items():
+            model.objects.bulk_create(instances, batch_size=batch_size)
+            counts[model._meta.model_name] = len(instances)
+        # Child rows went in after the profiles; stamp updated_at after them so no API document predates them
+        TherapistProfile.touch(p.pk for p in profiles)
+        return counts
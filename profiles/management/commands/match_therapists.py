@@ -0,0 +1,85 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.lookups import lookup_registry
+from profiles.matching import MatchCriteria, MatchIndex, match, zip_coordinates
+from profiles.models import AgeGroup, InsuranceProvider, ParticipantType, SpecialtyLookup, TherapistProfile
+
+
+class Command(BaseCommand):
+    help = "Rank published therapists for a client's intake criteria, or benchmark the scoring engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--specialty', action='append', default=[], help='Specialty name (repeatable)')
+        parser.add_argument('--insurance', help='In-network insurance provider name')
+        parser.add_argument('--age-group', help='Age group name')
+        parser.add_argument('--participant-type', help='Participant type name')
+        parser.add_argument('--zip', help="Client's ZIP code (enables distance scoring)")
+        parser.add_argument('--max-distance', type=float, default=50.0, help='Miles at which distance credit reaches zero')
+        parser.add_argument('-k', '--top', type=int, default=10, help='Number of matches to return')
+        parser.add_argument('--benchmark', help='Comma-separated synthetic index sizes, e.g. 10000,100000')
+        parser.add_argument('--repeat', type=int, default=50, help='Scoring runs per benchmark size')
+
+    def handle(self, *args, **opts):
+        if opts['benchmark']:
+            try:
+                sizes = [int(n) for n in opts['benchmark'].split(',') if n.strip()]
+            except ValueError:
+                raise CommandError("--benchmark expects comma-separated integers")
+            for n in sizes:
+                self._benchmark(n, opts['top'], opts['repeat'])
+            return
+
+        criteria = MatchCriteria(max_distance_miles=opts['max_distance'])
+        criteria.specialties = [self._lookup(SpecialtyLookup, name).pk for name in opts['specialty']]
+        if opts['insurance']:
+            criteria.insurance = self._lookup(InsuranceProvider, opts['insurance']).pk
+        if opts['age_group']:
+            criteria.age_group = self._lookup(AgeGroup, opts['age_group']).pk
+        if opts['participant_type']:
+            criteria.participant_type = self._lookup(ParticipantType, opts['participant_type']).pk
+        if opts['zip']:
+            criteria.latitude, criteria.longitude = zip_coordinates(opts['zip'])
+            if criteria.latitude is None:
+                raise CommandError(f"Unknown ZIP code {opts['zip']!r}")
+
+        results = match(criteria, opts['top'])
+        names = dict(TherapistProfile.objects.filter(pk__in=[pk for pk, _ in results]).values_list("pk", "display_name"))
+        for rank, (pk, score) in enumerate(results, start=1):
+            self.stdout.write(f"{rank:>3}. {score:6.2f}  {names.get(pk, pk)}")
+        if not results:
+            self.stdout.write(self.style.WARNING("No published therapists."))
+
+    def _lookup(self, model, name):
+        obj = lookup_registry.by_name(model).get(name.casefold())
+        if obj is None:
+            raise CommandError(f"Unknown {model._meta.verbose_name} {name!r}")
+        return obj
+
+    def _benchmark(self, n, k, repeat):
+        started = time.perf_counter()
+        index = MatchIndex.synthetic(n)
+        built = time.perf_counter() - started
+        rng = np.random.default_rng(1)
+        timings = []
+        for _ in range(repeat):
+            criteria = MatchCriteria(
+                specialties=[int(s) for s in rng.choice(np.arange(1, 121), size=3, replace=False)],
+                insurance=int(rng.integers(1, 61)),
+                age_group=int(rng.integers(1, 7)),
+                participant_type=int(rng.integers(1, 5)),
+                latitude=float(rng.uniform(25, 48)),
+                longitude=float(rng.uniform(-123, -70)),
+            )
+            t = time.perf_counter()
+            index.top(criteria, k)
+            timings.append((time.perf_counter() - t) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"{n} therapists: index built in {built:.2f}s; top-{k} p50={statistics.median(timings):.2f}ms "
+            f"p95={p95:.2f}ms max={timings[-1]:.2f}ms over {repeat} run(s)"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from profiles.hours import rebuild_locations
+
+
+class Command(BaseCommand):
+    help = "Rebuild the office-hours interval index (open intervals, evening/weekend flags) for all locations."
+
+    def handle(self, *args, **opts):
+        count = rebuild_locations()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt office-hours index for {count} location(s)."))
@@ -18,47 +18,36 @@ from profiles.models import (
     LGBTQIA,
     OtherIdentity,
 )
+from profiles.lookups import lookup_registry
+
+BATCH_SIZE = 500
 
 
 class Command(BaseCommand):
-    help = "Seed lookup tables for therapist profiles (idempotent)."
+    help = "Seed lookup tables for therapist profiles (idempotent, diff-based bulk sync)."
 
     def add_arguments(self, parser):
         parser.add_argument('--purge-extra', action='store_true', help='Purge non-canonical rows for supported models (safe subset).')
+        parser.add_argument('--dry-run', action='store_true', help='Report the per-model diff without writing anything.')
 
-    @transaction.atomic
     def handle(self, *args, **opts):
-        created_total = 0
-        updated_total = 0
-
-        def _getset(model, name, category=None, sort_order=None):
-            nonlocal created_total, updated_total
-            obj, created = model.objects.get_or_create(name=name)
-            changed = False
-            if category is not None and getattr(obj, 'category', '') != category:
-                try:
-                    obj.category = category
-                    changed = True
-                except Exception:
-                    pass
-            if sort_order is not None and getattr(obj, 'sort_order', 0) != sort_order:
-                try:
-                    obj.sort_order = sort_order
-                    changed = True
-                except Exception:
-                    pass
-            if changed:
-                obj.save()
-                updated_total += 1
-            if created:
-                created_total += 1
-            return obj
+        # Canonical rows per model, collected first and then synced in bulk
+        specs = []
+
+        def _rows(names, category=None, sort=True):
+            rows = []
+            for i, name in enumerate(names, start=1):
+                row = {"name": name}
+                if category is not None:
+                    row["category"] = category(name)
+                if sort:
+                    row["sort_order"] = i
+                rows.append(row)
+            return rows
 
         # Participant Types
         pt_vals = ["Individual", "Couple", "Family", "Group"]
-        for i, name in enumerate(pt_vals, start=1):
-            _getset(ParticipantType, name, sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(pt_vals)} participant types."))
+        specs.append((ParticipantType, "participant types", _rows(pt_vals)))
 
         # Age Groups (normalized labels)
         ag_vals = [
@@ -70,22 +59,17 @@ class Command(BaseCommand):
             "Adults (26-64)",
             "Older Adults (65+)",
         ]
-        for i, name in enumerate(ag_vals, start=1):
-            _getset(AgeGroup, name, sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(ag_vals)} age groups."))
+        specs.append((AgeGroup, "age groups", _rows(ag_vals)))
 
         # Gender
-        for i, name in enumerate(["Male", "Female"], start=1):
-            _getset(Gender, name, sort_order=i)
-        self.stdout.write(self.style.SUCCESS("Seeded gender values."))
+        gender_vals = ["Male", "Female"]
+        specs.append((Gender, "gender values", _rows(gender_vals)))
 
         # Titles
         titles = [
             "Dr.", "Mr.", "Ms.", "Mx.", "Prof.", "Rev.", "Rev. Dr.", "Rabbi", "Pastor", "Father", "Sister",
         ]
-        for i, name in enumerate(titles, start=1):
-            _getset(Title, name, sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(titles)} titles."))
+        specs.append((Title, "titles", _rows(titles)))
 
         # Payment Methods (with categories)
         pm_vals = [
@@ -106,9 +90,7 @@ class Command(BaseCommand):
             ("Venmo", "Peer-to-Peer"),
             ("Zelle", "Peer-to-Peer"),
         ]
-        for i, (name, cat) in enumerate(pm_vals, start=1):
-            _getset(PaymentMethod, name, category=cat, sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(pm_vals)} payment methods."))
+        specs.append((PaymentMethod, "payment methods", _rows([n for n, _ in pm_vals], category=dict(pm_vals).get)))
 
         # Insurance Providers (concise core set)
         ins_vals = [
@@ -128,9 +110,7 @@ class Command(BaseCommand):
             ("TriWest", "Government"),
             ("Self-Pay / Private Pay", "Other"),
         ]
-        for i, (name, cat) in enumerate(ins_vals, start=1):
-            _getset(InsuranceProvider, name, category=cat, sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(ins_vals)} insurance providers."))
+        specs.append((InsuranceProvider, "insurance providers", _rows([n for n, _ in ins_vals], category=dict(ins_vals).get)))
 
         # Therapy Types (core evidence-based + relational + adjunct subset)
         tt_vals = [
@@ -201,9 +181,7 @@ class Command(BaseCommand):
                 return "Adjunct / Specialized"
             return "Other"
 
-        for i, name in enumerate(tt_vals, start=1):
-            _getset(TherapyType, name, category=tt_category(name), sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(tt_vals)} therapy types."))
+        specs.append((TherapyType, "therapy types", _rows(tt_vals, category=tt_category)))
 
         # Specialty Lookup (curated subset)
         spec_vals = [
@@ -239,9 +217,7 @@ class Command(BaseCommand):
                 return "Substance / Addictive"
             return "Other"
 
-        for i, name in enumerate(spec_vals, start=1):
-            _getset(SpecialtyLookup, name, category=spec_category(name), sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(spec_vals)} specialty lookups."))
+        specs.append((SpecialtyLookup, "specialty lookups", _rows(spec_vals, category=spec_category)))
 
         # License Types
         license_types = [
@@ -276,9 +252,7 @@ class Command(BaseCommand):
                 return "Behavioral"
             return "Other"
 
-        for i, name in enumerate(license_types, start=1):
-            _getset(LicenseType, name, category=license_category(name), sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(license_types)} license types."))
+        specs.append((LicenseType, "license types", _rows(license_types, category=license_category)))
 
         # Testing Types
         tt_testing_vals = [
@@ -308,9 +282,7 @@ class Command(BaseCommand):
                 return "Vocational"
             return "Other"
 
-        for i, name in enumerate(tt_testing_vals, start=1):
-            _getset(TestingType, name, category=testing_category(name), sort_order=i)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(tt_testing_vals)} testing types."))
+        specs.append((TestingType, "testing types", _rows(tt_testing_vals, category=testing_category)))
 
         # Identity lookups
         race_vals = [
@@ -324,9 +296,7 @@ class Command(BaseCommand):
             "Multiracial / Multiethnic",
             "Other / Prefer to Self-Describe",
         ]
-        for name in race_vals:
-            _getset(RaceEthnicity, name)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(race_vals)} race/ethnicity values."))
+        specs.append((RaceEthnicity, "race/ethnicity values", _rows(race_vals, sort=False)))
 
         faith_vals = [
             "Christian",
@@ -342,9 +312,7 @@ class Command(BaseCommand):
             "Spiritual but not religious",
             "Other / Interfaith",
         ]
-        for name in faith_vals:
-            _getset(Faith, name)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(faith_vals)} faith values."))
+        specs.append((Faith, "faith values", _rows(faith_vals, sort=False)))
 
         lgbtq_vals = [
             "Lesbian",
@@ -359,9 +327,7 @@ class Command(BaseCommand):
             "Two-Spirit",
             "Ally / Allied",
         ]
-        for name in lgbtq_vals:
-            _getset(LGBTQIA, name)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(lgbtq_vals)} LGBTQIA+ values."))
+        specs.append((LGBTQIA, "LGBTQIA+ values", _rows(lgbtq_vals, sort=False)))
 
         other_identity_vals = [
             "Veteran",
@@ -374,33 +340,66 @@ class Command(BaseCommand):
             "Student",
             "Parent",
         ]
-        for name in other_identity_vals:
-            _getset(OtherIdentity, name)
-        self.stdout.write(self.style.SUCCESS(f"Seeded {len(other_identity_vals)} other identity values."))
-
-        # Optional purge (safe subset only)
-        if opts.get('purge_extra'):
-            # For these models, we can safely remove rows not in the canonical lists
-            def _purge(model, keep_names, label):
-                qs = model.objects.exclude(name__in=set(keep_names))
-                count = qs.count()
-                if count:
-                    qs.delete()
-                self.stdout.write(self.style.WARNING(f"Purged {count} extra rows from {label}."))
-
-            _purge(ParticipantType, pt_vals, 'ParticipantType')
-            _purge(AgeGroup, ag_vals, 'AgeGroup')
-            _purge(Gender, ["Male", "Female"], 'Gender')
-            _purge(Title, titles, 'Title')
-            _purge(PaymentMethod, [n for n, _ in pm_vals], 'PaymentMethod')
-            _purge(InsuranceProvider, [n for n, _ in ins_vals], 'InsuranceProvider')
-            _purge(TherapyType, tt_vals, 'TherapyType')
-            _purge(SpecialtyLookup, spec_vals, 'SpecialtyLookup')
-            _purge(LicenseType, license_types, 'LicenseType')
-            _purge(TestingType, tt_testing_vals, 'TestingType')
-            _purge(RaceEthnicity, race_vals, 'RaceEthnicity')
-            _purge(Faith, faith_vals, 'Faith')
-            _purge(LGBTQIA, lgbtq_vals, 'LGBTQIA')
-            _purge(OtherIdentity, other_identity_vals, 'OtherIdentity')
-
-        self.stdout.write(self.style.SUCCESS(f"Lookup seed complete. created={created_total} updated={updated_total}"))
+        specs.append((OtherIdentity, "other identity values", _rows(other_identity_vals, sort=False)))
+
+        purge = bool(opts.get('purge_extra'))
+        dry_run = bool(opts.get('dry_run'))
+        totals = {"created": 0, "updated": 0, "purged": 0}
+        with transaction.atomic():
+            for model, label, rows in specs:
+                diff = self._sync(model, rows, purge=purge, dry_run=dry_run)
+                for key in totals:
+                    totals[key] += len(diff[key])
+                self._report(model, label, rows, diff, opts.get('verbosity', 1))
+
+        if not dry_run and any(totals.values()):
+            # bulk_create/bulk_update bypass the save signals
+            lookup_registry.invalidate()
+
+        prefix = "Dry run" if dry_run else "Lookup seed complete"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}. created={totals['created']} updated={totals['updated']} purged={totals['purged']}"
+        ))
+
+    def _sync(self, model, rows, purge=False, dry_run=False):
+        """Diff canonical rows against the table and apply the changes in bulk.
+
+        Loads the existing rows in one query; inserts, updates and purges are
+        computed in memory and written with bulk_create/bulk_update/delete.
+        """
+        field_names = {f.name for f in model._meta.get_fields()}
+        existing = {obj.name: obj for obj in model.objects.all()}
+        to_create, to_update, changed_fields = [], [], set()
+        for row in rows:
+            values = {k: v for k, v in row.items() if k in field_names}
+            obj = existing.get(values["name"])
+            if obj is None:
+                to_create.append(model(**values))
+                continue
+            changed = {k for k, v in values.items() if getattr(obj, k) != v}
+            if changed:
+                for k in changed:
+                    setattr(obj, k, values[k])
+                to_update.append(obj)
+                changed_fields |= changed
+        keep = {row["name"] for row in rows}
+        to_purge = [obj for name, obj in existing.items() if name not in keep] if purge else []
+
+        if not dry_run:
+            if to_create:
+                model.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+            if to_update:
+                model.objects.bulk_update(to_update, sorted(changed_fields), batch_size=BATCH_SIZE)
+            if to_purge:
+                model.objects.filter(pk__in=[obj.pk for obj in to_purge]).delete()
+        return {"created": to_create, "updated": to_update, "purged": to_purge}
+
+    def _report(self, model, label, rows, diff, verbosity):
+        created, updated, purged = diff["created"], diff["updated"], diff["purged"]
+        line = f"{model.__name__}: {len(rows)} {label} (+{len(created)} ~{len(updated)} -{len(purged)})"
+        style = self.style.WARNING if purged else self.style.SUCCESS
+        self.stdout.write(style(line))
+        if verbosity >= 2:
+            for sign, objs in (("+", created), ("~", updated), ("-", purged)):
+                for obj in objs:
+                    self.stdout.write(f"  {sign} {obj.name}")
@@ -0,0 +1,42 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.expiry import sweep
+
+
+class Command(BaseCommand):
+    help = "Deactivate lapsed licenses and email each therapist one digest of upcoming license / malpractice expirations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Run as if today were this date (YYYY-MM-DD)')
+        parser.add_argument('--days', help='Comma-separated reminder days before expiry (default: EXPIRY_NOTICE_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows fetched / updated per batch')
+        parser.add_argument('--no-email', action='store_true', help='Deactivate lapsed licenses but send no digests')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would happen without writing or sending')
+
+    def handle(self, *args, **opts):
+        try:
+            today = datetime.date.fromisoformat(opts['date']) if opts['date'] else None
+            days = [int(d) for d in opts['days'].split(',') if d.strip()] if opts['days'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        result = sweep(
+            today=today,
+            notice_days=days,
+            chunk_size=opts['chunk_size'],
+            dry_run=opts['dry_run'],
+            send=not opts['no_email'],
+        )
+        if opts['dry_run'] and opts['verbosity'] > 1:
+            for therapist_id, lines in sorted(result.digests.items()):
+                self.stdout.write(f"therapist {therapist_id}:")
+                for line in lines:
+                    self.stdout.write(f"  - {line}")
+        prefix = "Dry run: " if opts['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}deactivated={result.deactivated}, license_notices={result.license_notices}, "
+            f"malpractice_notices={result.malpractice_notices}, digests={len(result.digests)}, "
+            f"emails_sent={result.emails_sent}, skipped_no_email={result.skipped_no_email}"
+        ))
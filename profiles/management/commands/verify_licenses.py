@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from profiles.models import License, LicenseVerificationLog
+from profiles.verification import FakeBoardServer, VerificationEngine, VerificationJob, build_jobs
+
+
+class Command(BaseCommand):
+    help = "Check active licenses against their state license boards and log the results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--state', action='append', default=[], help='Only check licenses in this state (repeatable)')
+        parser.add_argument('--limit', type=int, default=0, help='Check at most this many licenses')
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'LICENSE_VERIFY_WORKERS', 8), help='Concurrent checks overall')
+        parser.add_argument('--per-board', type=int, default=2, help='Concurrent checks per board')
+        parser.add_argument('--rate', type=float, default=2.0, help='Max requests per second per board (0 = unlimited)')
+        parser.add_argument('--timeout', type=float, default=15.0, help='Per-request timeout in seconds')
+        parser.add_argument('--batch-size', type=int, default=200, help='Log rows per bulk INSERT')
+        parser.add_argument('--dry-run', action='store_true', help='Run the checks but do not write log rows')
+        parser.add_argument('--fake-board', action='store_true', help='Send every check to a local fake board server')
+        parser.add_argument('--benchmark', type=int, default=0, metavar='N',
+                            help='Run N synthetic checks against the fake board (no database access) and report throughput')
+        parser.add_argument('--latency', type=float, default=0.05, help='Fake board response delay in seconds')
+
+    def handle(self, *args, **opts):
+        engine = VerificationEngine(
+            workers=opts['workers'],
+            per_board_concurrency=opts['per_board'],
+            per_board_rate=opts['rate'],
+            timeout=opts['timeout'],
+        )
+        try:
+            if opts['benchmark']:
+                self._benchmark(engine, opts)
+            elif opts['fake_board']:
+                with FakeBoardServer(latency=opts['latency']) as board:
+                    self._verify(engine, opts, search_url=board.url)
+            else:
+                self._verify(engine, opts)
+        finally:
+            engine.close()
+
+    def _verify(self, engine, opts, search_url=""):
+        licenses = License.objects.filter(is_active=True).exclude(license_number="").order_by("pk")
+        if opts['state']:
+            licenses = licenses.filter(state__in=[s.upper() for s in opts['state']])
+        if opts['limit']:
+            licenses = licenses[:opts['limit']]
+        jobs = build_jobs(licenses, search_url_override=search_url)
+        if not jobs:
+            self.stdout.write(self.style.WARNING("No active licenses to verify."))
+            return
+
+        started = time.monotonic()
+        counts = {}
+        pending = []
+        for job, result in engine.run(jobs):
+            counts[result.status] = counts.get(result.status, 0) + 1
+            if opts['dry_run']:
+                continue
+            pending.append(LicenseVerificationLog(
+                therapist_id=job.therapist_id,
+                status=result.status,
+                message=result.message[:512],
+                raw=result.raw,
+            ))
+            if len(pending) >= opts['batch_size']:
+                LicenseVerificationLog.objects.bulk_create(pending)
+                pending = []
+        if pending:
+            LicenseVerificationLog.objects.bulk_create(pending)
+        self._report(len(jobs), counts, time.monotonic() - started, opts['dry_run'])
+
+    def _benchmark(self, engine, opts):
+        with FakeBoardServer(latency=opts['latency']) as board:
+            jobs = [
+                VerificationJob(license_id=i, therapist_id=i, license_number=f"BENCH{i:06d}", state="ZZ",
+                                board_id=i % 5, search_url=board.url)
+                for i in range(1, opts['benchmark'] + 1)
+            ]
+            started = time.monotonic()
+            counts = {}
+            for _, result in engine.run(jobs):
+                counts[result.status] = counts.get(result.status, 0) + 1
+            self._report(len(jobs), counts, time.monotonic() - started, dry_run=True)
+
+    def _report(self, total, counts, elapsed, dry_run):
+        summary = ", ".join(f"{status}={n}" for status, n in sorted(counts.items()))
+        note = " (dry run, nothing logged)" if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {total} license(s) in {elapsed:.2f}s ({total / max(elapsed, 1e-6):.1f}/s): {summary}{note}"
+        ))
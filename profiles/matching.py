@@ -0,0 +1,218 @@
+"""Rank published therapists against a client's intake criteria.
+
+``MatchIndex`` encodes every published therapist as a row of compact NumPy
+feature arrays built straight from the selection tables: a specialty matrix
+(0 = none, 1 = listed, 2 = top specialty), boolean matrices for in-network
+insurance, age groups and participant types, office coordinates (from the
+primary location's ZIP code) and the accepting-new-clients flag.
+``MatchIndex.top`` scores all candidates in one vectorized pass and returns
+the top K.
+
+The index is cached per process and rebuilt after ``MATCH_INDEX_TTL``
+seconds; ``match_therapists --benchmark`` measures scoring latency on
+synthetic indexes.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+
+# Relative weight of each criterion in the final score (each term is 0..1)
+DEFAULT_WEIGHTS = {
+    "specialty": 4.0,
+    "insurance": 3.0,
+    "age_group": 2.0,
+    "participant_type": 1.5,
+    "distance": 2.0,
+    "accepting": 1.0,
+}
+TOP_SPECIALTY_CREDIT = 1.0
+SPECIALTY_CREDIT = 0.5
+EARTH_RADIUS_MILES = 3958.8
+
+_cache = {"index": None, "built_at": 0.0}
+_cache_lock = threading.Lock()
+
+
+@dataclass
+class MatchCriteria:
+    specialties: list = field(default_factory=list)  # SpecialtyLookup ids
+    insurance: int | None = None  # InsuranceProvider id (in-network)
+    age_group: int | None = None
+    participant_type: int | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+    max_distance_miles: float = 50.0
+    weights: dict = field(default_factory=lambda: dict(DEFAULT_WEIGHTS))
+
+
+def _columns(ids) -> dict:
+    return {pk: col for col, pk in enumerate(ids)}
+
+
+class MatchIndex:
+    def __init__(self, therapist_ids, specialty_cols, specialties, insurance_cols, insurance,
+                 age_cols, ages, participant_cols, participants, latitude, longitude, accepting):
+        self.therapist_ids = therapist_ids
+        self.specialty_cols = specialty_cols
+        self.specialties = specialties
+        self.insurance_cols = insurance_cols
+        self.insurance = insurance
+        self.age_cols = age_cols
+        self.ages = ages
+        self.participant_cols = participant_cols
+        self.participants = participants
+        self.latitude = latitude
+        self.longitude = longitude
+        self.accepting = accepting
+
+    def __len__(self) -> int:
+        return len(self.therapist_ids)
+
+    @classmethod
+    def build(cls) -> "MatchIndex":
+        """Encode all published therapists (one query per selection table)."""
+        from .lookups import lookup_registry
+        from .models import (
+            AgeGroup, InsuranceDetail, InsuranceProvider, Location, ParticipantType,
+            Specialty, SpecialtyLookup, TherapistProfile, ZipCode,
+        )
+
+        profiles = list(TherapistProfile.objects.filter(is_published=True).order_by("pk").values_list("pk", "accepts_new_clients"))
+        ids = np.fromiter((pk for pk, _ in profiles), dtype=np.int64, count=len(profiles))
+        row_of = {pk: row for row, (pk, _) in enumerate(profiles)}
+        n = len(profiles)
+
+        specialty_cols = _columns(row.pk for row in lookup_registry.rows(SpecialtyLookup))
+        specialties = np.zeros((n, len(specialty_cols)), dtype=np.uint8)
+        for therapist_id, specialty_id, is_top in Specialty.objects.filter(
+            therapist_id__in=row_of, specialty__isnull=False
+        ).values_list("therapist_id", "specialty_id", "is_top_specialty").iterator():
+            row, col = row_of[therapist_id], specialty_cols.get(specialty_id)
+            if col is not None:
+                specialties[row, col] = max(specialties[row, col], 2 if is_top else 1)
+
+        def _bool_matrix(model, pairs):
+            cols = _columns(row.pk for row in lookup_registry.rows(model))
+            matrix = np.zeros((n, len(cols)), dtype=bool)
+            for therapist_id, lookup_id in pairs:
+                col = cols.get(lookup_id)
+                if col is not None and therapist_id in row_of:
+                    matrix[row_of[therapist_id], col] = True
+            return cols, matrix
+
+        insurance_cols, insurance = _bool_matrix(InsuranceProvider, InsuranceDetail.objects.filter(
+            therapist_id__in=row_of, out_of_network=False, provider__isnull=False,
+        ).values_list("therapist_id", "provider_id").iterator())
+        age_through = TherapistProfile.age_groups.through
+        age_cols, ages = _bool_matrix(AgeGroup, age_through.objects.filter(
+            therapistprofile__is_published=True,
+        ).values_list("therapistprofile_id", "agegroup_id").iterator())
+        participant_through = TherapistProfile.participant_types.through
+        participant_cols, participants = _bool_matrix(ParticipantType, participant_through.objects.filter(
+            therapistprofile__is_published=True,
+        ).values_list("therapistprofile_id", "participanttype_id").iterator())
+
+        # Primary location's ZIP wins; otherwise the first location with a ZIP
+        zips = {}
+        for therapist_id, zip_code in Location.objects.filter(therapist_id__in=row_of).exclude(zip="").order_by(
+            "-is_primary_address", "pk"
+        ).values_list("therapist_id", "zip"):
+            zips.setdefault(therapist_id, zip_code.strip()[:5])
+        coords = {z: (float(lat), float(lon)) for z, lat, lon in ZipCode.objects.filter(
+            zip__in=set(zips.values())).values_list("zip", "latitude", "longitude")}
+        latitude = np.full(n, np.nan, dtype=np.float32)
+        longitude = np.full(n, np.nan, dtype=np.float32)
+        for therapist_id, zip_code in zips.items():
+            if zip_code in coords:
+                latitude[row_of[therapist_id]], longitude[row_of[therapist_id]] = coords[zip_code]
+
+        accepting = np.fromiter((bool(a) for _, a in profiles), dtype=bool, count=n)
+        return cls(ids, specialty_cols, specialties, insurance_cols, insurance, age_cols, ages,
+                   participant_cols, participants, latitude, longitude, accepting)
+
+    @classmethod
+    def synthetic(cls, n: int, specialties: int = 120, insurers: int = 60, age_groups: int = 6,
+                  participant_types: int = 4, seed: int = 0) -> "MatchIndex":
+        """Random index of ``n`` therapists, for benchmarks."""
+        rng = np.random.default_rng(seed)
+        spec = np.zeros((n, specialties), dtype=np.uint8)
+        rows = np.repeat(np.arange(n), 8)
+        spec[rows, rng.integers(0, specialties, size=rows.size)] = 1
+        spec[np.arange(n), rng.integers(0, specialties, size=n)] = 2
+        return cls(
+            np.arange(1, n + 1, dtype=np.int64),
+            _columns(range(1, specialties + 1)), spec,
+            _columns(range(1, insurers + 1)), rng.random((n, insurers)) < 0.15,
+            _columns(range(1, age_groups + 1)), rng.random((n, age_groups)) < 0.5,
+            _columns(range(1, participant_types + 1)), rng.random((n, participant_types)) < 0.5,
+            rng.uniform(25.0, 48.0, n).astype(np.float32),
+            rng.uniform(-123.0, -70.0, n).astype(np.float32),
+            rng.random(n) < 0.7,
+        )
+
+    def _distance_miles(self, lat: float, lon: float):
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        lat2, lon2 = np.radians(self.latitude), np.radians(self.longitude)
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+    def scores(self, criteria: MatchCriteria):
+        """Score every therapist in one vectorized pass (float32 array aligned with ``therapist_ids``)."""
+        w = {**DEFAULT_WEIGHTS, **(criteria.weights or {})}
+        total = np.zeros(len(self), dtype=np.float32)
+
+        cols = [self.specialty_cols[s] for s in criteria.specialties if s in self.specialty_cols]
+        if cols:
+            picked = self.specialties[:, cols]
+            credit = np.where(picked == 2, TOP_SPECIALTY_CREDIT, np.where(picked == 1, SPECIALTY_CREDIT, 0.0))
+            total += w["specialty"] * credit.mean(axis=1, dtype=np.float32)
+
+        for key, value, col_map, matrix in (
+            ("insurance", criteria.insurance, self.insurance_cols, self.insurance),
+            ("age_group", criteria.age_group, self.age_cols, self.ages),
+            ("participant_type", criteria.participant_type, self.participant_cols, self.participants),
+        ):
+            col = col_map.get(value) if value is not None else None
+            if col is not None:
+                total += w[key] * matrix[:, col]
+
+        if criteria.latitude is not None and criteria.longitude is not None and criteria.max_distance_miles > 0:
+            miles = self._distance_miles(criteria.latitude, criteria.longitude)
+            closeness = np.clip(1.0 - miles / criteria.max_distance_miles, 0.0, 1.0)
+            total += w["distance"] * np.nan_to_num(closeness, nan=0.0).astype(np.float32)
+
+        total += w["accepting"] * self.accepting
+        return total
+
+    def top(self, criteria: MatchCriteria, k: int = 20) -> list:
+        """[(therapist_id, score)] for the ``k`` best matches, best first."""
+        if not len(self) or k <= 0:
+            return []
+        scores = self.scores(criteria)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self.therapist_ids[i]), float(scores[i])) for i in best]
+
+
+def get_index() -> MatchIndex:
+    ttl = getattr(settings, "MATCH_INDEX_TTL", 300)
+    with _cache_lock:
+        if _cache["index"] is None or time.monotonic() - _cache["built_at"] > ttl:
+            _cache["index"] = MatchIndex.build()
+            _cache["built_at"] = time.monotonic()
+        return _cache["index"]
+
+
+def match(criteria: MatchCriteria, k: int = 20) -> list:
+    return get_index().top(criteria, k)
+
+
+def zip_coordinates(zip_code: str):
+    from .models import ZipCode
+
+    row = ZipCode.objects.filter(zip=(zip_code or "").strip()[:5]).values_list("latitude", "longitude").first()
+    return (float(row[0]), float(row[1])) if row else (None, None)
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.7 on 2026-10-19 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_faith_lgbtqia_otheridentity_raceethnicity_and_more'),
+    ]
+
+    operations = [
+        # Not part of the photo derivatives: OfficeHour.end_time_2 has been on the
+        # model since the split-shift fields were added, but 0004 only created
+        # start_time_2, so makemigrations picked the missing column up here.
+        migrations.AddField(
+            model_name='officehour',
+            name='end_time_2',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='therapistprofile',
+            name='photo_meta',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Source dimensions and WebP derivatives of the photo', null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-19 08:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_officehour_end_time_2_therapistprofile_photo_meta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='has_evening_hours',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='has_weekend_hours',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='timezone',
+            field=models.CharField(default='America/New_York', help_text='IANA time zone of the office hours, e.g. America/New_York', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='OpenInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_intervals', to='profiles.location')),
+            ],
+            options={
+                'ordering': ['location', 'start_minute'],
+                'indexes': [models.Index(fields=['start_minute', 'end_minute'], name='profiles_op_start_m_1ead76_idx')],
+            },
+        ),
+    ]
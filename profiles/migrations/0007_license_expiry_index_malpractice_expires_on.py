@@ -0,0 +1,59 @@
+# Generated by Django 5.0.7 on 2026-10-19 08:48
+
+import calendar
+import datetime
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of profiles.expiry.parse_month_end as of this migration
+_MONTH_YEAR = re.compile(r"^\s*(\d{1,2})\s*[/\-.]?\s*(\d{4}|\d{2})\s*$")
+_YEAR_MONTH = re.compile(r"^\s*(\d{4})\s*[/\-.]\s*(\d{1,2})\s*$")
+
+
+def parse_month_end(value):
+    if not value:
+        return None
+    m = _YEAR_MONTH.match(value)
+    if m:
+        year, month = int(m.group(1)), int(m.group(2))
+    else:
+        m = _MONTH_YEAR.match(value)
+        if not m:
+            return None
+        month, year = int(m.group(1)), int(m.group(2))
+        if year < 100:
+            year += 2000
+    if not 1 <= month <= 12:
+        return None
+    return datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def backfill_malpractice_expires_on(apps, schema_editor):
+    ProfessionalInsurance = apps.get_model('profiles', 'ProfessionalInsurance')
+    rows = []
+    for row in ProfessionalInsurance.objects.exclude(malpractice_expiration_date='').only('pk', 'malpractice_expiration_date').iterator(chunk_size=500):
+        row.malpractice_expires_on = parse_month_end(row.malpractice_expiration_date)
+        if row.malpractice_expires_on:
+            rows.append(row)
+    ProfessionalInsurance.objects.bulk_update(rows, ['malpractice_expires_on'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0006_location_has_evening_hours_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professionalinsurance',
+            name='malpractice_expires_on',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='license',
+            index=models.Index(fields=['is_active', 'date_expires'], name='license_active_expires_idx'),
+        ),
+        migrations.RunPython(backfill_malpractice_expires_on, migrations.RunPython.noop),
+    ]
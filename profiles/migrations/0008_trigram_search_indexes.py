@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import migrations
+
+# (index, table, column): gin_trgm_ops indexes serving the therapist profile admin search
+INDEXES = [
+    ('profiles_therapistprofile_display_name_trgm', 'profiles_therapistprofile', 'display_name'),
+    ('profiles_therapistprofile_first_name_trgm', 'profiles_therapistprofile', 'first_name'),
+    ('profiles_therapistprofile_last_name_trgm', 'profiles_therapistprofile', 'last_name'),
+    ('profiles_therapistprofile_licenses_trgm', 'profiles_therapistprofile', 'licenses'),
+    # Indexes on the user table, created here because only the profile admin's
+    # user search (trigram_related_search) needs them. The table name is the
+    # default auth.User one; a swapped user model would need its own migration.
+    ('auth_user_username_trgm', 'auth_user', 'username'),
+    ('auth_user_email_trgm', 'auth_user', 'email'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    # Trigram indexes are PostgreSQL-only; SQLite keeps Django's default search
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in INDEXES:
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING gin ("{column}" gin_trgm_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('profiles', '0007_license_expiry_index_malpractice_expires_on'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+def fill_null_meta(apps, schema_editor):
+    # Rows saved while the columns were nullable; NOT NULL needs a value
+    apps.get_model('profiles', 'TherapistProfile').objects.filter(photo_meta__isnull=True).update(photo_meta={})
+    apps.get_model('profiles', 'GalleryImage').objects.filter(image_meta__isnull=True).update(image_meta={})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0008_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_null_meta, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='galleryimage',
+            name='image_meta',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='therapistprofile',
+            name='photo_meta',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Source dimensions and WebP derivatives of the photo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0009_photo_meta_image_meta_not_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='license',
+            name='expiry_notice_sent_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='professionalinsurance',
+            name='malpractice_notice_sent_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
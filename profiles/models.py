@@ -1,7 +1,16 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .expiry import parse_month_end
+from .images import derivative_url
+from .lookups import lookup_registry
+
+# Slug allocation: leave room for a "-<n>" suffix within the 150-char field
+SLUG_BASE_LENGTH = 140
+SLUG_RETRIES = 3
+
 
 class Title(models.Model):
     name = models.CharField(max_length=64, unique=True)
@@ -81,6 +90,7 @@ class TherapistProfile(models.Model):
     last_name = models.CharField(max_length=64, blank=True, default="")
     gender = models.ForeignKey(Gender, on_delete=models.SET_NULL, blank=True, null=True, related_name="therapists")
     photo = models.ImageField(upload_to="therapists/photos/", blank=True, null=True)
+    photo_meta = models.JSONField(blank=True, default=dict, editable=False, help_text="Source dimensions and WebP derivatives of the photo")
 
     # Professional details
     licenses = models.CharField(max_length=255, blank=True, help_text="Comma-separated license acronyms, e.g., LCSW, LMFT")
@@ -118,16 +128,104 @@ class TherapistProfile(models.Model):
     def __str__(self):
         return self.display_name or self.user.get_username()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded text so a save only re-syncs selection rows when it changed
+        instance._token_text = {f: getattr(instance, f) for f in ("specialties", "modalities") if f in field_names}
+        return instance
+
+    @property
+    def photo_card_url(self) -> str:
+        return derivative_url(self.photo, self.photo_meta, "card")
+
+    @property
+    def photo_detail_url(self) -> str:
+        return derivative_url(self.photo, self.photo_meta, "detail")
+
+    @property
+    def photo_og_url(self) -> str:
+        return derivative_url(self.photo, self.photo_meta, "og")
+
+    @classmethod
+    def touch(cls, pks) -> int:
+        """Bump ``updated_at`` for profiles whose related rows were written without a save().
+
+        Cached API documents are keyed on ``updated_at``; bulk writes and
+        ``.update()`` calls that change what a document shows must go through here.
+        """
+        pks = {pk for pk in pks if pk}
+        return cls.objects.filter(pk__in=pks).update(updated_at=timezone.now()) if pks else 0
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.display_name or self.user.get_username())
-            slug = base
-            i = 2
-            while TherapistProfile.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base}-{i}"
-                i += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(SLUG_RETRIES):
+            self.slug = self.allocate_slugs([self._slug_source()], exclude_pk=self.pk)[0]
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # A concurrent insert may have claimed the slug; re-allocate and retry
+                conflict = TherapistProfile.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                self.slug = ""
+                if not conflict or attempt == SLUG_RETRIES - 1:
+                    raise
+
+    def _slug_source(self) -> str:
+        return self.display_name or self.user.get_username()
+
+    @classmethod
+    def allocate_slugs(cls, texts, exclude_pk=None) -> list:
+        """Unique slugs for ``texts`` (in order) using one ``slug__startswith`` query.
+
+        Taken suffixes for each base are parsed from the existing slugs and the
+        first free one is used (``base``, ``base-2``, ``base-3``...). Slugs are
+        unique within the batch as well.
+        """
+        bases = [(slugify(text)[:SLUG_BASE_LENGTH].strip("-") or "therapist") for text in texts]
+        used = {base: set() for base in bases}
+        query = models.Q()
+        for base in used:
+            query |= models.Q(slug__startswith=base)
+        existing = cls.objects.filter(query)
+        if exclude_pk is not None:
+            existing = existing.exclude(pk=exclude_pk)
+        for slug in existing.values_list("slug", flat=True):
+            if slug in used:
+                used[slug].add(1)
+            head, _, tail = slug.rpartition("-")
+            if head in used and tail.isdigit():
+                used[head].add(int(tail))
+        slugs = []
+        for base in bases:
+            n = 1
+            while n in used[base]:
+                n += 1
+            used[base].add(n)
+            slugs.append(base if n == 1 else f"{base}-{n}")
+        return slugs
+
+    @classmethod
+    def bulk_create_with_slugs(cls, profiles, batch_size=None) -> list:
+        """bulk_create that fills blank slugs and retries on a concurrent slug clash."""
+        auto = [p for p in profiles if not p.slug]
+        unsaved = [p for p in profiles if p.pk is None]
+        for attempt in range(SLUG_RETRIES):
+            if auto:
+                for profile, slug in zip(auto, cls.allocate_slugs([p._slug_source() for p in auto])):
+                    profile.slug = slug
+            try:
+                with transaction.atomic():
+                    return cls.objects.bulk_create(profiles, batch_size=batch_size)
+            except IntegrityError:
+                # Only a concurrent insert of one of our allocated slugs is worth a retry
+                conflict = bool(auto) and cls.objects.filter(slug__in=[p.slug for p in auto]).exists()
+                if not conflict or attempt == SLUG_RETRIES - 1:
+                    raise
+                # Batches inserted before the failure were rolled back
+                for profile in unsaved:
+                    profile.pk = None
 
 
 class Specialty(models.Model):
@@ -136,7 +234,7 @@ class Specialty(models.Model):
     is_top_specialty = models.BooleanField(default=False)
 
     def __str__(self) -> str:
-        return str(self.specialty)
+        return lookup_registry.label(SpecialtyLookup, self.specialty_id)
 
 
 class TherapyTypeSelection(models.Model):
@@ -144,7 +242,7 @@ class TherapyTypeSelection(models.Model):
     therapy_type = models.ForeignKey(TherapyType, on_delete=models.CASCADE)
 
     def __str__(self) -> str:
-        return self.therapy_type.name
+        return lookup_registry.label(TherapyType, self.therapy_type_id)
 
 
 class Education(models.Model):
@@ -171,6 +269,10 @@ class Location(models.Model):
     is_primary_address = models.BooleanField(default=False)
     by_appointment_only = models.BooleanField(default=False)
     notes = models.TextField(blank=True)
+    timezone = models.CharField(max_length=64, default="America/New_York", help_text="IANA time zone of the office hours, e.g. America/New_York")
+    # Precomputed from OfficeHour rows by profiles.hours (see OpenInterval)
+    has_evening_hours = models.BooleanField(default=False, db_index=True, editable=False)
+    has_weekend_hours = models.BooleanField(default=False, db_index=True, editable=False)
 
     def __str__(self) -> str:
         return f"{self.practice_name} ({self.city}, {self.state})"
@@ -195,13 +297,16 @@ class License(models.Model):
     date_issued = models.DateField(blank=True, null=True)
     date_expires = models.DateField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # Day the last expiry reminder went out (see profiles.expiry.due_notice)
+    expiry_notice_sent_on = models.DateField(blank=True, null=True, editable=False)
 
     class Meta:
         verbose_name = "License"
         verbose_name_plural = "Licenses"
+        indexes = [models.Index(fields=["is_active", "date_expires"], name="license_active_expires_idx")]
 
     def __str__(self) -> str:
-        ty = self.license_type.name if self.license_type_id else ""
+        ty = lookup_registry.label(LicenseType, self.license_type_id)
         st = f"-{self.state}" if self.state else ""
         return f"{ty}{st} #{self.license_number}".strip()
 
@@ -229,6 +334,23 @@ class OfficeHour(models.Model):
         return f"{self.location.practice_name or 'Location'} day {self.weekday}"
 
 
+class OpenInterval(models.Model):
+    """Merged open interval of a Location in minutes of the week (Mon 00:00 = 0, local time).
+
+    Derived from OfficeHour rows by profiles.hours.rebuild_locations; do not edit directly.
+    """
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="open_intervals")
+    start_minute = models.PositiveSmallIntegerField()
+    end_minute = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ["location", "start_minute"]
+        indexes = [models.Index(fields=["start_minute", "end_minute"])]
+
+    def __str__(self) -> str:
+        return f"{self.location_id} {self.start_minute}-{self.end_minute}"
+
+
 # Identity lookups
 class RaceEthnicity(models.Model):
     name = models.CharField(max_length=128, unique=True)
@@ -264,7 +386,7 @@ class RaceEthnicitySelection(models.Model):
     race_ethnicity = models.ForeignKey(RaceEthnicity, on_delete=models.CASCADE)
 
     def __str__(self) -> str:
-        return self.race_ethnicity.name
+        return lookup_registry.label(RaceEthnicity, self.race_ethnicity_id)
 
 
 class FaithSelection(models.Model):
@@ -272,7 +394,7 @@ class FaithSelection(models.Model):
     faith = models.ForeignKey(Faith, on_delete=models.CASCADE)
 
     def __str__(self) -> str:
-        return self.faith.name
+        return lookup_registry.label(Faith, self.faith_id)
 
 
 class LGBTQIASelection(models.Model):
@@ -280,7 +402,7 @@ class LGBTQIASelection(models.Model):
     lgbtqia = models.ForeignKey(LGBTQIA, on_delete=models.CASCADE)
 
     def __str__(self) -> str:
-        return self.lgbtqia.name
+        return lookup_registry.label(LGBTQIA, self.lgbtqia_id)
 
 
 class OtherIdentitySelection(models.Model):
@@ -288,7 +410,7 @@ class OtherIdentitySelection(models.Model):
     other_identity = models.ForeignKey(OtherIdentity, on_delete=models.CASCADE)
 
     def __str__(self) -> str:
-        return self.other_identity.name
+        return lookup_registry.label(OtherIdentity, self.other_identity_id)
 
 
 # Testing & Evaluation
@@ -306,7 +428,7 @@ class TestingTypeSelection(models.Model):
     testing_type = models.ForeignKey(TestingType, on_delete=models.CASCADE)
 
     def __str__(self) -> str:
-        return self.testing_type.name
+        return lookup_registry.label(TestingType, self.testing_type_id)
 
 
 class AreasOfExpertise(models.Model):
@@ -338,19 +460,27 @@ class GalleryImage(models.Model):
     therapist = models.ForeignKey(TherapistProfile, on_delete=models.CASCADE, related_name="gallery_images")
     image = models.ImageField(upload_to="therapists/gallery/")
     caption = models.CharField(max_length=128, blank=True)
-    image_meta = models.JSONField(blank=True, null=True, default=dict)
+    image_meta = models.JSONField(blank=True, default=dict)
     is_primary = models.BooleanField(default=False)
 
     def __str__(self) -> str:
         return self.caption or str(self.image)
 
+    @property
+    def card_url(self) -> str:
+        return derivative_url(self.image, self.image_meta, "card")
+
+    @property
+    def detail_url(self) -> str:
+        return derivative_url(self.image, self.image_meta, "detail")
+
 
 class PaymentMethodSelection(models.Model):
     therapist = models.ForeignKey(TherapistProfile, on_delete=models.CASCADE, related_name="accepted_payment_methods")
     payment_method = models.ForeignKey(PaymentMethod, on_delete=models.CASCADE)
 
     def __str__(self) -> str:
-        return self.payment_method.name
+        return lookup_registry.label(PaymentMethod, self.payment_method_id)
 
 
 class InsuranceDetail(models.Model):
@@ -359,7 +489,8 @@ class InsuranceDetail(models.Model):
     out_of_network = models.BooleanField(default=False)
 
     def __str__(self) -> str:
-        return f"{self.provider} ({'OON' if self.out_of_network else 'In-Network'})"
+        provider = lookup_registry.label(InsuranceProvider, self.provider_id)
+        return f"{provider} ({'OON' if self.out_of_network else 'In-Network'})"
 
 
 class VideoGallery(models.Model):
@@ -376,7 +507,7 @@ class Credential(models.Model):
     license_type = models.ForeignKey(LicenseType, on_delete=models.CASCADE, related_name="credentials", null=True, blank=True)
 
     def __str__(self) -> str:
-        return str(self.license_type)
+        return lookup_registry.label(LicenseType, self.license_type_id)
 
 
 class ProfessionalInsurance(models.Model):
@@ -384,10 +515,20 @@ class ProfessionalInsurance(models.Model):
     npi_number = models.CharField(max_length=10, blank=True, unique=True)
     malpractice_carrier = models.CharField(max_length=64, blank=True)
     malpractice_expiration_date = models.CharField(max_length=7, blank=True)
+    # Parsed from malpractice_expiration_date on save (last day of that month)
+    malpractice_expires_on = models.DateField(blank=True, null=True, db_index=True, editable=False)
+    malpractice_notice_sent_on = models.DateField(blank=True, null=True, editable=False)
 
     def __str__(self) -> str:
         return self.npi_number
 
+    def save(self, *args, **kwargs):
+        self.malpractice_expires_on = parse_month_end(self.malpractice_expiration_date)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "malpractice_expiration_date" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "malpractice_expires_on"}
+        super().save(*args, **kwargs)
+
 
 class LicenseVerificationLog(models.Model):
     therapist = models.ForeignKey(TherapistProfile, on_delete=models.CASCADE, related_name="license_verification_logs")
@@ -0,0 +1,106 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from . import hours, images, tokens
+from .lookups import lookup_registry
+from .models import GalleryImage, InsuranceDetail, Location, OfficeHour, Specialty, TherapistProfile, TherapyTypeSelection
+
+_touched = threading.local()
+
+
+def _lookup_changed(sender, **kwargs):
+    # After commit: another worker reloading before then would cache the old rows under the new version
+    transaction.on_commit(lookup_registry.invalidate)
+
+
+def _image_saved(sender, instance, file_field, meta_field):
+    field_file = getattr(instance, file_field)
+    meta = getattr(instance, meta_field)
+    if images.needs_derivatives(field_file, meta):
+        images.schedule(sender, instance.pk, file_field, meta_field)
+    elif not field_file and meta:
+        # Photo removed: forget the old derivatives
+        sender.objects.filter(pk=instance.pk).update(**{meta_field: {}})
+
+
+def _photo_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _image_saved(sender, instance, "photo", "photo_meta")
+
+
+def _gallery_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _image_saved(sender, instance, "image", "image_meta")
+
+
+def _office_hours_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        hours.schedule_rebuild(instance.location_id)
+
+
+def _flush_touched():
+    ids = _touched.__dict__.pop("ids", None)
+    if ids:
+        TherapistProfile.touch(ids)
+
+
+def _touch_profiles(pks) -> None:
+    """Bump updated_at (once per transaction) so cached API documents keyed on it go stale."""
+    pks = {pk for pk in pks if pk}
+    if pks:
+        _touched.__dict__.setdefault("ids", set()).update(pks)
+        transaction.on_commit(_flush_touched)
+
+
+def _profile_child_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _touch_profiles([instance.therapist_id])
+
+
+def _profile_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith("post_"):
+        _touch_profiles((pk_set or ()) if reverse else [instance.pk])
+
+
+def _profile_text_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, "_token_text", {})
+    changed = [
+        f for f in tokens.TEXT_FIELDS
+        if (update_fields is None or f in update_fields) and f in instance.__dict__ and getattr(instance, f) != loaded.get(f, "")
+    ]
+    if changed:
+        tokens.sync_rows_from_text(instance, changed)
+        instance._token_text = {**loaded, **{f: getattr(instance, f) for f in changed}}
+
+
+def _specialty_rows_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tokens.schedule_text_sync(instance.therapist_id, "specialties")
+
+
+def _modality_rows_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tokens.schedule_text_sync(instance.therapist_id, "modalities")
+
+
+def connect_signals():
+    for model in lookup_registry.models:
+        post_save.connect(_lookup_changed, sender=model, dispatch_uid=f"lookup-save-{model.__name__}")
+        post_delete.connect(_lookup_changed, sender=model, dispatch_uid=f"lookup-delete-{model.__name__}")
+    post_save.connect(_photo_saved, sender=TherapistProfile, dispatch_uid="therapist-photo-derivatives")
+    post_save.connect(_gallery_image_saved, sender=GalleryImage, dispatch_uid="gallery-image-derivatives")
+    post_save.connect(_office_hours_changed, sender=OfficeHour, dispatch_uid="office-hours-index-save")
+    post_delete.connect(_office_hours_changed, sender=OfficeHour, dispatch_uid="office-hours-index-delete")
+    for model in (Specialty, InsuranceDetail, Location):
+        post_save.connect(_profile_child_changed, sender=model, dispatch_uid=f"profile-touch-save-{model.__name__}")
+        post_delete.connect(_profile_child_changed, sender=model, dispatch_uid=f"profile-touch-delete-{model.__name__}")
+    for field in ("age_groups", "participant_types"):
+        m2m_changed.connect(_profile_m2m_changed, sender=getattr(TherapistProfile, field).through, dispatch_uid=f"profile-touch-{field}")
+    post_save.connect(_profile_text_saved, sender=TherapistProfile, dispatch_uid="profile-text-tokens")
+    for model, handler in ((Specialty, _specialty_rows_changed), (TherapyTypeSelection, _modality_rows_changed)):
+        post_save.connect(handler, sender=model, dispatch_uid=f"profile-text-mirror-save-{model.__name__}")
+        post_delete.connect(handler, sender=model, dispatch_uid=f"profile-text-mirror-delete-{model.__name__}")
@@ -0,0 +1,967 @@
+import csv
+import datetime
+import io
+import json
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import brotli
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import export, hours, images, matching, tokens
+from .expiry import due_notice, sweep
+from .forms import TherapistProfileForm
+from .lookups import LookupRegistry, lookup_registry
+from .api import _absolute
+from .models import (
+    AgeGroup,
+    GalleryImage,
+    Gender,
+    InsuranceDetail,
+    InsuranceProvider,
+    License,
+    LicenseType,
+    Location,
+    OfficeHour,
+    ParticipantType,
+    ProfessionalInsurance,
+    Specialty,
+    SpecialtyLookup,
+    TherapistProfile,
+    TherapyType,
+    TherapyTypeSelection,
+    ZipCode,
+)
+from .views import _editor_formsets
+from .verification import (
+    ERROR,
+    NEEDS_REVIEW,
+    NO_BOARD,
+    NOT_FOUND,
+    VERIFIED,
+    BoardAdapter,
+    BoardLimiter,
+    FakeBoardServer,
+    SearchPageAdapter,
+    VerificationEngine,
+    VerificationJob,
+    VerificationResult,
+)
+
+
+def _job(number="A12345", search_url="", board_id=1, license_id=1):
+    return VerificationJob(license_id=license_id, therapist_id=license_id, license_number=number, state="ZZ",
+                           board_id=board_id, search_url=search_url)
+
+
+class BrokenAdapter(BoardAdapter):
+    def verify(self, session, job, timeout):
+        raise ValueError("unexpected markup")
+
+
+class ConcurrencyAdapter(BoardAdapter):
+    """Records the most checks seen in flight at once per board."""
+    lock = threading.Lock()
+    running = {}
+    peak = {}
+
+    def verify(self, session, job, timeout):
+        with self.lock:
+            self.running[job.board_id] = self.running.get(job.board_id, 0) + 1
+            self.peak[job.board_id] = max(self.peak.get(job.board_id, 0), self.running[job.board_id])
+        time.sleep(0.02)
+        with self.lock:
+            self.running[job.board_id] -= 1
+        return VerificationResult(VERIFIED)
+
+
+@override_settings(LOOKUP_CACHE_CHECK_SECONDS=0)
+class LookupRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        lookup_registry.invalidate()
+        self.woman = Gender.objects.create(name="Woman")
+        self.man = Gender.objects.create(name="Man")
+
+    def test_rows_are_served_from_memory(self):
+        registry = LookupRegistry()
+        self.assertEqual([row.name for row in registry.rows(Gender)], ["Man", "Woman"])
+        with self.assertNumQueries(0):
+            self.assertEqual(registry.label(Gender, str(self.woman.pk)), "Woman")
+            self.assertEqual(registry.choices(Gender), [(self.man.pk, "Man"), (self.woman.pk, "Woman")])
+            self.assertIsNone(registry.get(Gender, "x"))
+
+    def test_other_workers_reload_after_invalidate(self):
+        worker, other = LookupRegistry(), LookupRegistry()
+        worker.rows(Gender)
+        Gender.objects.filter(pk=self.man.pk).update(name="Male")
+        self.assertEqual(worker.label(Gender, self.man.pk), "Man")
+        other.invalidate()
+        self.assertEqual(worker.label(Gender, self.man.pk), "Male")
+
+    @override_settings(LOOKUP_CACHE_CHECK_SECONDS=60)
+    def test_version_is_checked_at_most_every_interval(self):
+        worker = LookupRegistry()
+        worker.rows(Gender)
+        LookupRegistry().invalidate()
+        with self.assertNumQueries(0):
+            worker.rows(Gender)
+
+    def test_lookup_saves_invalidate_on_commit(self):
+        version = lookup_registry.version
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.man.name = "Male"
+            self.man.save()
+            Gender.objects.get(pk=self.woman.pk).delete()
+            # A reload inside the transaction must not see a new version yet
+            self.assertEqual(lookup_registry.version, version)
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(lookup_registry.version, version)
+        self.assertEqual(lookup_registry.choices(Gender), [(self.man.pk, "Male")])
+
+
+class VerificationEngineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.board = FakeBoardServer()
+        cls.board.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.board.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.engine = VerificationEngine(workers=4, per_board_rate=0, retries=0, timeout=5)
+        self.addCleanup(self.engine.close)
+
+    def test_no_board(self):
+        result = self.engine.check(_job(search_url=""))
+        self.assertEqual(result.status, NO_BOARD)
+        self.assertEqual(result.raw["license_id"], 1)
+
+    def test_verified(self):
+        result = self.engine.check(_job("A12345", self.board.url))
+        self.assertEqual(result.status, VERIFIED)
+        self.assertEqual(result.raw["http_status"], 200)
+        self.assertIn("elapsed_ms", result.raw)
+
+    def test_not_found(self):
+        # The fake board has no license numbers ending in 0
+        self.assertEqual(self.engine.check(_job("A12340", self.board.url)).status, NOT_FOUND)
+
+    def test_search_url_placeholders(self):
+        result = self.engine.check(_job("A12345", self.board.url + "?license_number={license_number}"))
+        self.assertEqual(result.status, VERIFIED)
+
+    def test_http_error(self):
+        result = self.engine.check(_job(search_url="http://127.0.0.1:1/search"))
+        self.assertEqual(result.status, ERROR)
+        self.assertEqual(result.raw["license_id"], 1)
+
+    def test_bad_search_url_template_is_an_error_result(self):
+        result = self.engine.check(_job(search_url=self.board.url + "?q={unknown}"))
+        self.assertEqual(result.status, ERROR)
+        self.assertIn("KeyError", result.message)
+
+    @override_settings(LICENSE_BOARD_ADAPTERS={"default": "profiles.tests.BrokenAdapter"})
+    def test_adapter_exception_does_not_abort_run(self):
+        jobs = [_job(search_url=self.board.url, license_id=i) for i in range(1, 6)]
+        results = list(self.engine.run(jobs))
+        self.assertEqual(len(results), 5)
+        self.assertEqual({result.status for _, result in results}, {ERROR})
+        self.assertIn("ValueError: unexpected markup", results[0][1].message)
+
+    def test_board_adapter_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BoardAdapter()
+
+    @override_settings(LICENSE_BOARD_ADAPTERS={"default": "profiles.tests.ConcurrencyAdapter"})
+    def test_per_board_concurrency(self):
+        ConcurrencyAdapter.peak.clear()
+        engine = VerificationEngine(workers=8, per_board_concurrency=2, per_board_rate=0)
+        self.addCleanup(engine.close)
+        jobs = [_job(search_url=self.board.url, board_id=i % 2, license_id=i) for i in range(12)]
+        self.assertEqual(len(list(engine.run(jobs))), 12)
+        self.assertEqual(ConcurrencyAdapter.peak, {0: 2, 1: 2})
+
+
+class SearchPageAdapterTests(SimpleTestCase):
+    def verify(self, html, number="A123"):
+        session = mock.Mock()
+        session.get.return_value = mock.Mock(status_code=200, url="https://board.example/search", text=html)
+        return SearchPageAdapter().verify(session, _job(number, "https://board.example/search"), timeout=5)
+
+    def test_listed_as_a_whole_token(self):
+        html = "<table><tr><th>License</th></tr><tr><td>Smith, Ann</td><td>a123</td><td>Active</td></tr></table>"
+        self.assertEqual(self.verify(html).status, VERIFIED)
+
+    def test_echoed_query_with_other_licensees_is_not_found(self):
+        html = ("<h2>Results for A123</h2><input name='license_number' value='A123'>"
+                "<table><tr><td>Jones, Bo</td><td>A1234</td></tr><tr><td>Lee, Cy</td><td>XA123</td></tr></table>")
+        result = self.verify(html)
+        self.assertEqual(result.status, NOT_FOUND)
+        self.assertEqual(result.raw["rows"], 2)
+
+    def test_echoed_query_with_no_results(self):
+        html = "<p>No results for A123</p><table><tr><th>License</th><th>Status</th></tr></table>"
+        self.assertEqual(self.verify(html).status, NOT_FOUND)
+
+    def test_unreadable_page_needs_review(self):
+        # The number is on the page, but not in anything the adapter reads as a result
+        self.assertEqual(self.verify("<div>License A123 is active</div>").status, NEEDS_REVIEW)
+
+
+class BoardLimiterTests(SimpleTestCase):
+    def test_spacing(self):
+        limiter = BoardLimiter(concurrency=4, rate=50)
+        started = time.monotonic()
+        for _ in range(5):
+            with limiter:
+                pass
+        # The first request goes straight out, the next four wait 20ms each
+        self.assertGreaterEqual(time.monotonic() - started, 0.075)
+
+    def test_unlimited_rate(self):
+        limiter = BoardLimiter(concurrency=1, rate=0)
+        started = time.monotonic()
+        for _ in range(50):
+            with limiter:
+                pass
+        self.assertLess(time.monotonic() - started, 0.05)
+
+
+class HoursIndexTests(TestCase):
+    def hour(self, weekday, start=None, end=None, **kwargs):
+        return OfficeHour(weekday=weekday, start_time_1=start and datetime.time(*start), end_time_1=end and datetime.time(*end), **kwargs)
+
+    def test_week_intervals(self):
+        day = hours.MINUTES_PER_DAY
+        # Friday evening past midnight, merged with Saturday morning; closed / by-appointment rows have no interval
+        rows = [self.hour(4, (20,), (2,)), self.hour(5, (1,), (3,)), self.hour(0, (9,), (17,), is_closed=True),
+                self.hour(1, (9,), (17,), by_appointment_only=True), self.hour(2, (9,))]
+        self.assertEqual(hours.week_intervals(rows), [(4 * day + 20 * 60, 5 * day + 3 * 60)])
+        # Sunday night wraps into Monday morning
+        self.assertEqual(hours.week_intervals([self.hour(6, (22,), (1,))]), [(0, 60), (6 * day + 22 * 60, 7 * day)])
+        split = self.hour(0, (9,), (12,))
+        split.start_time_2, split.end_time_2 = datetime.time(13), datetime.time(17)
+        self.assertEqual(hours.week_intervals([split]), [(9 * 60, 12 * 60), (13 * 60, 17 * 60)])
+
+    def test_evening_and_weekend_flags(self):
+        def flags(*rows):
+            merged = hours.week_intervals(rows)
+            return hours.has_evening(merged), hours.has_weekend(merged, rows)
+
+        self.assertEqual(flags(self.hour(0, (9,), (17,))), (False, False))
+        self.assertEqual(flags(self.hour(0, (9,), (18,))), (True, False))
+        # Open past midnight counts as an evening of the day it opened
+        self.assertEqual(flags(self.hour(2, (22,), (1,))), (True, False))
+        self.assertEqual(flags(self.hour(5, (10,), (12,))), (False, True))
+        # Friday night into Saturday is weekend time
+        self.assertEqual(flags(self.hour(4, (23,), (1,))), (True, True))
+        self.assertEqual(flags(self.hour(6, (9,), (12,), is_closed=True)), (False, False))
+        self.assertEqual(flags(self.hour(6, by_appointment_only=True)), (False, True))
+
+    def test_open_now_in_the_location_timezone(self):
+        profile = TherapistProfile.objects.create(user=get_user_model().objects.create(username="tz"), display_name="Tz")
+        east = Location.objects.create(therapist=profile, city="Philadelphia", timezone="America/New_York")
+        west = Location.objects.create(therapist=profile, city="Los Angeles", timezone="America/Los_Angeles")
+        broken = Location.objects.create(therapist=profile, city="Nowhere", timezone="Not/AZone")
+        for location in (east, west, broken):
+            OfficeHour.objects.create(location=location, weekday=0, start_time_1=datetime.time(9), end_time_1=datetime.time(17))
+        hours.rebuild_locations()
+
+        def open_at(hour, minute=0):
+            # Monday March 2 2026, server time (UTC)
+            now = datetime.datetime(2026, 3, 2, hour, minute, tzinfo=datetime.timezone.utc)
+            return sorted(Location.objects.filter(hours.open_now_q(now=now)).values_list("city", flat=True))
+
+        self.assertEqual(open_at(13, 30), [])  # 8:30 in Philadelphia
+        self.assertEqual(open_at(16, 30), ["Philadelphia"])  # 8:30 in Los Angeles
+        self.assertEqual(open_at(18), ["Los Angeles", "Philadelphia"])
+        self.assertEqual(open_at(22, 30), ["Los Angeles"])  # 17:30 in Philadelphia
+        self.assertEqual(open_at(1), [])  # Sunday evening locally
+        now = datetime.datetime(2026, 3, 2, 18, tzinfo=datetime.timezone.utc)
+        self.assertEqual(list(TherapistProfile.objects.filter(hours.open_now_q("locations__", now=now)).distinct()), [profile])
+
+
+class ApiDocumentTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create(username="ada")
+        self.profile = TherapistProfile.objects.create(user=user, display_name="Ada Lovelace")
+
+    @override_settings(BASE_URL="https://lcpsych.example")
+    def test_absolute_only_prefixes_relative_urls(self):
+        self.assertEqual(_absolute("/media/a.webp"), "https://lcpsych.example/media/a.webp")
+        self.assertEqual(_absolute("https://bucket.s3.amazonaws.com/a.webp"), "https://bucket.s3.amazonaws.com/a.webp")
+
+    def _age(self):
+        stale = timezone.now() - datetime.timedelta(days=1)
+        TherapistProfile.objects.filter(pk=self.profile.pk).update(updated_at=stale)
+        return stale
+
+    def test_hours_rebuild_touches_profile(self):
+        location = Location.objects.create(therapist=self.profile)
+        OfficeHour.objects.create(location=location, weekday=5, start_time_1=datetime.time(10), end_time_1=datetime.time(12))
+        stale = self._age()
+        hours.rebuild_locations([location.pk])
+        self.assertTrue(Location.objects.get(pk=location.pk).has_weekend_hours)
+        self.assertGreater(TherapistProfile.objects.get(pk=self.profile.pk).updated_at, stale)
+
+    def test_hours_rebuild_without_flag_change_leaves_profile(self):
+        location = Location.objects.create(therapist=self.profile)
+        stale = self._age()
+        hours.rebuild_locations([location.pk])
+        self.assertEqual(TherapistProfile.objects.get(pk=self.profile.pk).updated_at, stale)
+
+
+class ApiQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        anxiety, grief = SpecialtyLookup.objects.create(name="Anxiety"), SpecialtyLookup.objects.create(name="Grief")
+        aetna = InsuranceProvider.objects.create(name="Aetna")
+        adults = AgeGroup.objects.create(name="Adults")
+        couples = ParticipantType.objects.create(name="Couples")
+        gender = Gender.objects.create(name="Woman")
+        for i in range(12):
+            profile = TherapistProfile.objects.create(user=User.objects.create(username=f"api{i}"), display_name=f"Api {i:02d}",
+                                                      is_published=True, gender=gender)
+            Specialty.objects.create(therapist=profile, specialty=anxiety, is_top_specialty=True)
+            Specialty.objects.create(therapist=profile, specialty=grief)
+            InsuranceDetail.objects.create(therapist=profile, provider=aetna)
+            Location.objects.create(therapist=profile, city="Philadelphia", zip="19103")
+            Location.objects.create(therapist=profile, city="Media", zip="19063")
+            profile.age_groups.add(adults)
+            profile.participant_types.add(couples)
+
+    def setUp(self):
+        cache.clear()
+        lookup_registry.invalidate()
+        # Load the lookup tables up front; each is one query, whatever the page size
+        self.client.get("/api/therapists/")
+
+    def get(self, limit):
+        response = self.client.get("/api/therapists/", {"limit": limit})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        for limit in (2, 10):
+            # Cold document cache: the keyset query, the profiles and one query per prefetch
+            TherapistProfile.touch(TherapistProfile.objects.values_list("pk", flat=True))
+            with self.assertNumQueries(7):
+                docs = self.get(limit)
+            self.assertEqual(len(docs), limit)
+            self.assertEqual(docs[0]["specialties"], ["Anxiety", "Grief"])
+            self.assertEqual(len(docs[-1]["locations"]), 2)
+            # Warm: only the keyset query
+            with self.assertNumQueries(1):
+                self.assertEqual(self.get(limit), docs)
+
+    def test_brotli(self):
+        response = self.client.get("/api/therapists/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(json.loads(brotli.decompress(response.content))["results"][0]["display_name"], "Api 00")
+
+
+class TherapistProfileAdminSearchTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.jane = TherapistProfile.objects.create(
+            user=User.objects.create(username="jroe", email="alpha@example.com"), display_name="Jane Roe")
+        self.alpha = TherapistProfile.objects.create(
+            user=User.objects.create(username="abeta", email="ab@example.com"), display_name="Alpha Beta")
+        self.admin = site._registry[TherapistProfile]
+
+    def search(self, term):
+        qs, _ = self.admin.get_search_results(RequestFactory().get("/"), TherapistProfile.objects.all(), term)
+        return qs
+
+    def test_own_columns_and_user_columns(self):
+        self.assertQuerySetEqual(self.search("alpha"), [self.alpha, self.jane])
+        self.assertQuerySetEqual(self.search("jroe"), [self.jane])
+        self.assertQuerySetEqual(self.search('"jane roe"'), [self.jane])
+        self.assertQuerySetEqual(self.search("nobody"), [])
+
+    def test_specialties_and_therapy_types(self):
+        anxiety = SpecialtyLookup.objects.create(name="Anxiety")
+        emdr = TherapyType.objects.create(name="EMDR")
+        Specialty.objects.create(therapist=self.jane, specialty=anxiety)
+        Specialty.objects.create(therapist=self.alpha, specialty=anxiety)
+        TherapyTypeSelection.objects.create(therapist=self.alpha, therapy_type=emdr)
+        self.assertQuerySetEqual(self.search("anxi"), [self.alpha, self.jane])
+        self.assertQuerySetEqual(self.search("emdr"), [self.alpha])
+        # Each relation has to match every term by itself
+        self.assertQuerySetEqual(self.search("anxiety jroe"), [])
+
+    def test_search_does_not_join(self):
+        SpecialtyLookup.objects.create(name="Alphabet")
+        sql = str(self.search("alpha").query)
+        self.assertNotIn("JOIN", sql)
+
+
+class LookupAdminSearchTests(TestCase):
+    def setUp(self):
+        self.woman = Gender.objects.create(name="Woman")
+        self.trans_woman = Gender.objects.create(name="Transgender Woman")
+        Gender.objects.create(name="Man")
+        lookup_registry.invalidate()
+        lookup_registry.rows(Gender)
+        self.user = get_user_model().objects.create_superuser("root", "root@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def test_search_matches_cached_rows(self):
+        admin_ = site._registry[Gender]
+        with self.assertNumQueries(0):
+            qs, may_have_duplicates = admin_.get_search_results(RequestFactory().get("/"), Gender.objects.all(), "WOMAN trans")
+        self.assertFalse(may_have_duplicates)
+        self.assertQuerySetEqual(qs, [self.trans_woman])
+        self.assertNotIn("LIKE", str(qs.query))
+
+    def test_autocomplete_endpoint(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/admin/autocomplete/", {
+                "app_label": "profiles", "model_name": "therapistprofile", "field_name": "gender", "term": "wom",
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["text"] for r in response.json()["results"]], ["Transgender Woman", "Woman"])
+        lookup_queries = [q["sql"] for q in ctx.captured_queries if '"profiles_gender"' in q["sql"]]
+        # The paginator's count and the page itself, both by primary key
+        self.assertEqual(len(lookup_queries), 2)
+        for sql in lookup_queries:
+            self.assertIn('"profiles_gender"."id" IN', sql)
+            self.assertNotIn("LIKE", sql)
+
+
+class GalleryTemplateTests(TestCase):
+    def test_detail_page_serves_gallery_derivatives(self):
+        user = get_user_model().objects.create(username="gal")
+        profile = TherapistProfile.objects.create(user=user, display_name="Gal Lery", is_published=True)
+        meta = {"source": "therapists/gallery/a.jpg", "derivatives": {
+            "card": {"name": "therapists/gallery/derivatives/a.jpg-card.webp", "width": 640, "height": 400},
+            "detail": {"name": "therapists/gallery/derivatives/a.jpg-detail.webp", "width": 960, "height": 720},
+        }}
+        GalleryImage.objects.create(therapist=profile, image="therapists/gallery/a.jpg", image_meta=meta)
+        response = self.client.get(f"/therapists/{profile.slug}/")
+        self.assertContains(response, 'src="/media/therapists/gallery/derivatives/a.jpg-card.webp"')
+        self.assertContains(response, 'href="/media/therapists/gallery/derivatives/a.jpg-detail.webp"')
+        self.assertContains(response, 'width="640" height="400"')
+
+    def test_og_image_tags_describe_the_image_used(self):
+        user = get_user_model().objects.create(username="og")
+        profile = TherapistProfile.objects.create(user=user, display_name="Oh Gee", is_published=True)
+        # No photo: the site logo and its dimensions
+        response = self.client.get(f"/therapists/{profile.slug}/")
+        self.assertContains(response, 'LC_logo_color.png"/>')
+        self.assertContains(response, '<meta property="og:image:width" content="630"/>')
+        self.assertContains(response, '<meta property="og:image:type" content="image/png"/>')
+
+        og = {"name": "therapists/derivatives/og.jpg-og.webp", "width": 1200, "height": 630}
+        TherapistProfile.objects.filter(pk=profile.pk).update(
+            photo="therapists/og.jpg", photo_meta={"source": "therapists/og.jpg", "derivatives": {"og": og}})
+        response = self.client.get(f"/therapists/{profile.slug}/")
+        self.assertContains(response, '<meta property="og:image" content="http://testserver/media/therapists/derivatives/og.jpg-og.webp"/>')
+        self.assertContains(response, '<meta property="og:image:width" content="1200"/>')
+        self.assertContains(response, '<meta property="og:image:height" content="630"/>')
+        self.assertContains(response, '<meta property="og:image:type" content="image/webp"/>')
+
+        # Derivatives not built yet: the original photo, whose size the page does not know
+        TherapistProfile.objects.filter(pk=profile.pk).update(photo_meta={})
+        response = self.client.get(f"/therapists/{profile.slug}/")
+        self.assertContains(response, 'content="http://testserver/media/therapists/og.jpg"/>')
+        self.assertNotContains(response, "og:image:width")
+        self.assertNotContains(response, "og:image:type")
+
+    def test_derivative_names_keep_the_source_extension(self):
+        self.assertNotEqual(images.derivative_name("g/a.jpg", "card"), images.derivative_name("g/a.png", "card"))
+        self.assertEqual(images.derivative_name("g/a.jpg", "card"), "g/derivatives/a.jpg-card.webp")
+
+
+class SlugTests(TestCase):
+    def setUp(self):
+        self.users = iter(get_user_model().objects.create(username=f"u{i}") for i in range(100))
+
+    def profile(self, name, slug=""):
+        return TherapistProfile(user=next(self.users), display_name=name, slug=slug)
+
+    def test_allocate_slugs(self):
+        for slug in ("jane-doe", "jane-doe-2", "jane-doe-smith", "jane-doe-x4"):
+            self.profile("x", slug=slug).save()
+        self.assertEqual(
+            TherapistProfile.allocate_slugs(["Jane Doe", "Jane Doe", "John Roe", "???"]),
+            ["jane-doe-3", "jane-doe-4", "john-roe", "therapist"],
+        )
+
+    def test_allocate_slugs_fills_gaps_and_excludes_self(self):
+        first = self.profile("x", slug="ann")
+        first.save()
+        self.profile("x", slug="ann-3").save()
+        self.assertEqual(TherapistProfile.allocate_slugs(["Ann"]), ["ann-2"])
+        self.assertEqual(TherapistProfile.allocate_slugs(["Ann"], exclude_pk=first.pk), ["ann"])
+
+    def test_save_retries_when_the_slug_was_taken_concurrently(self):
+        self.profile("Ada", slug="ada").save()
+        real = TherapistProfile.allocate_slugs
+        # The first allocation misses the row another request just inserted
+        with mock.patch.object(TherapistProfile, "allocate_slugs", side_effect=[["ada"], real(["Ada"])]) as allocate:
+            profile = self.profile("Ada")
+            profile.save()
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(profile.slug, "ada-2")
+
+    def test_save_does_not_retry_other_integrity_errors(self):
+        taken = self.profile("Bo")
+        taken.save()
+        with mock.patch.object(TherapistProfile, "allocate_slugs", wraps=TherapistProfile.allocate_slugs) as allocate:
+            with self.assertRaises(IntegrityError):
+                TherapistProfile(user=taken.user, display_name="Bo").save()
+        self.assertEqual(allocate.call_count, 1)
+
+    def test_bulk_create_with_slugs(self):
+        self.profile("x", slug="cy").save()
+        created = TherapistProfile.bulk_create_with_slugs([self.profile("Cy"), self.profile("Cy"), self.profile("Di", slug="dee")])
+        self.assertEqual([p.slug for p in created], ["cy-2", "cy-3", "dee"])
+        self.assertEqual(TherapistProfile.objects.count(), 4)
+
+    def test_bulk_create_retries_when_a_slug_was_taken_concurrently(self):
+        self.profile("x", slug="cy").save()
+        real = TherapistProfile.allocate_slugs
+        # "di" goes in with the first batch, which is rolled back when "cy" clashes
+        with mock.patch.object(TherapistProfile, "allocate_slugs", side_effect=[["di", "cy"], real(["Di", "Cy"])]) as allocate:
+            created = TherapistProfile.bulk_create_with_slugs([self.profile("Di"), self.profile("Cy")], batch_size=1)
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual([p.slug for p in created], ["di", "cy-2"])
+        self.assertEqual(TherapistProfile.objects.filter(slug__in=["cy-2", "di"]).count(), 2)
+
+    def test_bulk_create_does_not_retry_other_integrity_errors(self):
+        taken = self.profile("Ed")
+        taken.save()
+        with mock.patch.object(TherapistProfile, "allocate_slugs", wraps=TherapistProfile.allocate_slugs) as allocate:
+            with self.assertRaises(IntegrityError):
+                TherapistProfile.bulk_create_with_slugs([TherapistProfile(user=taken.user, display_name="Ed")])
+        self.assertEqual(allocate.call_count, 1)
+
+
+class ImportTherapistsTests(TestCase):
+    def run_import(self, csv_text):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8") as f:
+            f.write(csv_text)
+            f.flush()
+            call_command("import_therapists", f.name, stdout=io.StringIO(), stderr=self.stderr)
+
+    def setUp(self):
+        self.stderr = io.StringIO()
+
+    def test_field_validators_report_bad_rows(self):
+        with self.assertRaisesMessage(CommandError, "3 validation error(s)"):
+            self.run_import(
+                "username,email,display_name,phone_number,office_email\n"
+                "ok,ok@example.com,Ok,555,\n"
+                "bad,not-an-email,Bad,5555555555555555555555555,\n"
+                "worse,w@example.com,Worse,,nope\n"
+            )
+        errors = self.stderr.getvalue()
+        self.assertIn("row 2: email: Enter a valid email address.", errors)
+        self.assertIn("row 2: phone_number: Ensure this value has at most 20 characters", errors)
+        self.assertIn("row 3: office_email: Enter a valid email address.", errors)
+        self.assertFalse(TherapistProfile.objects.exists())
+
+    def test_valid_rows_are_imported(self):
+        self.run_import("username,email,first_name,last_name\nok,ok@example.com,Ok,Person\n")
+        profile = TherapistProfile.objects.get()
+        self.assertEqual((profile.display_name, profile.slug), ("Ok Person", "ok-person"))
+
+
+class SeedLookupsTests(TestCase):
+    def seed(self, *args):
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("seed_lookups", *args, stdout=out)
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].split(None, 1)[0] in ("INSERT", "UPDATE", "DELETE")]
+        return out.getvalue(), writes
+
+    def test_second_seed_changes_nothing(self):
+        output, writes = self.seed()
+        self.assertIn("Lookup seed complete. created=", output)
+        self.assertTrue(writes)
+        created = {model: model.objects.count() for model in (TherapyType, SpecialtyLookup, InsuranceProvider, AgeGroup)}
+        self.assertTrue(all(created.values()))
+
+        output, writes = self.seed()
+        self.assertIn("Lookup seed complete. created=0 updated=0 purged=0", output)
+        self.assertEqual(writes, [])
+        self.assertEqual({model: model.objects.count() for model in created}, created)
+
+    def test_dry_run_writes_nothing(self):
+        output, writes = self.seed("--dry-run")
+        self.assertRegex(output, r"Dry run\. created=[1-9]\d* updated=0 purged=0")
+        self.assertEqual(writes, [])
+        self.assertFalse(TherapyType.objects.exists())
+
+        self.seed()
+        InsuranceProvider.objects.filter(name="Medicare").update(category="Commercial")
+        extra = InsuranceProvider.objects.create(name="Defunct Health")
+        output, writes = self.seed("--dry-run", "--purge-extra")
+        self.assertIn("Dry run. created=0 updated=1 purged=1", output)
+        self.assertEqual(writes, [])
+        self.assertEqual(InsuranceProvider.objects.get(name="Medicare").category, "Commercial")
+        self.assertTrue(InsuranceProvider.objects.filter(pk=extra.pk).exists())
+
+        output, _ = self.seed("--purge-extra")
+        self.assertIn("created=0 updated=1 purged=1", output)
+        self.assertFalse(InsuranceProvider.objects.filter(pk=extra.pk).exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.anxiety = SpecialtyLookup.objects.create(name="Anxiety")
+        self.grief = SpecialtyLookup.objects.create(name="Grief")
+        self.aetna = InsuranceProvider.objects.create(name="Aetna")
+        self.cigna = InsuranceProvider.objects.create(name="Cigna")
+        self.lcsw = LicenseType.objects.create(name="LCSW")
+        self.adults = AgeGroup.objects.create(name="Adults")
+        self.emdr = TherapyType.objects.create(name="EMDR")
+        self.count = 0
+        lookup_registry.invalidate()
+
+    def add_profiles(self, n):
+        for _ in range(n):
+            self.count += 1
+            user = get_user_model().objects.create(username=f"exp{self.count}", email=f"exp{self.count}@example.com")
+            profile = TherapistProfile.objects.create(user=user, display_name=f"Exp {self.count:02d}", is_published=True)
+            Specialty.objects.create(therapist=profile, specialty=self.anxiety, is_top_specialty=True)
+            Specialty.objects.create(therapist=profile, specialty=self.grief)
+            InsuranceDetail.objects.create(therapist=profile, provider=self.aetna)
+            InsuranceDetail.objects.create(therapist=profile, provider=self.cigna, out_of_network=True)
+            TherapyTypeSelection.objects.create(therapist=profile, therapy_type=self.emdr)
+            License.objects.create(therapist=profile, license_type=self.lcsw, state="PA", license_number=str(self.count),
+                                   date_expires=datetime.date(2027, 1, 31))
+            profile.age_groups.add(self.adults)
+
+    def export(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/export.csv"
+            call_command("export_therapists", "--output", path, stderr=io.StringIO())
+            with open(path, encoding="utf-8", newline="") as f:
+                return list(csv.DictReader(f))
+
+    def test_csv_columns(self):
+        self.add_profiles(1)
+        rows = self.export()
+        self.assertEqual(list(rows[0]), list(export.COLUMNS))
+        row = rows[0]
+        self.assertEqual((row["username"], row["email"], row["display_name"], row["is_published"]),
+                         ("exp1", "exp1@example.com", "Exp 01", "True"))
+        self.assertEqual((row["specialties"], row["top_specialties"]), ("Anxiety; Grief", "Anxiety"))
+        self.assertEqual((row["insurance"], row["insurance_out_of_network"]), ("Aetna", "Cigna"))
+        self.assertEqual((row["therapy_types"], row["age_groups"], row["faiths"]), ("EMDR", "Adults", ""))
+        self.assertEqual(row["license_details"], "LCSW-PA #1 (exp 2027-01-31)")
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_profiles(2)
+        self.export()  # loads the lookup tables
+        # Profiles (with users), then one query per prefetched relation
+        with self.assertNumQueries(13):
+            self.assertEqual(len(self.export()), 2)
+        self.add_profiles(4)
+        with self.assertNumQueries(13):
+            self.assertEqual(len(self.export()), 6)
+
+
+class ExpiryNoticeTests(TestCase):
+    DAYS = [1, 7, 14, 30, 60]
+
+    def test_due_notice(self):
+        today = datetime.date(2026, 1, 1)
+        expires = today + datetime.timedelta(days=20)
+        self.assertEqual(due_notice(expires, today, self.DAYS), 30)
+        # Already reminded 25 days out: the 30-day reminder is done, 14 is not due yet
+        self.assertIsNone(due_notice(expires, today, self.DAYS, sent_on=expires - datetime.timedelta(days=25)))
+        # A missed 14-day run is caught up at 10 days left
+        self.assertEqual(due_notice(expires, expires - datetime.timedelta(days=10), self.DAYS,
+                                    sent_on=expires - datetime.timedelta(days=25)), 14)
+        # Reminded before a renewal pushed the date out
+        self.assertEqual(due_notice(expires, today, self.DAYS, sent_on=expires - datetime.timedelta(days=400)), 30)
+        self.assertIsNone(due_notice(today + datetime.timedelta(days=90), today, self.DAYS))
+        self.assertIsNone(due_notice(today - datetime.timedelta(days=1), today, self.DAYS))
+
+    def test_sweep_catches_up_and_does_not_repeat(self):
+        user = get_user_model().objects.create(username="lic", email="lic@example.com")
+        profile = TherapistProfile.objects.create(user=user, display_name="Lic Ensed")
+        today = datetime.date(2026, 3, 1)
+        license = License.objects.create(therapist=profile, license_type=LicenseType.objects.create(name="LCSW"),
+                                         license_number="1", date_expires=today + datetime.timedelta(days=12))
+        ProfessionalInsurance.objects.create(therapist=profile, npi_number="1", malpractice_expiration_date="03/2026")
+
+        # Nobody ran the sweep on the 14-day mark
+        result = sweep(today=today, notice_days=self.DAYS)
+        self.assertEqual((result.license_notices, result.malpractice_notices, result.emails_sent), (1, 1, 1))
+        license.refresh_from_db()
+        self.assertEqual(license.expiry_notice_sent_on, today)
+
+        result = sweep(today=today + datetime.timedelta(days=1), notice_days=self.DAYS)
+        self.assertEqual((result.license_notices, result.malpractice_notices), (0, 0))
+        # Seven days before, the next reminder is due
+        result = sweep(today=today + datetime.timedelta(days=5), notice_days=self.DAYS)
+        self.assertEqual(result.license_notices, 1)
+
+    def test_dry_run_and_no_email_do_not_mark(self):
+        user = get_user_model().objects.create(username="lic2", email="lic2@example.com")
+        profile = TherapistProfile.objects.create(user=user, display_name="Lic Two")
+        today = datetime.date(2026, 3, 1)
+        license = License.objects.create(therapist=profile, license_type=LicenseType.objects.create(name="LMFT"),
+                                         license_number="2", date_expires=today + datetime.timedelta(days=3))
+        sweep(today=today, notice_days=self.DAYS, dry_run=True)
+        sweep(today=today, notice_days=self.DAYS, send=False)
+        license.refresh_from_db()
+        self.assertIsNone(license.expiry_notice_sent_on)
+
+    def test_lapsed_license_deactivated_only_once_told(self):
+        user = get_user_model().objects.create(username="lic3", email="lic3@example.com")
+        profile = TherapistProfile.objects.create(user=user, display_name="Lic Three")
+        today = datetime.date(2026, 3, 1)
+        license = License.objects.create(therapist=profile, license_type=LicenseType.objects.create(name="LPC"),
+                                         license_number="3", date_expires=today - datetime.timedelta(days=2))
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("smtp down")):
+            with self.assertRaises(OSError):
+                sweep(today=today, notice_days=self.DAYS)
+        license.refresh_from_db()
+        self.assertTrue(license.is_active)
+
+        # The next run finds it again and sends the notice before deactivating
+        result = sweep(today=today, notice_days=self.DAYS)
+        self.assertEqual((result.deactivated, result.emails_sent), (1, 1))
+        self.assertIn("has been marked inactive", mail.outbox[0].body)
+        license.refresh_from_db()
+        self.assertFalse(license.is_active)
+
+    def test_lapsed_license_deactivated_without_email(self):
+        profile = TherapistProfile.objects.create(user=get_user_model().objects.create(username="lic4"), display_name="Lic Four")
+        today = datetime.date(2026, 3, 1)
+        license = License.objects.create(therapist=profile, license_type=LicenseType.objects.create(name="PhD"),
+                                         license_number="4", date_expires=today - datetime.timedelta(days=2))
+        result = sweep(today=today, notice_days=self.DAYS)
+        self.assertEqual((result.deactivated, result.skipped_no_email), (1, 1))
+        license.refresh_from_db()
+        self.assertFalse(license.is_active)
+
+
+class MatchIndexTests(TestCase):
+    def test_scores(self):
+        np = matching.np
+        index = matching.MatchIndex(
+            np.array([10, 20, 30]),
+            {1: 0, 2: 1}, np.array([[2, 0], [1, 1], [0, 0]], dtype=np.uint8),
+            {7: 0}, np.array([[False], [True], [False]]),
+            {3: 0}, np.array([[True], [True], [False]]),
+            {}, np.zeros((3, 0), dtype=bool),
+            np.array([40.0, 40.0, np.nan], dtype=np.float32), np.array([-75.0, -75.5, np.nan], dtype=np.float32),
+            np.array([True, False, True]),
+        )
+        criteria = matching.MatchCriteria(specialties=[1, 2], insurance=7, age_group=3, latitude=40.0, longitude=-75.0)
+        w = matching.DEFAULT_WEIGHTS
+        scores = index.scores(criteria)
+        # Top specialty 1 of the 2 asked for, age group, right on the spot, accepting
+        self.assertAlmostEqual(float(scores[0]), w["specialty"] * 0.5 + w["age_group"] + w["distance"] + w["accepting"], places=5)
+        # Both specialties listed, in network, age group, about 26 miles away of 50
+        closeness = 1 - float(index._distance_miles(40.0, -75.0)[1]) / 50
+        self.assertAlmostEqual(closeness, 0.47, places=2)
+        self.assertAlmostEqual(float(scores[1]), w["specialty"] * 0.5 + w["insurance"] + w["age_group"] + w["distance"] * closeness,
+                               places=4)
+        # No location: only the accepting credit
+        self.assertAlmostEqual(float(scores[2]), w["accepting"])
+        self.assertEqual([pk for pk, _ in index.top(criteria, k=2)], [20, 10])
+        self.assertEqual(index.top(matching.MatchCriteria(weights={"accepting": 0.0}), k=5)[0][1], 0.0)
+
+    def test_build_only_encodes_published_therapists(self):
+        User = get_user_model()
+        adults, teens = AgeGroup.objects.create(name="Adults"), AgeGroup.objects.create(name="Teens")
+        ZipCode.objects.create(zip="19103", city="Philadelphia", state="PA", latitude="39.95", longitude="-75.17")
+        published = TherapistProfile.objects.create(user=User.objects.create(username="pub"), display_name="Pub",
+                                                    is_published=True, accepts_new_clients=True)
+        hidden = TherapistProfile.objects.create(user=User.objects.create(username="hid"), display_name="Hid", is_published=False)
+        published.age_groups.add(adults)
+        hidden.age_groups.add(adults, teens)
+        Location.objects.create(therapist=published, zip="19103")
+        lookup_registry.invalidate()
+
+        with CaptureQueriesContext(connection) as queries:
+            index = matching.MatchIndex.build()
+        self.assertEqual(list(index.therapist_ids), [published.pk])
+        self.assertEqual(index.ages.tolist(), [[True, False]])
+        self.assertAlmostEqual(float(index.latitude[0]), 39.95, places=4)
+        through = TherapistProfile.age_groups.through._meta.db_table
+        [sql] = [q["sql"] for q in queries.captured_queries if f'FROM "{through}"' in q["sql"]]
+        self.assertIn("is_published", sql)
+
+        criteria = matching.MatchCriteria(age_group=teens.pk)
+        self.assertEqual(index.top(criteria), [(published.pk, matching.DEFAULT_WEIGHTS["accepting"])])
+
+
+def _editor_data(profile) -> dict:
+    """POST data re-submitting the profile editor exactly as rendered (extra forms left blank)."""
+    forms = [TherapistProfileForm(instance=profile)]
+    formsets, hour_formsets = _editor_formsets(profile)
+    data = {}
+    for formset in [fs for _, _, fs in formsets] + [fs for _, fs in hour_formsets]:
+        management = formset.management_form
+        data.update({management.add_prefix(name): value for name, value in management.initial.items()})
+        data[management.add_prefix("TOTAL_FORMS")] = len(formset.initial_forms)
+        forms += formset.initial_forms
+    for form in forms:
+        for name in form.fields:
+            value = form[name].initial
+            if value is not None and value is not False and value != "" and name != "photo":
+                data[form.add_prefix(name)] = getattr(value, "pk", value)
+    return data
+
+
+class ProfileEditorTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="editor")
+        self.client.force_login(self.user)
+        self.profile = TherapistProfile.objects.create(user=self.user, display_name="Ed Itor")
+        self.location = Location.objects.create(therapist=self.profile, city="Philadelphia")
+        self.specialties = [SpecialtyLookup.objects.create(name=f"Specialty {i}") for i in range(8)]
+        lookup_registry.invalidate()
+
+    def add_rows(self, count):
+        for i in range(count):
+            Specialty.objects.create(therapist=self.profile, specialty=self.specialties[i])
+            OfficeHour.objects.create(location=self.location, weekday=i, start_time_1=datetime.time(9), end_time_1=datetime.time(17))
+
+    def post(self, data):
+        response = self.client.post("/therapists/edit/", data)
+        if response.status_code != 302:
+            context = response.context
+            formsets = [fs for _, _, fs in context["formsets"]] + [fs for _, fs in context["hour_formsets"]]
+            self.fail([context["form"].errors] + [(fs.errors, fs.non_form_errors()) for fs in formsets])
+
+    def hours(self):
+        return dict(OfficeHour.objects.filter(location=self.location).values_list("pk", "weekday"))
+
+    def test_swapping_weekdays(self):
+        self.add_rows(2)
+        (monday, m), (tuesday, t) = sorted(self.hours().items(), key=lambda item: item[1])
+        data = _editor_data(self.profile)
+        prefix = f"hours-{self.location.pk}"
+        data[f"{prefix}-0-weekday"], data[f"{prefix}-1-weekday"] = 1, 0
+        data["specialties-0-specialty"], data["specialties-1-specialty"] = self.specialties[1].pk, self.specialties[0].pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(data)
+        self.assertEqual(self.hours(), {monday: 1, tuesday: 0})
+        self.assertEqual(sorted(Specialty.objects.values_list("specialty__name", flat=True)), ["Specialty 0", "Specialty 1"])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for model in lookup_registry.models:
+            lookup_registry.rows(model)
+        for rows in (2, 6):
+            Specialty.objects.all().delete()
+            OfficeHour.objects.all().delete()
+            self.add_rows(rows)
+            data = _editor_data(self.profile)
+            # Edit one row, delete one and add one in each of two sections
+            prefix = f"hours-{self.location.pk}"
+            data[f"{prefix}-0-end_time_1"] = "18:00"
+            data[f"{prefix}-1-DELETE"] = "on"
+            data.update({f"{prefix}-TOTAL_FORMS": rows + 1, f"{prefix}-{rows}-weekday": 6, f"{prefix}-{rows}-is_closed": "on"})
+            data["specialties-0-is_top_specialty"] = "on"
+            data["specialties-1-DELETE"] = "on"
+            data.update({"specialties-TOTAL_FORMS": rows + 1, f"specialties-{rows}-specialty": self.specialties[7].pk})
+            # Session and user, the profile and its sections, then per changed section: load, DELETE, UPDATE, INSERT
+            with self.assertNumQueries(22):
+                self.post(data)
+            self.assertEqual(OfficeHour.objects.count(), rows)
+            self.assertEqual(Specialty.objects.filter(is_top_specialty=True).count(), 1)
+
+
+class TokensTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cbt = TherapyType.objects.create(name="Cognitive Behavioral Therapy (CBT)")
+        self.emdr = TherapyType.objects.create(name="EMDR")
+        self.anxiety = SpecialtyLookup.objects.create(name="Anxiety")
+        self.grief = SpecialtyLookup.objects.create(name="Grief & Loss")
+        lookup_registry.invalidate()
+        self.users = iter(get_user_model().objects.create(username=f"tok{i}") for i in range(10))
+
+    def profile(self, **text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return TherapistProfile.objects.create(user=next(self.users), display_name="Tok En", **text)
+
+    def rows(self, profile):
+        return (sorted(profile.specialty_items.values_list("specialty__name", flat=True)),
+                sorted(profile.types_of_therapy.values_list("therapy_type__name", flat=True)))
+
+    def test_resolve(self):
+        self.assertEqual(tokens.tokenize(" CBT; emdr ,, Play therapy\n"), ["CBT", "emdr", "Play therapy"])
+        self.assertEqual(tokens.normalize("Grief &  Loss!"), "grief and loss")
+        ids, unknown = tokens.resolve(TherapyType, "cbt, Cognitive behavioral therapy, EMDR, Play therapy")
+        self.assertEqual(ids, [self.cbt.pk, self.emdr.pk])
+        self.assertEqual(unknown, ["Play therapy"])
+        self.assertEqual(tokens.resolve(SpecialtyLookup, "grief and loss")[0], [self.grief.pk])
+
+    def test_saving_text_syncs_rows(self):
+        profile = self.profile(specialties="anxiety, Grief and loss", modalities="CBT, Play therapy")
+        self.assertEqual(self.rows(profile), (["Anxiety", "Grief & Loss"], ["Cognitive Behavioral Therapy (CBT)"]))
+        profile.modalities = "EMDR, Play therapy"
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertEqual(self.rows(profile)[1], ["EMDR"])
+        # Saving without a text change leaves rows added since alone
+        TherapyTypeSelection.objects.create(therapist=profile, therapy_type=self.cbt)
+        with self.captureOnCommitCallbacks(execute=True):
+            TherapistProfile.objects.get(pk=profile.pk).save()
+        self.assertEqual(self.rows(profile)[1], ["Cognitive Behavioral Therapy (CBT)", "EMDR"])
+
+    def test_row_changes_rewrite_the_text_keeping_unknown_tokens(self):
+        profile = self.profile(modalities="EMDR, Play therapy")
+        with self.captureOnCommitCallbacks(execute=True):
+            TherapyTypeSelection.objects.create(therapist=profile, therapy_type=self.cbt)
+        profile.refresh_from_db()
+        self.assertEqual(profile.modalities, "EMDR, Cognitive Behavioral Therapy (CBT), Play therapy")
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.types_of_therapy.filter(therapy_type=self.emdr).delete()
+        profile.refresh_from_db()
+        self.assertEqual(profile.modalities, "Cognitive Behavioral Therapy (CBT), Play therapy")
+
+    def test_editor_no_longer_takes_the_text(self):
+        self.assertNotIn("modalities", TherapistProfileForm.base_fields)
+        self.assertNotIn("specialties", TherapistProfileForm.base_fields)
+
+    def test_backfill(self):
+        TherapistProfile.objects.bulk_create([
+            TherapistProfile(user=next(self.users), display_name="A", slug="a", specialties="Anxiety, Burnout", modalities="cbt"),
+            TherapistProfile(user=next(self.users), display_name="B", slug="b", specialties="grief and loss, burnout"),
+        ])
+        a, b = TherapistProfile.objects.order_by("slug")
+        out = io.StringIO()
+        call_command("backfill_specialty_tokens", "--dry-run", stdout=out)
+        self.assertIn("Dry run: selection rows added: specialties=2, modalities=1", out.getvalue())
+        self.assertIn("2  burnout", out.getvalue())
+        self.assertEqual(Specialty.objects.count() + TherapyTypeSelection.objects.count(), 0)
+
+        call_command("backfill_specialty_tokens", "--chunk-size", "1", stdout=io.StringIO())
+        self.assertEqual(self.rows(a), (["Anxiety"], ["Cognitive Behavioral Therapy (CBT)"]))
+        self.assertEqual(self.rows(b), (["Grief & Loss"], []))
+        a.refresh_from_db()
+        self.assertEqual((a.specialties, a.modalities), ("Anxiety, Burnout", "Cognitive Behavioral Therapy (CBT)"))
+
+        out = io.StringIO()
+        call_command("backfill_specialty_tokens", stdout=out)
+        self.assertIn("selection rows added: specialties=0, modalities=0; text mirrors rewritten: 0", out.getvalue())
@@ -0,0 +1,159 @@
+"""Map the free-text ``specialties`` / ``modalities`` fields onto lookup rows.
+
+The comma-separated text on TherapistProfile predates the normalized
+``Specialty`` and ``TherapyTypeSelection`` tables. ``tokenize`` splits the
+text, ``normalize`` folds case, "&"/"and" and punctuation, and ``resolve``
+maps each token to a lookup id (a name like "Cognitive Behavioral Therapy
+(CBT)" also answers to "Cognitive Behavioral Therapy" and "CBT").
+
+The selection rows are what filters join on; the text is kept as a readable
+mirror. Saving a profile whose text changed adds / removes selection rows to
+match it, and changing selection rows rewrites the text (tokens that match no
+lookup are preserved). ``backfill_specialty_tokens`` brings existing rows in
+line.
+"""
+import re
+import threading
+
+from django.db import transaction
+
+from .lookups import lookup_registry
+
+_SEPARATORS = re.compile(r"[,;|\n]+")
+_PARENS = re.compile(r"\(([^)]*)\)")
+_PUNCT = re.compile(r"[^\w\s+]")
+_SPACES = re.compile(r"\s+")
+
+_state = threading.local()
+_names_cache = {}
+
+
+def tokenize(text) -> list:
+    return [t.strip() for t in _SEPARATORS.split(text or "") if t.strip()]
+
+
+def normalize(token: str) -> str:
+    token = token.casefold().replace("&", " and ")
+    token = _PUNCT.sub(" ", token)
+    return _SPACES.sub(" ", token).strip()
+
+
+def text_fields() -> dict:
+    """text field -> (selection model, lookup FK name, lookup model, related name)."""
+    from .models import Specialty, SpecialtyLookup, TherapyType, TherapyTypeSelection
+
+    return {
+        "specialties": (Specialty, "specialty", SpecialtyLookup, "specialty_items"),
+        "modalities": (TherapyTypeSelection, "therapy_type", TherapyType, "types_of_therapy"),
+    }
+
+
+TEXT_FIELDS = ("specialties", "modalities")
+
+
+def normalized_names(model) -> dict:
+    """normalized name / alias -> lookup pk, rebuilt when the lookup version changes."""
+    version = lookup_registry.version
+    cached = _names_cache.get(model)
+    if cached and cached[0] == version:
+        return cached[1]
+    names = {}
+    aliases = {}
+    for row in lookup_registry.rows(model):
+        names[normalize(row.name)] = row.pk
+        for paren in _PARENS.findall(row.name):
+            aliases.setdefault(normalize(paren), row.pk)
+        aliases.setdefault(normalize(_PARENS.sub(" ", row.name)), row.pk)
+    # Exact names win over derived aliases
+    names = {**aliases, **names}
+    _names_cache[model] = (version, names)
+    return names
+
+
+def resolve(model, text):
+    """(lookup ids in text order, tokens that matched nothing)."""
+    names = normalized_names(model)
+    ids, unknown = [], []
+    for token in tokenize(text):
+        pk = names.get(normalize(token))
+        if pk is None:
+            unknown.append(token)
+        elif pk not in ids:
+            ids.append(pk)
+    return ids, unknown
+
+
+def mirror_text(model, ids, unknown) -> str:
+    return ", ".join([lookup_registry.label(model, pk) for pk in ids] + list(unknown))
+
+
+def sync_rows_from_text(profile, fields=TEXT_FIELDS) -> dict:
+    """Add / remove selection rows so they match the profile's text; returns {field: (added, removed)}."""
+    changes = {}
+    _state.syncing = getattr(_state, "syncing", 0) + 1
+    try:
+        with transaction.atomic():
+            for field in fields:
+                selection, fk, model, _ = text_fields()[field]
+                wanted, _ = resolve(model, getattr(profile, field))
+                existing = set(selection.objects.filter(therapist_id=profile.pk).values_list(f"{fk}_id", flat=True))
+                added = [pk for pk in wanted if pk not in existing]
+                removed = existing - set(wanted) - {None}
+                if added:
+                    selection.objects.bulk_create([selection(therapist_id=profile.pk, **{f"{fk}_id": pk}) for pk in added])
+                if removed:
+                    selection.objects.filter(therapist_id=profile.pk, **{f"{fk}_id__in": removed}).delete()
+                changes[field] = (len(added), len(removed))
+            if any(added for added, _ in changes.values()):
+                # bulk_create sends no signals; deletes touch the profile through them
+                profile.touch([profile.pk])
+    finally:
+        _state.syncing -= 1
+    return changes
+
+
+def sync_text_from_rows(profile_ids, fields=TEXT_FIELDS) -> int:
+    """Rewrite the text fields from the selection rows, keeping unmatched tokens. Returns profiles updated."""
+    from .models import TherapistProfile
+
+    profile_ids = list(profile_ids)
+    selected = {}
+    for field in fields:
+        selection, fk, _, _ = text_fields()[field]
+        rows = selection.objects.filter(therapist_id__in=profile_ids, **{f"{fk}__isnull": False}).order_by("pk")
+        for therapist_id, pk in rows.values_list("therapist_id", f"{fk}_id"):
+            selected.setdefault((therapist_id, field), {})[pk] = None
+    changed = []
+    for profile in TherapistProfile.objects.filter(pk__in=profile_ids).only("pk", *fields):
+        dirty = False
+        for field in fields:
+            model = text_fields()[field][2]
+            _, unknown = resolve(model, getattr(profile, field))
+            text = mirror_text(model, list(selected.get((profile.pk, field), ())), unknown)
+            if text != getattr(profile, field):
+                setattr(profile, field, text)
+                dirty = True
+        if dirty:
+            changed.append(profile)
+    # bulk_update sends no signals, so this does not loop back into sync_rows_from_text
+    TherapistProfile.objects.bulk_update(changed, list(fields), batch_size=500)
+    return len(changed)
+
+
+def _flush() -> None:
+    pending = _state.__dict__.pop("pending", None)
+    if not pending:
+        return
+    by_field = {}
+    for profile_id, field in pending:
+        by_field.setdefault(field, set()).add(profile_id)
+    for field, ids in by_field.items():
+        sync_text_from_rows(ids, (field,))
+
+
+def schedule_text_sync(profile_id, field: str) -> None:
+    """Refresh a profile's text mirror after commit; skipped while rows are synced from text."""
+    if getattr(_state, "syncing", 0) or profile_id is None:
+        return
+    _state.__dict__.setdefault("pending", set()).add((profile_id, field))
+    transaction.on_commit(_flush)
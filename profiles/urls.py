@@ -1,9 +1,10 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = "profiles"
 
 urlpatterns = [
+    path("api/therapists/", api.therapist_list, name="api_therapist_list"),
     path("therapists/", views.profiles_list, name="profile_list"),
     path("therapists/edit/", views.profile_edit, name="profile_edit"),
     path("therapists/<slug:slug>/", views.profile_detail, name="profile_detail"),
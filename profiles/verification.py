@@ -0,0 +1,274 @@
+"""License verification against state license boards.
+
+``VerificationEngine`` fans license checks out over a thread pool that shares
+one pooled ``requests.Session`` (with retries). Each board gets its own
+concurrency cap and minimum request spacing so a large run never hammers a
+single board. How a board is queried is decided by a pluggable
+``BoardAdapter``: the default ``SearchPageAdapter`` requests the board's
+``search_url`` and looks for the license number in the result rows of the
+page; settings can map states to board-specific subclasses via
+``LICENSE_BOARD_ADAPTERS``. A page the adapter cannot read is reported as
+``NEEDS_REVIEW``, never ``VERIFIED``.
+
+``FakeBoardServer`` is a local HTTP stand-in for a board search page, used by
+``verify_licenses --fake-board`` and ``--benchmark``.
+"""
+import abc
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+VERIFIED = "verified"
+NOT_FOUND = "not_found"
+ERROR = "error"
+NO_BOARD = "no_board"
+NEEDS_REVIEW = "needs_review"
+
+
+@dataclass
+class VerificationResult:
+    status: str
+    message: str = ""
+    raw: dict = field(default_factory=dict)
+
+
+@dataclass
+class VerificationJob:
+    """One license to check; plain values so jobs can be built without model instances."""
+    license_id: int
+    therapist_id: int
+    license_number: str
+    state: str
+    license_type: str = ""
+    last_name: str = ""
+    board_id: int | None = None
+    search_url: str = ""
+
+
+class BoardAdapter(abc.ABC):
+    """Checks one license against a board. Subclasses implement ``verify``."""
+
+    @abc.abstractmethod
+    def verify(self, session: requests.Session, job: VerificationJob, timeout: float) -> VerificationResult:
+        ...
+
+
+class SearchPageAdapter(BoardAdapter):
+    """GET the board's search URL and look for the license number in its result rows.
+
+    ``search_url`` may contain ``{license_number}``, ``{last_name}`` and
+    ``{state}`` placeholders; otherwise the license number is sent as the
+    ``license_number`` query parameter.
+
+    Only elements matching ``result_selector`` count, and the number must be a
+    whole token in one of them: search pages echo the query back ("No results
+    for A12345"), and "A123" must not match "A1234". A page with no result rows
+    is ``NOT_FOUND`` when it says so (``no_results_pattern``) and
+    ``NEEDS_REVIEW`` otherwise. Boards with other markup get a subclass that
+    overrides these two attributes, or ``result_rows``.
+    """
+    result_selector = "table tr, .result, .results li"
+    no_results_pattern = re.compile(r"\bno (?:results|records|matches|licen[sc]ees?)\b", re.IGNORECASE)
+
+    def verify(self, session, job, timeout):
+        values = {"license_number": job.license_number, "last_name": job.last_name, "state": job.state}
+        if "{" in job.search_url:
+            url, params = job.search_url.format(**values), None
+        else:
+            url, params = job.search_url, {"license_number": job.license_number}
+        resp = session.get(url, params=params, timeout=timeout)
+        raw = {"url": resp.url, "http_status": resp.status_code}
+        if resp.status_code >= 400:
+            return VerificationResult(ERROR, f"HTTP {resp.status_code}", raw)
+        soup = BeautifulSoup(resp.text, "html.parser")
+        rows = self.result_rows(soup)
+        raw["rows"] = len(rows)
+        if not rows:
+            if self.no_results_pattern.search(soup.get_text(" ")):
+                return VerificationResult(NOT_FOUND, "Board search returned no results", raw)
+            return VerificationResult(NEEDS_REVIEW, "Could not find result rows on board search page", raw)
+        token = re.compile(rf"(?<![0-9a-z]){re.escape(job.license_number.strip())}(?![0-9a-z])", re.IGNORECASE)
+        if job.license_number.strip() and any(token.search(row) for row in rows):
+            return VerificationResult(VERIFIED, "License number listed in board search results", raw)
+        return VerificationResult(NOT_FOUND, "License number not listed in board search results", raw)
+
+    def result_rows(self, soup) -> list:
+        """Text of each result row; header rows (all ``<th>``) are left out."""
+        return [
+            el.get_text(" ", strip=True)
+            for el in soup.select(self.result_selector)
+            if not (el.name == "tr" and not el.find("td"))
+        ]
+
+
+def build_jobs(licenses, search_url_override: str = "") -> list:
+    """VerificationJobs for a License queryset, matched to boards in two queries.
+
+    A board scoped to the license's type wins over the state's unscoped board.
+    """
+    from .lookups import lookup_registry
+    from .models import LicenseType, StateLicenseBoard
+
+    boards = {}
+    for board in StateLicenseBoard.objects.filter(active=True).only("pk", "state", "license_type", "search_url"):
+        boards.setdefault((board.state.upper(), board.license_type.strip().casefold()), board)
+    jobs = []
+    rows = licenses.values_list("pk", "therapist_id", "license_number", "state", "license_type_id", "therapist__last_name")
+    for pk, therapist_id, number, state, type_id, last_name in rows:
+        state = (state or "").upper()
+        type_name = lookup_registry.label(LicenseType, type_id)
+        board = boards.get((state, type_name.casefold())) or boards.get((state, ""))
+        jobs.append(VerificationJob(
+            license_id=pk,
+            therapist_id=therapist_id,
+            license_number=number,
+            state=state,
+            license_type=type_name,
+            last_name=last_name or "",
+            board_id=board.pk if board else None,
+            search_url=search_url_override or (board.search_url if board else ""),
+        ))
+    return jobs
+
+
+def get_adapter(state: str) -> BoardAdapter:
+    adapters = getattr(settings, "LICENSE_BOARD_ADAPTERS", {})
+    path = adapters.get(state) or adapters.get("default")
+    return import_string(path)() if path else SearchPageAdapter()
+
+
+class BoardLimiter:
+    """Caps concurrent requests to one board and spaces them at least ``interval`` apart."""
+
+    def __init__(self, concurrency: int, rate: float):
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        if self._interval:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._next_at - now
+                self._next_at = max(now, self._next_at) + self._interval
+            if wait > 0:
+                time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+
+class VerificationEngine:
+    def __init__(self, workers: int = 8, per_board_concurrency: int = 2, per_board_rate: float = 2.0,
+                 timeout: float = 15.0, retries: int = 3):
+        self.workers = workers
+        self.per_board_concurrency = per_board_concurrency
+        self.per_board_rate = per_board_rate
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "lcpsych-license-verifier/1.0"
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(workers, 10), max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+    def _limiter(self, key) -> BoardLimiter:
+        with self._limiters_lock:
+            if key not in self._limiters:
+                self._limiters[key] = BoardLimiter(self.per_board_concurrency, self.per_board_rate)
+            return self._limiters[key]
+
+    def check(self, job: VerificationJob) -> VerificationResult:
+        base = {"license_id": job.license_id, "license_number": job.license_number, "state": job.state, "board_id": job.board_id}
+        if not job.search_url:
+            return VerificationResult(NO_BOARD, f"No active board configured for {job.state or 'unknown state'}", base)
+        started = time.monotonic()
+        try:
+            with self._limiter(job.board_id or job.search_url):
+                result = get_adapter(job.state).verify(self.session, job, self.timeout)
+        except Exception as e:
+            # A bad search_url template or a broken adapter fails this job, not the whole run
+            message = str(e) if isinstance(e, requests.RequestException) else f"{type(e).__name__}: {e}"
+            result = VerificationResult(ERROR, message[:500])
+        result.raw = {**base, **result.raw, "elapsed_ms": round((time.monotonic() - started) * 1000)}
+        return result
+
+    def run(self, jobs):
+        """Yield (job, result) pairs as checks complete."""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="license-verify") as pool:
+            futures = {pool.submit(self.check, job): job for job in jobs}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        self.session.close()
+
+
+class _FakeBoardHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        number = (query.get("license_number") or [""])[0]
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        # Numbers ending in 0 are "not on file" so both outcomes are exercised; like real
+        # boards, the page repeats the query back either way
+        found = bool(number) and not number.endswith("0")
+        summary = f"Search results for {escape(number)}" if found else f"No results for {escape(number)}"
+        rows = f"<tr><td>{escape(number)}</td><td>ACTIVE</td></tr>" if found else ""
+        body = (f"<html><body><p>{summary}</p>"
+                f"<table><tr><th>License</th><th>Status</th></tr>{rows}</table></body></html>")
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBoardServer:
+    """Local stand-in for a board search page: ``with FakeBoardServer() as board: board.url``."""
+
+    def __init__(self, latency: float = 0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeBoardHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,14 +1,48 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 from django.http import HttpRequest, HttpResponse
 
-from .forms import TherapistProfileForm
-from .models import TherapistProfile
+from . import hours, images, tokens
+from .forms import PROFILE_FORMSETS, OfficeHourFormSet, TherapistProfileForm
+from .hours import open_now_q
+from .lookups import lookup_registry
+from .models import AgeGroup, InsuranceProvider, ParticipantType, SpecialtyLookup, TherapistProfile
+
+# Directory facets: (query param, label, lookup model, TherapistProfile filter path)
+DIRECTORY_FACETS = (
+    ("specialty", "Specialty", SpecialtyLookup, "specialty_items__specialty"),
+    ("insurance", "Insurance", InsuranceProvider, "insurance_details__provider"),
+    ("age_group", "Age group", AgeGroup, "age_groups"),
+    ("participant", "Sees", ParticipantType, "participant_types"),
+)
+# Availability toggles answered from the office-hours index: (query param, label)
+AVAILABILITY_FILTERS = (
+    ("open_now", "Open now"),
+    ("evenings", "Evenings (after 5pm)"),
+    ("weekends", "Weekends"),
+)
 
 
 def profile_detail(request: HttpRequest, slug: str) -> HttpResponse:
     profile = get_object_or_404(TherapistProfile, slug=slug, is_published=True)
-    return render(request, "profiles/profile_detail.html", {"profile": profile})
+    ctx = {"profile": profile, "gallery": profile.gallery_images.order_by("-is_primary", "pk")}
+    if profile.photo:
+        ctx["og_image_url"] = request.build_absolute_uri(profile.photo_og_url)
+        og = images.derivative(profile.photo, profile.photo_meta, "og")
+        if og:
+            ctx.update(og_image_width=og["width"], og_image_height=og["height"], og_image_type="image/webp")
+    return render(request, "profiles/profile_detail.html", ctx)
+
+
+def _editor_formsets(profile, data=None):
+    """Inline formsets for the profile editor; office hours get one formset per saved location."""
+    formsets = [(prefix, label, cls(data, instance=profile, prefix=prefix)) for prefix, label, cls in PROFILE_FORMSETS]
+    hour_formsets = [
+        (location, OfficeHourFormSet(data, instance=location, prefix=f"hours-{location.pk}"))
+        for location in profile.locations.order_by("pk")
+    ]
+    return formsets, hour_formsets
 
 
 @login_required
@@ -19,14 +53,76 @@ def profile_edit(request: HttpRequest) -> HttpResponse:
     })
     if request.method == "POST":
         form = TherapistProfileForm(request.POST, request.FILES, instance=profile)
-        if form.is_valid():
-            form.save()
+        formsets, hour_formsets = _editor_formsets(profile, request.POST)
+        # Office hours first so a location deleted in the same submit cascades over them
+        all_formsets = [fs for _, fs in hour_formsets] + [fs for _, _, fs in formsets]
+        if form.is_valid() and all(fs.is_valid() for fs in all_formsets):
+            with transaction.atomic():
+                form.save()
+                for fs in all_formsets:
+                    fs.save()
+                # The formsets save in bulk (no model signals): refresh derived data once
+                by_prefix = {prefix: fs for prefix, _, fs in formsets}
+                for field in tokens.TEXT_FIELDS:
+                    if by_prefix[field].has_saved_changes:
+                        tokens.schedule_text_sync(profile.pk, field)
+                locations = by_prefix["locations"]
+                rebuild = {obj.pk for obj in locations.new_objects}
+                rebuild |= {obj.pk for obj, _ in locations.changed_objects}
+                rebuild |= {location.pk for location, fs in hour_formsets if fs.has_saved_changes}
+                for location_id in rebuild:
+                    hours.schedule_rebuild(location_id)
             return redirect("profiles:profile_detail", slug=profile.slug)
     else:
         form = TherapistProfileForm(instance=profile)
-    return render(request, "profiles/profile_edit.html", {"form": form, "profile": profile})
+        formsets, hour_formsets = _editor_formsets(profile)
+    return render(request, "profiles/profile_edit.html", {
+        "form": form,
+        "profile": profile,
+        "formsets": formsets,
+        "hour_formsets": hour_formsets,
+    })
 
 
-def profiles_list(request: HttpRequest) -> HttpResponse:
+def filter_directory(params):
+    """Published profiles filtered by the directory facets / availability toggles in ``params``.
+
+    Returns (queryset, facets, availability) where the last two describe the
+    filter controls for rendering.
+    """
     qs = TherapistProfile.objects.filter(is_published=True)
-    return render(request, "profiles/profile_list.html", {"profiles": qs})
+    # Facet options and labels come from the lookup registry, not the DB
+    facets = []
+    filtered = False
+    for param, label, model, path in DIRECTORY_FACETS:
+        selected = lookup_registry.get(model, params.get(param))
+        if selected is not None:
+            qs = qs.filter(**{path: selected.pk})
+            filtered = True
+        facets.append({
+            "param": param,
+            "label": label,
+            "choices": lookup_registry.choices(model),
+            "selected": selected.pk if selected is not None else None,
+        })
+    availability = []
+    for param, label in AVAILABILITY_FILTERS:
+        checked = params.get(param) in ("1", "on", "true")
+        availability.append({"param": param, "label": label, "checked": checked})
+        if not checked:
+            continue
+        if param == "open_now":
+            qs = qs.filter(open_now_q("locations__"))
+        elif param == "evenings":
+            qs = qs.filter(locations__has_evening_hours=True)
+        elif param == "weekends":
+            qs = qs.filter(locations__has_weekend_hours=True)
+        filtered = True
+    if filtered:
+        qs = qs.distinct()
+    return qs, facets, availability
+
+
+def profiles_list(request: HttpRequest) -> HttpResponse:
+    qs, facets, availability = filter_directory(request.GET)
+    return render(request, "profiles/profile_list.html", {"profiles": qs, "facets": facets, "availability": availability})
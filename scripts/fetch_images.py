@@ -3,6 +3,11 @@ Fetch image assets referenced in reference/lcpsych.html and rewrite body HTML
 to point to local /static paths. Outputs reference/lcpsych_body_local.html.
 
 Run: python scripts/fetch_images.py
+Images are resolved through the shared media table (core.media_assets), so a
+file already imported by import_media or another script is copied from storage
+instead of downloaded again; run migrations first. Downloads go through the
+shared HTTP cache (core.http_cache); set HTTP_CACHE_OFFLINE=1 to run from the
+cache without network access.
 """
 from __future__ import annotations
 
@@ -11,9 +16,28 @@ import re
 import sys
 from html import unescape
 from urllib.parse import urlparse
-from urllib.request import urlopen, Request
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lcpsych.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from core.http_cache import cached_session  # noqa: E402
+from core.media_assets import MediaLibrary  # noqa: E402
+
+SESSION = cached_session()
+LIBRARY = MediaLibrary(
+    SESSION,
+    headers={
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
+        "Referer": "https://www.lcpsych.com/",
+    },
+    on_error=lambda url, e: print(f"WARN: failed to download {url}: {e}"),
+)
 REF_HTML = os.path.join(ROOT, "reference", "lcpsych.html")
 OUT_BODY = os.path.join(ROOT, "reference", "lcpsych_body_local.html")
 MEDIA_ROOT = os.path.join(ROOT, "static", "media", "lcpsych")
@@ -92,18 +116,9 @@ def download(url: str, dest: str) -> None:
     # Skip if exists with non-zero size
     if os.path.exists(dest) and os.path.getsize(dest) > 0:
         return
-    try:
-        req = Request(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
-                "Referer": "https://www.lcpsych.com/",
-            },
-        )
-        with urlopen(req) as resp, open(dest, "wb") as f:
-            f.write(resp.read())
-    except Exception as e:
-        print(f"WARN: failed to download {url}: {e}")
+    asset = LIBRARY.fetch(url)
+    if asset:
+        LIBRARY.copy_to(asset, dest)
 
 
 def rewrite_html_to_local(html: str, url_map: dict[str, str]) -> str:
@@ -174,6 +189,7 @@ def main() -> int:
     body_local = rewrite_html_to_local(body_inner, url_map)
     write_file(OUT_BODY, body_local)
     print(f"Wrote body HTML with local paths to: {OUT_BODY}")
+    print(SESSION.get_adapter("https://").cache.summary())
     return 0
 
 
@@ -2,9 +2,23 @@ import re
 import os
 import sys
 from urllib.parse import urlparse
-import urllib.request
 
-ROOT = os.path.dirname(os.path.dirname(__file__))
+ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lcpsych.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from core.http_cache import cached_session  # noqa: E402
+from core.media_assets import MediaLibrary  # noqa: E402
+
+# Files are resolved through the shared media table (run migrations first) and
+# the shared HTTP cache; HTTP_CACHE_OFFLINE=1 downloads from it without network access
+SESSION = cached_session()
+LIBRARY = MediaLibrary(SESSION, on_error=lambda url, e: print(f"ERR {url}: {e}"))
 REF = os.path.join(ROOT, 'reference', 'lcpsych.html')
 OUT_BASE = os.path.join(ROOT, 'static', 'img', 'lcpsych')
 
@@ -18,18 +32,15 @@ def main():
     pattern = re.compile(r'https://www\.lcpsych\.com[^\s"\')>]+\.(?:png|jpe?g|webp|svg|gif)', re.IGNORECASE)
     urls = sorted(set(pattern.findall(html)))
     print(f"Found {len(urls)} unique image URLs")
-    count_ok = 0
-    for url in urls:
+    assets, stats = LIBRARY.resolve(urls)
+    print(f"Media: {stats}")
+    for url, asset in assets.items():
         rel = url.split('https://www.lcpsych.com/', 1)[1]
         out_path = os.path.join(OUT_BASE, rel)
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        try:
-            urllib.request.urlretrieve(url, out_path)
-            count_ok += 1
-            print(f"OK {url} -> {out_path}")
-        except Exception as e:
-            print(f"ERR {url}: {e}")
-    print(f"Downloaded {count_ok}/{len(urls)} files into {OUT_BASE}")
+        LIBRARY.copy_to(asset, out_path)
+        print(f"OK {url} -> {out_path}")
+    print(f"Downloaded {len(assets)}/{len(urls)} files into {OUT_BASE}")
+    print(SESSION.get_adapter('https://').cache.summary())
 
 if __name__ == '__main__':
     main()
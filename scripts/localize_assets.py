@@ -9,6 +9,11 @@ Localize external assets referenced in templates/base.html.
 - Removes/remaps third-party trackers (GTM/Adsense) script/link tags
 
 Run: python scripts/localize_assets.py
+Assets are resolved through the shared media table (core.media_assets), so a
+file already fetched by import_media or another script is copied from storage
+instead of downloaded again; run migrations first. Downloads go through the
+shared HTTP cache (core.http_cache); set HTTP_CACHE_OFFLINE=1 to run from the
+cache without network access.
 """
 from __future__ import annotations
 
@@ -17,10 +22,29 @@ import re
 import sys
 from pathlib import Path
 from urllib.parse import urlparse
-from urllib.request import Request, urlopen
 import os as _os
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lcpsych.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from core.http_cache import cached_session  # noqa: E402
+from core.media_assets import MediaLibrary  # noqa: E402
+
+SESSION = cached_session()
+LIBRARY = MediaLibrary(
+    SESSION,
+    headers={
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
+        "Referer": "https://www.lcpsych.com/",
+    },
+    on_error=lambda url, e: print(f"WARN: failed to download {url}: {e}"),
+)
 TEMPLATE = ROOT / "templates" / "base.html"
 VENDOR_ROOT = ROOT / "static" / "vendor" / "lcpsych"
 FONTS_ROOT = ROOT / "static" / "fonts"
@@ -46,15 +70,9 @@ def download(url: str, dest: Path) -> None:
     # Normalize protocol-relative
     if url.startswith("//"):
         url = "https:" + url
-    req = Request(url, headers={
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.6 Safari/605.1.15",
-        "Referer": "https://www.lcpsych.com/",
-    })
-    try:
-        with urlopen(req) as resp, open(dest, "wb") as f:
-            f.write(resp.read())
-    except Exception as e:
-        print(f"WARN: failed to download {url}: {e}")
+    asset = LIBRARY.fetch(url)
+    if asset:
+        LIBRARY.copy_to(asset, dest)
 
 
 def local_path_for(url: str) -> tuple[Path, str]:
@@ -157,13 +175,14 @@ def fetch_google_fonts_locally() -> None:
         q = family_query(fam, styles)
         url = f"https://fonts.googleapis.com/css2?{q}&display=swap"
         # Use a modern desktop UA to get woff2 sources
-        req = Request(url, headers={
+        headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126 Safari/537.36",
             "Accept": "text/css,*/*;q=0.1",
-        })
+        }
         try:
-            with urlopen(req) as resp:
-                css = resp.read().decode("utf-8")
+            resp = SESSION.get(url, headers=headers, timeout=30)
+            resp.raise_for_status()
+            css = resp.content.decode("utf-8")
         except Exception as e:
             print(f"WARN: failed to fetch CSS for {fam}: {e}")
             continue
@@ -270,6 +289,7 @@ def main() -> int:
 
     write(TEMPLATE, html)
     print(f"Localized {len(url_map)} assets and updated base.html (preserve_head={preserve})")
+    print(SESSION.get_adapter("https://").cache.summary())
     return 0
 
 